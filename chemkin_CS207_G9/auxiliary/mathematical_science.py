@@ -33,6 +33,11 @@ class MathModel:
         NOTE:    calls check_stateparams(...) to check inputs
                  calls _kernel(...) to do computation
     
+    compute_param_derivs(self, check=True, **stateparams): derivatives of the result
+        w.r.t. the implicit params, on some inputs. not implemented by default.
+        INPUTS:  same as compute(...)
+        OUTPUTS: derivs, dict, param name: derivative of the result
+    
     get_defaults(cls): classmethod, returns the _default_settings dict
 
     get_coeffparams(self): return the implicit params, in a dict
@@ -101,6 +106,9 @@ class MathModel:
             self.check_stateparams(**stateparams)
         return self._kernel(**self._coeffparams, **stateparams)
 
+    def compute_param_derivs(self, check=True, **stateparams):
+        raise NotImplementedError
+
     @classmethod
     def get_defaults(cls):
         return cls._default_settings
@@ -118,4 +118,93 @@ class PartialLockedDict:
         if key in cls._get_builtin():
             cls._error_change_builtin(key)
         del cls._get_all()[key]
-        return cls
\ No newline at end of file
+        return cls
+
+class IndexedPriorityQueue:
+    """
+    IndexedPriorityQueue is a binary min-heap over a fixed set of indices 0, ..., n-1, 
+    each carrying a float priority. unlike heapq, the priority of any index can be 
+    changed in place, in O(log n), since the heap position of every index is tracked.
+    
+    
+    
+    METHODS
+    ========
+    __init__(self, values):
+        INPUTS:  values, list of float, the priorities of indices 0, ..., n-1
+    
+    __len__(self):
+        return the number of indices
+        OUTPUTS: int
+    
+    __getitem__(self, index):
+        return the priority of index
+        OUTPUTS: float
+    
+    top(self):
+        return the index of the least priority, and its priority
+        OUTPUTS: tuple (int, float)
+    
+    update(self, index, value):
+        change the priority of index to value, and restore the heap order
+        INPUTS:  index, int
+                 value, float
+        OUTPUTS: self
+    
+    """
+    def __init__(self, values):
+        self._values = [float(v) for v in values]
+        # a sorted list is a valid heap
+        self._heap = sorted(range(len(self._values)), key=self._values.__getitem__)
+        self._pos = [0] * len(self._values)
+        for i, index in enumerate(self._heap):
+            self._pos[index] = i
+    
+    def __len__(self):
+        return len(self._values)
+    
+    def __getitem__(self, index):
+        return self._values[index]
+    
+    def top(self):
+        if not self._heap:
+            raise IndexError("top from an empty IndexedPriorityQueue")
+        index = self._heap[0]
+        return index, self._values[index]
+    
+    def update(self, index, value):
+        value_old = self._values[index]
+        self._values[index] = float(value)
+        if value < value_old:
+            self._sift_up(self._pos[index])
+        elif value > value_old:
+            self._sift_down(self._pos[index])
+        return self
+    
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i]], self._pos[heap[j]] = i, j
+    
+    def _sift_up(self, i):
+        values, heap = self._values, self._heap
+        while i > 0:
+            parent = (i - 1) // 2
+            if values[heap[i]] >= values[heap[parent]]:
+                break
+            self._swap(i, parent)
+            i = parent
+    
+    def _sift_down(self, i):
+        values, heap = self._values, self._heap
+        n = len(heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and values[heap[child + 1]] < values[heap[child]]:
+                child += 1
+            if values[heap[i]] <= values[heap[child]]:
+                break
+            self._swap(i, child)
+            i = child
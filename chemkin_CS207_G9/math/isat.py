@@ -0,0 +1,163 @@
+import numpy as np
+from collections import OrderedDict
+
+
+class ISATable:
+
+    '''in-situ adaptive tabulation (ISAT) of a smooth mapping y = R(x)
+
+    each record stores a tabulated point x0, its image y0 = R(x0), the mapping gradient
+    A = dR/dx at x0, and an ellipsoid of accuracy (EOA) {x: (x-x0)^T.M.(x-x0) <= 1}, in
+    which R(x) is approximated by y0 + A.(x-x0). the records are the leaves of a binary
+    tree, each internal node cutting the space by a hyperplane v.x = a. a query descends
+    the tree to one leaf, and
+        retrieves the linear approximation if x is within the EOA of the leaf,
+        otherwise evaluates R(x) directly, and
+            grows the EOA to cover x if the linear approximation is within tolerance, or
+            adds a new record at x, as the sibling of the leaf, if not.
+    the number of records is bounded, the least recently used record gets evicted.
+    errors are measured in the 2-norm of (y - y_approx) / scale, x is scaled the same way.
+
+    ATTRIBUTES:
+        fun:            fun(x) gives R(x), in n array
+        fun_grad:       fun_grad(x) gives R(x) and dR/dx, in n array and n*n array
+        eps_tol:        float, error tolerance of the retrievals
+        max_records:    int, max number of records
+        scale:          float or n array, scale of the components of x and y
+        r_max:          float, max radius of a new EOA in the scaled coordinates
+        stats:          dict, counters of the queries, hits (retrievals), grows, adds
+                        and evictions
+
+    METHODS:
+        query:          R(x), retrieved, or evaluated directly and tabulated
+        __len__:        number of records
+    '''
+
+    def __init__(self, fun, fun_grad, eps_tol=1e-3, max_records=10000, scale=1.0, r_max=1.0):
+        if eps_tol <= 0:
+            raise ValueError("eps_tol = {}: should be positive.".format(eps_tol))
+        if max_records < 1:
+            raise ValueError("max_records = {}: should be at least 1.".format(max_records))
+        self.fun = fun
+        self.fun_grad = fun_grad
+        self.eps_tol = eps_tol
+        self.max_records = int(max_records)
+        self.scale = scale
+        self.r_max = r_max
+        self.stats = dict(n_query=0, n_hit=0, n_grow=0, n_add=0, n_evict=0)
+        self._root = None
+        self._records = OrderedDict() # LRU order, least recent first
+
+    def __len__(self):
+        return len(self._records)
+
+    def query(self, x):
+        '''
+        INPUTS:
+            x:  n array of float
+        OUTPUTS:
+            y:  n array of float, R(x) up to eps_tol
+        '''
+        self.stats['n_query'] += 1
+        x = np.array(x, dtype=float)
+        z = x / self.scale
+        leaf = self._search(z)
+        if leaf is not None:
+            dz = z - leaf.z0
+            self._records.move_to_end(id(leaf))
+            if dz.dot(leaf.M).dot(dz) <= 1:
+                self.stats['n_hit'] += 1
+                return (leaf.w0 + leaf.A.dot(dz)) * self.scale
+
+            y = np.asarray(self.fun(x), dtype=float)
+            err = np.sqrt(np.sum((y / self.scale - leaf.w0 - leaf.A.dot(dz))**2))
+            if err <= self.eps_tol:
+                self.stats['n_grow'] += 1
+                leaf.grow(dz)
+                return y
+
+        y, grad = self.fun_grad(x)
+        y = np.asarray(y, dtype=float)
+        self._add(z, y / self.scale, _scaled_grad(grad, self.scale, len(z)), leaf)
+        return y
+
+    def _search(self, z):
+        '''descend the tree to the leaf of z, None if the tree is empty'''
+        node = self._root
+        while isinstance(node, _ISATNode):
+            node = node.right if node.v.dot(z) > node.a else node.left
+        return node
+
+    def _add(self, z0, w0, A, sibling):
+        self.stats['n_add'] += 1
+        leaf = _ISATLeaf(z0, w0, A, self._initial_eoa(A))
+        self._records[id(leaf)] = leaf
+        if sibling is None:
+            self._root = leaf
+        else:
+            # cutting plane: the bisector of the two tabulated points
+            v = z0 - sibling.z0
+            node = _ISATNode(v, v.dot(z0 + sibling.z0) / 2, sibling, leaf, sibling.parent)
+            self._replace(sibling, node)
+            sibling.parent = leaf.parent = node
+        while len(self._records) > self.max_records:
+            _, evicted = self._records.popitem(last=False)
+            self._remove(evicted)
+            self.stats['n_evict'] += 1
+
+    def _initial_eoa(self, A):
+        '''conservative initial EOA, where even the constant approximation is accurate,
+        |A.dz| <= eps_tol, bounded by r_max. it is then grown by the queries'''
+        M = A.T.dot(A) / self.eps_tol**2
+        eigvals, eigvecs = np.linalg.eigh((M + M.T) / 2)
+        eigvals = np.maximum(eigvals, 1 / self.r_max**2)
+        return (eigvecs * eigvals).dot(eigvecs.T)
+
+    def _replace(self, old, new):
+        parent = old.parent
+        if parent is None:
+            self._root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def _remove(self, leaf):
+        '''remove a leaf, its sibling takes the place of their parent'''
+        parent = leaf.parent
+        if parent is None:
+            self._root = None
+            return
+        sibling = parent.right if parent.left is leaf else parent.left
+        self._replace(parent, sibling)
+        sibling.parent = parent.parent
+
+
+class _ISATLeaf:
+
+    '''a record of ISATable, in the scaled coordinates'''
+
+    def __init__(self, z0, w0, A, M):
+        self.z0, self.w0, self.A, self.M = z0, w0, A, M
+        self.parent = None
+
+    def grow(self, dz):
+        '''the minimal EOA with the same center, covering the current EOA and z0 + dz
+        by the rank-one update M - (1 - 1/r^2) (M.dz)(M.dz)^T / r^2, r^2 = dz^T.M.dz'''
+        Mdz = self.M.dot(dz)
+        r2 = dz.dot(Mdz)
+        self.M = self.M - (1 - 1 / r2) * np.outer(Mdz, Mdz) / r2
+
+
+class _ISATNode:
+
+    '''a cutting plane v.z = a of ISATable, z with v.z > a goes right'''
+
+    def __init__(self, v, a, left, right, parent=None):
+        self.v, self.a, self.left, self.right, self.parent = v, a, left, right, parent
+
+
+def _scaled_grad(grad, scale, n):
+    '''gradient of the mapping in the scaled coordinates, diag(1/scale).grad.diag(scale)'''
+    scale = np.broadcast_to(np.asarray(scale, dtype=float), (n,))
+    return np.asarray(grad, dtype=float) * scale[None, :] / scale[:, None]
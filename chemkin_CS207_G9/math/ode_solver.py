@@ -1,11 +1,18 @@
 import numpy as np
+import scipy.integrate
 import scipy.interpolate
+import scipy.linalg
+import scipy.optimize
+import scipy.sparse
+import scipy.sparse.linalg
 import warnings
 
 def solve_ivp(
         fun, jac, t_span, y0, method='SIE', 
         max_step=np.inf, rtol=1e-3, atol=1e-6, 
         interpolater=scipy.interpolate.CubicSpline,
+        linsolver='dense',
+        output=None,
         **options):
     '''solves an ivp problem, can be used in a similar manner as scipy.integrate.solve_ivp
     this solver is made for implicit methods, so `jac` (jacobian) is required
@@ -14,6 +21,11 @@ def solve_ivp(
         SIE:            semi-implicit extrapolation, an easy-implementing method. 
                         it's accurate to O(h), with addaptive stepsize control.
                         its accuracy and time consumption are not good.
+        ROS4:           4th order Rosenbrock method with embedded 3rd order error estimate.
+                        one jacobian and one factorization per step, adaptive stepsize,
+                        and a cubic Hermite dense output.
+        MR:             multirate ROS4, only the fast components, given by the `idx_fast` option,
+                        take small steps, see `Multirate`.
 
     INPUTS:
         fun:            fun(t,y) gives dy/dt, returning in n array
@@ -22,23 +34,60 @@ def solve_ivp(
         y0:             n array, y value at t_span[0]
         method:         str, solver method, defaults 'SIE'
         max_step:       int, max_step in t_span division, defaults np.inf
+                        for ROS4 it's the max number of accepted steps
         rtol:           float, relative error tolerance, defaults 1e-3
         atol:           float, absolute error tolerance, defaults 1e-6
         interpolater:   scipy.interpolate type, for density output, defaults CubicSpline
+                        ignored by methods that provide dy/dt on their grid (ROS4),
+                        which are interpolated by cubic Hermite splines
+        linsolver:      str or linear solver object, how the implicit stage is solved, defaults 'dense'
+                        'dense':  LU factorization on dense arrays
+                        'sparse': sparse LU (splu), `jac` should return scipy.sparse matrices
+                        'krylov': matrix-free GMRES, `jac` may return a JacobianOperator
+        output:         HermiteOutput, for a memory-lean dense output, e.g. of selected components 
+                        in float32 and over a bounded window, or TrajectorySampler, for samples
+                        at given times only, or any object with method append(t, y, f), e.g. a
+                        TrajectoryWriter to disk, defaults None. ROS4, MR stream their steps 
+                        into it, SIE fills it from its grid, with dy/dt evaluated by fun
         options:        other keyword options for the specified solver method
+                        events: callable or list of callables, event(t,y) gives a float,
+                                whose zero crossings are located and recorded. an event with
+                                attribute `terminal=True` stops the integration, its attribute
+                                `direction` (>0, <0 or 0) selects the crossing direction.
+                                same conventions as scipy.integrate.solve_ivp
 
     OUTPUTS:
-        output_sol:     DenseOutput object
+        output_sol:     DenseOutput object, or output if given
                         output_sol.sol(t) gives y(t) by interpolation of `interpolater`
+                        output_sol.t_events, output_sol.y_events record the events, if any
+                        output_sol.h_last is the step size proposed at the end, for the
+                        next step of a continuation (None for SIE)
+                        output_sol.stats counts the evaluations and steps (None for SIE)
 
     '''
 
-    if method == 'SIE':
-        solver = SemiImplicitExtrapolation(fun, jac)
+    if method not in _solver_dict:
+        raise ValueError(
+            '''ODE solver \'{}\' is not applicable. '''
+            '''Currently support: {}'''.format(method, ', '.join(sorted(_solver_dict))) )
+    solver = _solver_dict[method](fun, jac, linsolver)
 
-    t_sol, y_sol = solver.solve(
-        y0, t_span[0], t_span[1], max_step, rtol, atol, **options)
-    output_sol = DenseOutput(interpolater).fit(t_sol, y_sol)
+    if output is None:
+        t_sol, y_sol = solver.solve(
+            y0, t_span[0], t_span[1], max_step, rtol, atol, **options)
+        output_sol = DenseOutput(interpolater).fit(t_sol, y_sol, solver.f_sol)
+    elif isinstance(solver, Rosenbrock):
+        solver.solve(y0, t_span[0], t_span[1], max_step, rtol, atol, output=output, **options)
+        output_sol = output
+    else:
+        t_sol, y_sol = solver.solve(
+            y0, t_span[0], t_span[1], max_step, rtol, atol, **options)
+        for t, y in zip(t_sol, y_sol.T):
+            output.append(t, y, fun(t, y))
+        output_sol = output
+    output_sol.t_events, output_sol.y_events = solver.t_events, solver.y_events
+    output_sol.h_last = getattr(solver, 'h_last', None)
+    output_sol.stats = getattr(solver, 'stats', None)
 
     return output_sol
 
@@ -49,13 +98,15 @@ class SemiImplicitExtrapolation:
     '''semi-implicit extrapolation ode solver
 
     ATTRIBUTES:
-        fun:    fun(t,y) gives dy/dt, returning in n array
-        jac:    jac(t,y) gives dfun/dy, returning in n*n array
+        fun:        fun(t,y) gives dy/dt, returning in n array
+        jac:        jac(t,y) gives dfun/dy, returning in n*n array
+        linsolver:  linear solver object, see `make_linsolver`
 
     METHODS:
         judge_err:          given estimated y and yhat, judge if the error is within atol and rtol
         take_step:          propogate y by a step of size h, also return a flag indicating convergence
         solve_step_fixed:   solve the ode on n-division of t_span, also return a flag indicating convergence
+                            stops early at the first terminal event
         solve:              iterate on n_step and each time calls `solve_step_fixed`,
                             at the meantime evaluate the solutions until it meets `judge_err`,
                             return the final time grid and the ys,
@@ -63,9 +114,14 @@ class SemiImplicitExtrapolation:
                             warns when it cannot converge to required accuracy within max_step
     '''
 
-    def __init__(self, fun, jac):
+    f_sol = None
+
+    def __init__(self, fun, jac, linsolver='dense'):
         self.fun = fun
         self.jac = jac
+        self.linsolver = make_linsolver(linsolver)
+        self.t_events = None
+        self.y_events = None
 
     def judge_err(self, yhat, y, atol, rtol):
         '''prob: norm(yhat-y) < atol + rtol * norm(yhat)
@@ -77,12 +133,12 @@ class SemiImplicitExtrapolation:
     def take_step(self, h, t, y):
         '''solve: (1-h*jac).(y'-y)=h*fun
         in an implicit manner'''
-        mat_left = np.eye(len(y)) - h * self.jac(t+h, y)
         vec_right = h * self.fun(t+h, y)
 
         flag = True
         try:
-            y_step = np.linalg.solve(mat_left, vec_right)
+            self.linsolver.factorize(self.jac(t+h, y), h)
+            y_step = self.linsolver.solve(vec_right)
             y_new = y + y_step
         except np.linalg.LinAlgError: # singular matrix
             y_new = y
@@ -90,13 +146,14 @@ class SemiImplicitExtrapolation:
 
         return y_new, flag
 
-    def solve_step_fixed(self, y0, t_start, t_end, n_step):
+    def solve_step_fixed(self, y0, t_start, t_end, n_step, events=None):
 
         n_dim = len(y0)
         h = (t_end - t_start) / n_step
         t_sol = np.arange(t_start, t_end+h, h)
         y_sol = np.zeros((n_dim, n_step+1))
         y_sol[:,0] = y0
+        self._handler = None if events is None else EventHandler(events, t_start, y0)
 
         flag = True
         for i in range(1, n_step+1):
@@ -107,17 +164,30 @@ class SemiImplicitExtrapolation:
                 y_sol[:,i] = y_new
             else:
                 break
+            if self._handler is not None:
+                # first order solver, linear interpolation within the step
+                t_now = t_sol[i-1]
+                interp = lambda tt: y_now + (tt - t_now) / h * (y_new - y_now)
+                t_term, y_term = self._handler.check(t_now, t, y_new, interp)
+                if t_term is not None:
+                    if t_term > t_now:
+                        t_sol, y_sol = t_sol[:i+1].copy(), y_sol[:,:i+1]
+                        t_sol[-1], y_sol[:,-1] = t_term, y_term
+                    else:
+                        t_sol, y_sol = t_sol[:i], y_sol[:,:i]
+                    return t_sol, y_sol, flag
 
-        return t_sol, y_sol, flag
+        return t_sol[:n_step+1], y_sol, flag
 
-    def solve(self, y0, t_start, t_end, max_step=np.inf, rtol=1e-3, atol=1e-6):
+    def solve(self, y0, t_start, t_end, max_step=np.inf, rtol=1e-3, atol=1e-6, events=None):
 
         # just to start with
         n_step = 128
         flag_first = False
         while (n_step < max_step):
             t_sol, y_sol, flag_first \
-                = self.solve_step_fixed(y0, t_start, t_end, n_step)
+                = self.solve_step_fixed(y0, t_start, t_end, n_step, events)
+            handler = self._handler
             n_step *= 2
             if flag_first:
                 break
@@ -127,14 +197,16 @@ class SemiImplicitExtrapolation:
         flag_sol = False
         while (n_step < max_step):
             t_sol_new, y_sol_new, flag_new \
-                = self.solve_step_fixed(y0, t_start, t_end, n_step)
+                = self.solve_step_fixed(y0, t_start, t_end, n_step, events)
             n_step *= 2
             if not flag_new:
                 continue
             if self.judge_err(y_sol_new[:,-1], y_sol[:,-1], atol, rtol):
                 flag_sol = True
                 break
-            t_sol, y_sol = t_sol_new, y_sol_new
+            t_sol, y_sol, handler = t_sol_new, y_sol_new, self._handler
+        if handler is not None:
+            self.t_events, self.y_events = handler.get_events()
 
         if not flag_sol:
             warnings.warn('''The ode solver has reached its max_step, '''
@@ -143,9 +215,898 @@ class SemiImplicitExtrapolation:
         return t_sol, y_sol
 
 
+class Rosenbrock:
+
+    '''Rosenbrock (linearly implicit Runge-Kutta) ode solver, ROS4
+
+    4 stages, 4th order, with an embedded 3rd order solution for error estimation.
+    the parameter set is Shampine's (Kaps-Rentrop type, A-stable).
+    the jacobian is evaluated and I-gamma*h*jac is factorized once per step, all the
+    stages then reuse this one factorization.
+
+    ATTRIBUTES:
+        fun:        fun(t,y) gives dy/dt, returning in n array
+        jac:        jac(t,y) gives dfun/dy, returning in n*n array
+        linsolver:  linear solver object, see `make_linsolver`
+        t_sol:      time grid of the last solve
+        t_events:   list of arrays, times of the events of the last solve, None if no events
+        y_events:   list of arrays, ys at those events
+        f_sol:      dy/dt on the time grid of the last solve, for Hermite dense output
+        h_last:     the step size proposed at the end of the last solve
+        stats:      dict, counters of nfev, njev, nlu, n_accepted, n_rejected
+
+    METHODS:
+        error_norm:     rms norm of the error estimate, scaled by atol + rtol * |y|
+        take_step:      propogate y by a step of size h, return the new y and the error norm
+        initial_step:   guess the first step size from the scales of y and dy/dt
+        solve:          march from t_start to t_end with adaptive steps,
+                        return the final time grid and the ys
+    '''
+
+    gamma = 1/2
+    a = [[], [2.], [48/25, 6/25], [48/25, 6/25, 0.]]
+    c = [[], [-8.], [372/25, 12/5], [-112/125, -54/125, -2/5]]
+    b = [19/9, 1/2, 25/108, 125/108]
+    e = [17/54, 7/36, 0., 125/108]
+    alpha = [0., 1., 3/5, 3/5]
+    gamma_t = [1/2, -3/2, 121/50, 29/250]
+    order = 4
+
+    def __init__(self, fun, jac, linsolver='dense'):
+        self.fun = fun
+        self.jac = jac
+        self.linsolver = make_linsolver(linsolver)
+        self.t_sol = None
+        self.f_sol = None
+        self.h_last = None
+        self.t_events = None
+        self.y_events = None
+        self.stats = dict(nfev=0, njev=0, nlu=0, n_accepted=0, n_rejected=0)
+
+    def error_norm(self, err, y, y_new, atol, rtol):
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        return np.sqrt(np.mean((err / scale)**2))
+
+    def _fun(self, t, y):
+        self.stats['nfev'] += 1
+        return np.asarray(self.fun(t, y), dtype=float)
+
+    def take_step(self, h, t, y, f, atol, rtol, dfdt=0.0):
+        '''stages: (I-gamma*h*jac).g_i = gamma*h*(f_i + h*gamma_t_i*dfdt + sum_j c_ij*g_j/h)
+        where f_i is fun evaluated at y + sum_j a_ij*g_j, then y_new = y + sum_i b_i*g_i'''
+        self.stats['njev'] += 1
+        self.stats['nlu'] += 1
+        self.linsolver.factorize(self.jac(t, y), self.gamma * h)
+
+        g = []
+        f_stage = f
+        for i in range(len(self.b)):
+            if i > 0 and not self._same_point(i):
+                y_stage = y + sum(a_ij * g_j for a_ij, g_j in zip(self.a[i], g))
+                f_stage = self._fun(t + self.alpha[i] * h, y_stage)
+            rhs = f_stage + h * self.gamma_t[i] * dfdt
+            rhs = rhs + sum(c_ij * g_j for c_ij, g_j in zip(self.c[i], g)) / h
+            g.append(self.linsolver.solve(self.gamma * h * rhs))
+
+        y_new = y + sum(b_i * g_i for b_i, g_i in zip(self.b, g))
+        err = sum(e_i * g_i for e_i, g_i in zip(self.e, g))
+        return y_new, self.error_norm(err, y, y_new, atol, rtol)
+
+    def _accept_step(self):
+        '''called when a step gets accepted, for inheritors that carry extra states'''
+        pass
+
+    def _same_point(self, i):
+        '''whether stage i evaluates fun at the same point as stage i-1'''
+        return (self.alpha[i] == self.alpha[i-1] 
+                and self.a[i][:i-1] == self.a[i-1] and not any(self.a[i][i-1:]))
+
+    def initial_step(self, t, y, f, t_end, atol, rtol):
+        scale = atol + rtol * np.abs(y)
+        d0 = np.sqrt(np.mean((y / scale)**2))
+        d1 = np.sqrt(np.mean((f / scale)**2))
+        h = 1e-6 if (d0 < 1e-5 or d1 < 1e-5) else 0.01 * d0 / d1
+        return min(h, abs(t_end - t))
+
+    def solve(self, y0, t_start, t_end, max_step=np.inf, rtol=1e-3, atol=1e-6,
+              first_step=None, autonomous=False, events=None, output=None):
+        '''march from t_start to t_end, y0 at t_start
+
+        INPUTS:
+            first_step:     float, initial step size, guessed by `initial_step` if None
+            autonomous:     boolean, if True fun is taken as independent of t,
+                            which saves the evaluation of dfun/dt, defaults False
+            events:         event functions, located on the Hermite interpolant of each step,
+                            a terminal event ends the solve at the located root
+            output:         object with method append(t, y, f), e.g. HermiteOutput, if given 
+                            the accepted steps are streamed into it instead of being kept, and
+                            None, None is returned
+        '''
+
+        t, y = t_start, np.array(y0, dtype=float)
+        f = self._fun(t, y)
+        handler = None if events is None else EventHandler(events, t, y)
+        h = first_step if first_step is not None else self.initial_step(t, y, f, t_end, atol, rtol)
+        h_min = 16 * np.spacing(max(abs(t_start), abs(t_end)))
+
+        t_sol, y_sol, f_sol, record = _recorder(output)
+        record(t, y, f)
+        n_step = 0
+        while t < t_end:
+            if n_step >= max_step:
+                warnings.warn('''The ode solver has reached its max_step, '''
+                              '''but the solution has not reached t_end.''')
+                break
+            h = min(h, t_end - t)
+            if t + h >= t_end - h_min:
+                h = t_end - t
+
+            if autonomous:
+                dfdt = 0.0
+            else:
+                delta = np.sqrt(np.finfo(float).eps) * max(abs(t), h)
+                dfdt = (self._fun(t + delta, y) - f) / delta
+
+            try:
+                y_new, err = self.take_step(h, t, y, f, atol, rtol, dfdt)
+            except np.linalg.LinAlgError: # singular matrix, cut the step
+                err = np.inf
+                y_new = y
+
+            if err <= 1.0:
+                t_old, y_old, f_old = t, y, f
+                t = t_end if h == t_end - t else t + h
+                y = y_new
+                self._accept_step()
+                f = self._fun(t, y)
+                if handler is not None:
+                    interp = hermite_interp(t_old, y_old, f_old, t, y, f)
+                    t_term, y_term = handler.check(t_old, t, y, interp)
+                    if t_term is not None:
+                        t_end = t_term
+                        if t_term <= t_old:
+                            break
+                        t, y = t_term, y_term
+                        f = self._fun(t, y)
+                record(t, y, f)
+                n_step += 1
+                self.stats['n_accepted'] += 1
+                factor = 5.0 if err == 0 else min(5.0, 0.9 * err**(-1/self.order))
+            else:
+                self.stats['n_rejected'] += 1
+                factor = 0.2 if not np.isfinite(err) else max(0.2, 0.9 * err**(-1/(self.order-1)))
+            h = h * factor
+            if h < h_min:
+                raise np.linalg.LinAlgError('Step size has become too small to continue.')
+
+        self.h_last = h
+        if handler is not None:
+            self.t_events, self.y_events = handler.get_events()
+        return self._finish(t_sol, y_sol, f_sol, output)
+
+    def _finish(self, t_sol, y_sol, f_sol, output):
+        if output is not None:
+            # the trajectory is held by output, which may not keep it in memory at all
+            self.t_sol = self.f_sol = None
+            return None, None
+        self.t_sol = np.array(t_sol)
+        self.f_sol = np.array(f_sol).T
+        return self.t_sol, np.array(y_sol).T
+
+
+class RosenbrockSensitivity(Rosenbrock):
+
+    '''ROS4 solver that also integrates the forward sensitivities S = dy/dp
+
+        S' = jac.S + dfdp,  S(t_start) = s0
+
+    the steps are ROS4 steps of the augmented system (y, S), whose jacobian is block
+    lower triangular,
+
+        [[jac, 0], [d(jac.S + dfdp)/dy, jac]]
+
+    so the stages of y are solved first, then the stages of S, which is linear in S, with
+    the same factorization of I-gamma*h*jac, all the params being handled at once as 
+    multiple right hand sides. the off-diagonal block is applied to each stage of y by a
+    directional difference of jac.S + dfdp, which keeps S at the order of the scheme.
+    the error control is on y only, unless `sens_err` is set.
+
+    ATTRIBUTES:
+        dfdp:       dfdp(t,y) gives dfun/dp, returning in n*p array
+        sens_err:   boolean, whether S also enters the error control, defaults False
+        s_sol:      n*p array, S at the end of the last solve
+        other attributes follow Rosenbrock
+
+    METHODS:
+        take_step:  propogate y and S by a step of size h
+        solve:      same as Rosenbrock.solve, with s0 (n*p array, defaults zeros) as 
+                    the initial sensitivities. events are not supported.
+    '''
+
+    def __init__(self, fun, jac, dfdp, linsolver='dense', sens_err=False):
+        super().__init__(fun, jac, linsolver)
+        self.dfdp = dfdp
+        self.sens_err = sens_err
+        self.s_sol = None
+        self._autonomous = False
+
+    def _accept_step(self):
+        self._s = self._s_new
+
+    def _fun_s(self, t, y, s):
+        '''jac.S + dfdp, the right hand side of the sensitivities'''
+        self.stats['njev'] += 1
+        return self.jac(t, y).dot(s) + np.asarray(self.dfdp(t, y), dtype=float)
+
+    def take_step(self, h, t, y, f, atol, rtol, dfdt=0.0):
+        jac = self.jac(t, y)
+        self.stats['njev'] += 1
+        self.stats['nlu'] += 1
+        self.linsolver.factorize(jac, self.gamma * h)
+
+        s = self._s
+        dfdp = np.asarray(self.dfdp(t, y), dtype=float)
+        fun_s = jac.dot(s) + dfdp
+        eps = np.sqrt(np.finfo(float).eps)
+        if self._autonomous:
+            dsdt = 0.0
+        else:
+            # partial d(jac.S + dfdp)/dt, at fixed y and S, as dfdt
+            delta = eps * max(abs(t), h)
+            dsdt = (self._fun_s(t + delta, y, s) - fun_s) / delta
+
+        def coupling(g_i):
+            '''d(jac.S + dfdp)/dy . g_i, by a directional difference'''
+            norm = np.sqrt(np.sum(g_i**2))
+            if norm == 0:
+                return np.zeros(s.shape)
+            delta = eps * (1 + np.sqrt(np.sum(y**2))) / norm
+            return (self._fun_s(t, y + delta * g_i, s) - fun_s) / delta
+
+        g, gs = [], []
+        f_stage, fun_s_stage = f, fun_s
+        for i in range(len(self.b)):
+            s_stage = s + sum(a_ij * g_j for a_ij, g_j in zip(self.a[i], gs))
+            if i > 0 and not self._same_point(i):
+                t_stage = t + self.alpha[i] * h
+                y_stage = y + sum(a_ij * g_j for a_ij, g_j in zip(self.a[i], g))
+                f_stage = self._fun(t_stage, y_stage)
+                fun_s_stage = self._fun_s(t_stage, y_stage, s_stage)
+            rhs = f_stage + h * self.gamma_t[i] * dfdt
+            rhs = rhs + sum(c_ij * g_j for c_ij, g_j in zip(self.c[i], g)) / h
+            g.append(self.linsolver.solve(self.gamma * h * rhs))
+
+            rhs_s = fun_s_stage + h * self.gamma_t[i] * dsdt + coupling(g[-1])
+            rhs_s = rhs_s + sum(c_ij * g_j for c_ij, g_j in zip(self.c[i], gs)) / h
+            gs.append(self.linsolver.solve(self.gamma * h * rhs_s))
+
+        y_new = y + sum(b_i * g_i for b_i, g_i in zip(self.b, g))
+        err = self.error_norm(sum(e_i * g_i for e_i, g_i in zip(self.e, g)), y, y_new, atol, rtol)
+        self._s_new = s + sum(b_i * g_i for b_i, g_i in zip(self.b, gs))
+        if self.sens_err:
+            err_s = sum(e_i * g_i for e_i, g_i in zip(self.e, gs))
+            err = max(err, self.error_norm(err_s, s, self._s_new, atol, rtol))
+        return y_new, err
+
+    def solve(self, y0, t_start, t_end, max_step=np.inf, rtol=1e-3, atol=1e-6,
+              first_step=None, autonomous=False, s0=None):
+        if s0 is None:
+            n_param = np.shape(self.dfdp(t_start, np.asarray(y0, dtype=float)))[1]
+            s0 = np.zeros((len(y0), n_param))
+        self._s = np.array(s0, dtype=float)
+        self._autonomous = autonomous
+        t_sol, y_sol = super().solve(
+            y0, t_start, t_end, max_step, rtol, atol, first_step, autonomous)
+        self.s_sol = self._s
+        return t_sol, y_sol
+
+
+class Rodas3(Rosenbrock):
+
+    '''Rosenbrock ode solver RODAS3, 4 stages, 3rd order, with an embedded 2nd order solution
+
+    L-stable and stiffly accurate (Sandu et al. 1997), so unlike ROS4 it keeps its order on
+    stiff components driven by a time-dependent forcing. same interface as Rosenbrock.
+    '''
+
+    gamma = 1/2
+    a = [[], [0.], [2., 0.], [2., 0., 1.]]
+    c = [[], [4.], [1., -1.], [1., -1., -8/3]]
+    b = [2., 0., 1., 1.]
+    e = [0., 0., 0., 1.]
+    alpha = [0., 0., 1., 1.]
+    gamma_t = [1/2, 3/2, 0., 0.]
+    order = 3
+
+
+class Multirate(Rosenbrock):
+
+    '''multirate ROS4 solver, for problems whose components split into a few fast ones
+    and many slow ones, so that only the fast ones take small steps
+
+    each macro step [t, t+H]
+        predicts the slow components by extrapolating the cubic Hermite interpolant of the
+        previous macro step (by an Euler step on the first one), so the jacobian of the
+        whole system is never evaluated nor factorized,
+        integrates the fast components over [t, t+H] by RODAS3 with their own adaptive 
+        micro steps, the slow components following the prediction,
+        corrects the slow components by 3-point Gauss-Legendre quadrature of their rates 
+        along the fast trajectory.
+    the macro step is controlled by the difference of the predicted and the corrected slow
+    components, and the micro steps by the embedded error estimate on the fast ones, so 
+    both groups of the coupled result are error-controlled.
+    the slow components are treated explicitly, so they should not be stiff themselves.
+    each macro step costs 4 evaluations of the whole fun and only factorizations of the 
+    fast block, so it pays off when the factorization of the whole system dominates the
+    cost of ROS4, e.g. for a large densely coupled slow block and a few stiff components.
+    on sparse systems, where ROS4 with the 'sparse' linsolver factorizes cheaply, the python
+    overhead of the micro steps usually makes it slower than ROS4.
+
+    ATTRIBUTES:
+        idx_fast:   list of int, indices of the fast components of the last solve
+        stats:      dict, counters of nfev, njev, nlu of the whole system, n_accepted, 
+                    n_rejected of the macro steps, and n_micro, nfev_fast of the fast ones
+        other attributes follow Rosenbrock
+
+    METHODS:
+        solve:      same as Rosenbrock.solve, with the fast components given by idx_fast, and
+                    optionally their rates fun_fast(t,y) and jacobian jac_fast(t,y) on the whole
+                    y, cheaper than slicing fun and jac. events are not supported.
+    '''
+
+    gauss_nodes = [1/2 - np.sqrt(15)/10, 1/2, 1/2 + np.sqrt(15)/10]
+    gauss_weights = [5/18, 4/9, 5/18]
+
+    def solve(self, y0, t_start, t_end, max_step=np.inf, rtol=1e-3, atol=1e-6,
+              first_step=None, autonomous=False, idx_fast=None, fun_fast=None, jac_fast=None,
+              output=None):
+        y0 = np.array(y0, dtype=float)
+        n = len(y0)
+        idx_fast = [] if idx_fast is None else sorted(int(i) for i in idx_fast)
+        self.idx_fast = idx_fast
+        self.stats.update(n_micro=0, nfev_fast=0)
+        if len(idx_fast) == 0 or len(idx_fast) == n:
+            return super().solve(
+                y0, t_start, t_end, max_step, rtol, atol, first_step, autonomous, output=output)
+        # index arrays, as the macro and micro steps scatter into the whole y at every call
+        idx_slow, idx_fast = np.setdiff1d(np.arange(n), idx_fast), np.array(idx_fast)
+        if fun_fast is None:
+            fun_fast = lambda t, y: np.asarray(self.fun(t, y), dtype=float)[idx_fast]
+        if jac_fast is None:
+            jac_fast = lambda t, y: _dense(self.jac(t, y))[np.ix_(idx_fast, idx_fast)]
+        atol = np.broadcast_to(np.asarray(atol, dtype=float), (n,))
+        atol_s, atol_f = atol[idx_slow], atol[idx_fast]
+
+        t, y = t_start, y0
+        f = self._fun(t, y)
+        H = first_step if first_step is not None else \
+            self.initial_step(t, y[idx_slow], f[idx_slow], t_end, atol_s, rtol)
+        H_min = 16 * np.spacing(max(abs(t_start), abs(t_end)))
+        h_micro, prev = None, None
+
+        t_sol, y_sol, f_sol, record = _recorder(output)
+        record(t, y, f)
+        n_step = 0
+        while t < t_end:
+            if n_step >= max_step:
+                warnings.warn('''The ode solver has reached its max_step, '''
+                              '''but the solution has not reached t_end.''')
+                break
+            H = min(H, t_end - t)
+            if t + H >= t_end - H_min:
+                H = t_end - t
+            t_new = t_end if H == t_end - t else t + H
+
+            try:
+                step = self._macro_step(
+                    t, t_new, y, f, prev, idx_slow, idx_fast, fun_fast, jac_fast, 
+                    rtol, atol_s, atol_f, h_micro)
+                err = step['err']
+            except np.linalg.LinAlgError: # singular matrix or stalled micro steps, cut the step
+                err = np.inf
+
+            if err <= 1.0:
+                prev = (t, y[idx_slow], f[idx_slow])
+                t, y, f = t_new, step['y'], step['f']
+                h_micro = step['h_micro']
+                for point in zip(step['t_micro'], step['y_micro'], step['f_micro']):
+                    record(*point)
+                n_step += 1
+                self.stats['n_accepted'] += 1
+                factor = 5.0 if err == 0 else min(5.0, 0.9 * err**(-1/self.order))
+            else:
+                self.stats['n_rejected'] += 1
+                factor = 0.2 if not np.isfinite(err) else max(0.2, 0.9 * err**(-1/(self.order-1)))
+            H = H * factor
+            if H < H_min:
+                raise np.linalg.LinAlgError('Step size has become too small to continue.')
+
+        self.h_last = H
+        return self._finish(t_sol, y_sol, f_sol, output)
+
+    def _macro_step(self, t, t_new, y, f, prev, idx_slow, idx_fast, fun_fast, jac_fast, 
+                    rtol, atol_s, atol_f, h_micro):
+        '''one macro step, returns the new y, f, the error norm of the slow components, and
+        the micro grid with the whole y and dy/dt on it, for the dense output'''
+        H = t_new - t
+        y_s, f_s = y[idx_slow], f[idx_slow]
+        if prev is None:
+            slow = lambda tau: y_s + (tau - t) * f_s
+        else:
+            slow = hermite_interp(*prev, t, y_s, f_s)
+        y_pred = slow(t_new)
+        if not np.all(np.isfinite(y_pred)):
+            raise np.linalg.LinAlgError('The predicted slow components are not finite.')
+
+        def whole(tau, y_f):
+            y_tau = np.empty(len(y))
+            y_tau[idx_slow] = slow(tau)
+            y_tau[idx_fast] = y_f
+            return y_tau
+
+        def fun_micro(tau, y_f):
+            return fun_fast(tau, whole(tau, y_f))
+
+        # RODAS3, since ROS4 suffers from order reduction on the fast components driven by
+        # the interpolated slow ones (a Prothero-Robinson type problem)
+        micro = Rodas3(fun_micro, lambda tau, y_f: jac_fast(tau, whole(tau, y_f)))
+        t_micro, y_micro = micro.solve(
+            y[idx_fast], t, t_new, rtol=rtol, atol=atol_f, 
+            first_step=None if h_micro is None else min(h_micro, H))
+        self.stats['n_micro'] += micro.stats['n_accepted']
+        self.stats['nfev_fast'] += micro.stats['nfev']
+        fast = scipy.interpolate.CubicHermiteSpline(t_micro, y_micro.T, micro.f_sol.T)
+
+        y_corr = np.array(y_s)
+        for node, weight in zip(self.gauss_nodes, self.gauss_weights):
+            tau = t + node * H
+            y_corr += H * weight * self._fun(tau, whole(tau, fast(tau)))[idx_slow]
+        scale = atol_s + rtol * np.maximum(np.abs(y_s), np.abs(y_corr))
+        err = np.sqrt(np.mean(((y_corr - y_pred) / scale)**2))
+
+        y_new = np.empty(len(y))
+        y_new[idx_slow], y_new[idx_fast] = y_corr, y_micro[:, -1]
+        f_new = self._fun(t_new, y_new)
+        slow = scipy.interpolate.CubicHermiteSpline(
+            [t, t_new], [y_s, y_corr], [f_s, f_new[idx_slow]])
+        dslow = slow.derivative()
+        y_grid, f_grid = [], []
+        for k in range(1, len(t_micro) - 1):
+            y_k, f_k = np.empty(len(y)), np.empty(len(y))
+            y_k[idx_slow], y_k[idx_fast] = slow(t_micro[k]), y_micro[:, k]
+            f_k[idx_slow], f_k[idx_fast] = dslow(t_micro[k]), micro.f_sol[:, k]
+            y_grid.append(y_k)
+            f_grid.append(f_k)
+        return dict(
+            y=y_new, f=f_new, err=err, h_micro=micro.h_last,
+            t_micro=list(t_micro[1:]), y_micro=y_grid + [y_new], f_micro=f_grid + [f_new])
+
+
+def _dense(mat):
+    '''dense array of a jacobian, which may be a scipy.sparse matrix or a JacobianOperator'''
+    if isinstance(mat, JacobianOperator):
+        mat = mat.assemble()
+    if scipy.sparse.issparse(mat):
+        return mat.toarray()
+    return np.asarray(mat)
+
+
+def solve_adjoint(fun, jac, quad, t_span, y0, weights, rtol=1e-6, atol=1e-9, atol_adjoint=None, 
+                  linsolver='dense', n_checkpoints=1, autonomous=False, events=None):
+    '''gradient of a scalar objective of y(t_final) w.r.t. all params by the continuous adjoint
+
+        lam' = -jac^T.lam,  lam(t_final) = weights(t_final, y(t_final))
+        dG/dp = lam(t_start).dy0/dp + int_{t_start}^{t_final} lam^T.dfdp dt
+
+    the forward pass is solved by ROS4 in n_checkpoints segments of equal length, keeping only
+    the state and step size at the start of every segment. the adjoint is then solved by ROS4 
+    backward in time, segment by segment, each forward segment being recomputed from its 
+    checkpoint and interpolated by its Hermite dense output. the integral is taken by 3-point 
+    Gauss-Legendre quadrature on every backward step. with a single segment nothing is recomputed.
+
+    INPUTS:
+        fun:            fun(t,y) gives dy/dt, returning in n array
+        jac:            jac(t,y) gives dfun/dy, in n*n array or scipy.sparse matrix
+        quad:           quad(t,y,lam) gives lam^T.dfdp, returning in p array
+        t_span:         tuple of float, (t_start, t_end)
+        y0:             n array, y at t_start
+        weights:        weights(t,y) gives dG/dy at the end of the forward pass, in n array
+        rtol, atol:     error tolerances of the forward pass, also rtol of the adjoint
+        atol_adjoint:   absolute tolerance of the adjoint, defaults rtol*1e-3*max|lam(t_final)|
+        linsolver:      'dense' or 'sparse', see `make_linsolver`
+        n_checkpoints:  int, number of forward segments, defaults 1
+        autonomous:     boolean, whether fun is independent of t, defaults False
+        events:         event functions of the forward pass, a terminal event sets t_final
+    OUTPUTS:
+        res:            dict, with keys
+                        't_final', 'y_final': end of the forward pass, 
+                        'lam': n array, lam at t_start, 
+                        'grad': p array, the integral term of dG/dp
+    '''
+    if linsolver not in ['dense', 'sparse']:
+        raise ValueError('''Linear solver \'{}\' is not supported by the adjoint.'''.format(linsolver))
+    t_start, t_end = t_span
+    grid = np.linspace(t_start, t_end, int(n_checkpoints) + 1)
+    forward = Rosenbrock(fun, jac, linsolver)
+
+    # forward pass, keeping the checkpoints and the dense data of the last segment
+    checkpoints = []
+    y, h = np.array(y0, dtype=float), None
+    for k in range(len(grid) - 1):
+        checkpoints.append((grid[k], y, h))
+        t_sol, y_sol = forward.solve(
+            y, grid[k], grid[k+1], rtol=rtol, atol=atol, 
+            first_step=h, autonomous=autonomous, events=events)
+        segment = (t_sol, y_sol, forward.f_sol)
+        y, h = y_sol[:, -1], forward.h_last
+        if t_sol[-1] < grid[k+1]: # terminated by an event
+            break
+    t_final, y_final = t_sol[-1], y
+    ends = [c[0] for c in checkpoints[1:]] + [t_final]
+
+    lam = np.array(weights(t_final, y_final), dtype=float)
+    if atol_adjoint is None:
+        atol_adjoint = rtol * 1e-3 * max(np.max(np.abs(lam)), np.finfo(float).tiny)
+    nodes = 0.5 + np.sqrt(15) / 10 * np.array([-1., 0., 1.])
+    node_weights = np.array([5., 8., 5.]) / 18
+    grad, h_adj = None, None
+    for k in reversed(range(len(checkpoints))):
+        t_k, y_k, h_k = checkpoints[k]
+        if k != len(checkpoints) - 1:
+            t_sol, y_sol = forward.solve(
+                y_k, t_k, ends[k], rtol=rtol, atol=atol, first_step=h_k, autonomous=autonomous)
+            segment = (t_sol, y_sol, forward.f_sol)
+        if ends[k] <= t_k:
+            continue
+        t_sol, y_sol, f_sol = segment
+        dense = scipy.interpolate.CubicHermiteSpline(t_sol, y_sol.T, f_sol.T, axis=0)
+
+        # in reversed time s = t_final - t, lam solves dlam/ds = jac^T.lam
+        jac_adj = lambda s, lam: jac(t_final - s, dense(t_final - s)).T
+        fun_adj = lambda s, lam: jac_adj(s, lam).dot(lam)
+        backward = Rosenbrock(fun_adj, jac_adj, linsolver)
+        s_sol, lam_sol = backward.solve(
+            lam, t_final - ends[k], t_final - t_k, rtol=rtol, atol=atol_adjoint, first_step=h_adj)
+        lam_f = backward.f_sol
+        for j in range(len(s_sol) - 1):
+            interp = hermite_interp(
+                s_sol[j], lam_sol[:, j], lam_f[:, j], s_sol[j+1], lam_sol[:, j+1], lam_f[:, j+1])
+            h_step = s_sol[j+1] - s_sol[j]
+            for x, w in zip(nodes, node_weights):
+                s_node = s_sol[j] + x * h_step
+                t_node = t_final - s_node
+                term = w * h_step * np.asarray(quad(t_node, dense(t_node), interp(s_node)), dtype=float)
+                grad = term if grad is None else grad + term
+        lam, h_adj = lam_sol[:, -1], backward.h_last
+
+    if grad is None:
+        grad = np.zeros(np.shape(quad(t_start, np.array(y0, dtype=float), lam)))
+    return dict(t_final=t_final, y_final=y_final, lam=lam, grad=grad)
+
+
+def _recorder(output):
+    '''lists of the grid, ys and dy/dts, and the function recording a point, into output if 
+    given, otherwise into the lists'''
+    if output is not None:
+        return None, None, None, output.append
+    t_sol, y_sol, f_sol = [], [], []
+    def record(t, y, f):
+        t_sol.append(t)
+        y_sol.append(y)
+        f_sol.append(f)
+    return t_sol, y_sol, f_sol, record
+
+
+def hermite_interp(t0, y0, f0, t1, y1, f1):
+    '''returns the cubic Hermite interpolant y(t) over one step [t0, t1]'''
+    h = t1 - t0
+    def interp(t):
+        x = (t - t0) / h
+        return ((1 + 2*x) * (1 - x)**2 * y0 + x * (1 - x)**2 * h * f0 
+                + x**2 * (3 - 2*x) * y1 + x**2 * (x - 1) * h * f1)
+    return interp
+
+
+class EventHandler:
+    '''detects the zero crossings of event functions step by step
+
+    events follow the conventions of scipy.integrate.solve_ivp: event(t,y) gives a float,
+    an optional attribute `terminal` (defaults False) asks to stop at the first crossing,
+    an optional attribute `direction` (defaults 0) restricts the crossings to be counted:
+    >0 for negative-to-positive, <0 for positive-to-negative, 0 for both.
+
+    METHODS:
+        check:      given a step from t_old to t_new and the interpolant of y within the step,
+                    refine every crossing by brentq, record them in time order,
+                    return (t, y) of the first terminal crossing, or (None, None)
+        get_events: return t_events, y_events, lists of arrays, one per event function
+    '''
+
+    def __init__(self, events, t0, y0):
+        if callable(events):
+            events = [events]
+        self.events = list(events)
+        self.terminal = [bool(getattr(ev, 'terminal', False)) for ev in self.events]
+        self.direction = [float(getattr(ev, 'direction', 0)) for ev in self.events]
+        self.g = [ev(t0, y0) for ev in self.events]
+        self.t_events = [[] for _ in self.events]
+        self.y_events = [[] for _ in self.events]
+
+    def check(self, t_old, t_new, y_new, interp):
+        g_new = [ev(t_new, y_new) for ev in self.events]
+        found = []
+        for i, ev in enumerate(self.events):
+            up = self.g[i] < 0 and g_new[i] >= 0
+            down = self.g[i] > 0 and g_new[i] <= 0
+            if (up and self.direction[i] >= 0) or (down and self.direction[i] <= 0):
+                if g_new[i] == 0:
+                    t_root = t_new
+                else:
+                    t_root = scipy.optimize.brentq(
+                        lambda t: ev(t, interp(t)), t_old, t_new, 
+                        xtol=4*np.finfo(float).eps*max(abs(t_old), abs(t_new)))
+                found.append((t_root, i))
+        self.g = g_new
+
+        for t_root, i in sorted(found):
+            y_root = y_new if t_root == t_new else interp(t_root)
+            self.t_events[i].append(t_root)
+            self.y_events[i].append(y_root)
+            if self.terminal[i]:
+                return t_root, y_root
+        return None, None
+
+    def get_events(self):
+        t_events = [np.array(t) for t in self.t_events]
+        y_events = [np.array(y) for y in self.y_events]
+        return t_events, y_events
+
+
+def steady_state_event(fun, tol):
+    '''returns a terminal event that fires when norm(fun(t,y)) drops below tol
+    it needs a downward crossing, so the caller checks whether the norm is below tol at the
+    initial point already
+
+    INPUTS:
+        fun:    fun(t,y) gives dy/dt, returning in n array
+        tol:    float, threshold on the 2-norm of dy/dt
+    OUTPUTS:
+        event:  event function, with terminal=True and direction=-1
+    '''
+    def event(t, y):
+        return np.sqrt(np.sum(np.asarray(fun(t, y))**2)) - tol
+    event.terminal = True
+    event.direction = -1
+    return event
+
+
+def make_linsolver(linsolver):
+    '''returns a linear solver object for (I-gamma*jac).x = b
+
+    INPUTS:
+        linsolver:  str, one of 'dense', 'sparse', 'krylov', or an object that 
+                    already implements `factorize` and `solve`
+    OUTPUTS:
+        linear solver object
+    '''
+    if isinstance(linsolver, str):
+        if linsolver not in _linsolver_dict:
+            raise ValueError(
+                '''Linear solver \'{}\' is not applicable. '''
+                '''Currently support: {}'''.format(linsolver, ', '.join(sorted(_linsolver_dict))) )
+        return _linsolver_dict[linsolver]()
+    return linsolver
+
+
+class DenseLinearSolver:
+    '''solves (I-gamma*jac).x = b by dense LU factorization
+
+    METHODS:
+        factorize:  factorizes I-gamma*jac, raises LinAlgError if it is singular
+        solve:      solves for x with the last factorization, b can be n array or n*k array
+    '''
+
+    def __init__(self):
+        self._lu = None
+
+    def factorize(self, jac, gamma):
+        if scipy.sparse.issparse(jac):
+            jac = jac.toarray()
+        mat = np.eye(len(jac)) - gamma * np.asarray(jac)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', scipy.linalg.LinAlgWarning)
+            lu, piv = scipy.linalg.lu_factor(mat, check_finite=False)
+        if np.any(np.diag(lu) == 0):
+            raise np.linalg.LinAlgError('Singular matrix')
+        self._lu = (lu, piv)
+        return self
+
+    def solve(self, b):
+        return scipy.linalg.lu_solve(self._lu, b, check_finite=False)
+
+
+class SparseLinearSolver:
+    '''solves (I-gamma*jac).x = b by sparse LU factorization (scipy.sparse.linalg.splu)
+
+    the first factorization computes a fill-reducing column ordering (COLAMD by default),
+    which is then cached and reused for every following matrix of the same sparsity pattern,
+    so that only the numerical factorization is repeated.
+
+    ATTRIBUTES:
+        permc_spec: str, fill-reducing ordering passed to splu, defaults 'COLAMD'
+        n_order:    int, number of times the ordering has been computed
+
+    METHODS:
+        factorize:  factorizes I-gamma*jac, raises LinAlgError if it is singular
+        solve:      solves for x with the last factorization, b can be n array or n*k array
+    '''
+
+    def __init__(self, permc_spec='COLAMD'):
+        self.permc_spec = permc_spec
+        self.n_order = 0
+        self._pattern = None
+        self._col_order = None
+        self._lu = None
+
+    def factorize(self, jac, gamma):
+        jac = scipy.sparse.csc_matrix(jac)
+        mat = scipy.sparse.identity(jac.shape[0], format='csc') - gamma * jac
+        mat.sort_indices()
+        try:
+            if not self._same_pattern(mat):
+                lu = scipy.sparse.linalg.splu(mat, permc_spec=self.permc_spec)
+                self._pattern = (mat.indptr.copy(), mat.indices.copy())
+                self._col_order = np.argsort(lu.perm_c)
+                self.n_order += 1
+                self._lu, self._permuted = lu, False
+            else:
+                lu = scipy.sparse.linalg.splu(
+                    mat[:, self._col_order], permc_spec='NATURAL')
+                self._lu, self._permuted = lu, True
+        except RuntimeError as err: # exactly singular factor
+            raise np.linalg.LinAlgError(str(err))
+        return self
+
+    def solve(self, b):
+        z = self._lu.solve(np.asarray(b, dtype=float))
+        if not self._permuted:
+            return z
+        x = np.empty_like(z)
+        x[self._col_order] = z
+        return x
+
+    def _same_pattern(self, mat):
+        if self._pattern is None:
+            return False
+        indptr, indices = self._pattern
+        return (np.array_equal(indptr, mat.indptr) 
+                and np.array_equal(indices, mat.indices))
+
+
+class JacobianOperator(scipy.sparse.linalg.LinearOperator):
+    '''matrix-free jacobian, a scipy LinearOperator that only knows jacobian-vector products
+
+    ATTRIBUTES:
+        shape:      2-tuple, (n, n)
+        jvp:        jvp(v) gives jac.v, returning in n array
+        assemble:   optional, assemble() gives the jacobian in a scipy.sparse matrix,
+                    only called when a preconditioner has to be (re)built
+    '''
+
+    def __init__(self, shape, jvp, assemble=None):
+        super().__init__(dtype=float, shape=shape)
+        self.jvp = jvp
+        self.assemble = assemble
+
+    def _matvec(self, v):
+        return self.jvp(np.ravel(v))
+
+
+class KrylovLinearSolver:
+    '''solves (I-gamma*jac).x = b by GMRES, without assembling I-gamma*jac
+
+    an incomplete LU factorization of I-gamma*jac is used as preconditioner.
+    it is cached across factorizations, and only gets rebuilt when GMRES 
+    needs more than `refresh_iter` iterations, or fails to converge.
+
+    ATTRIBUTES:
+        tol:            float, relative residual tolerance of GMRES, defaults 1e-8
+        restart:        int, GMRES restart, defaults 30
+        maxiter:        int, max GMRES outer iterations, defaults 20
+        refresh_iter:   int, iteration count beyond which the preconditioner is refreshed, defaults 15
+        drop_tol:       float, drop tolerance of the incomplete LU (spilu), defaults 1e-5
+        n_precond:      int, number of times the preconditioner has been built
+        n_iter:         int, iterations taken by the last solve
+
+    METHODS:
+        factorize:  takes in the operator I-gamma*jac, no factorization is done
+                    unless the preconditioner is due for a refresh
+        solve:      solves for x by preconditioned GMRES, b can be n array or n*k array
+    '''
+
+    def __init__(self, tol=1e-8, restart=30, maxiter=20, refresh_iter=15, drop_tol=1e-5):
+        self.tol = tol
+        self.restart = restart
+        self.maxiter = maxiter
+        self.refresh_iter = refresh_iter
+        self.drop_tol = drop_tol
+        self.n_precond = 0
+        self.n_iter = 0
+        self._stale = True
+        self._precond = None
+
+    def factorize(self, jac, gamma):
+        if not isinstance(jac, scipy.sparse.linalg.LinearOperator):
+            jac = scipy.sparse.csc_matrix(jac)
+        self._jac, self._gamma = jac, gamma
+        n = jac.shape[0]
+        self._op = scipy.sparse.linalg.LinearOperator(
+            (n, n), matvec=lambda v: np.ravel(v) - gamma * jac.dot(np.ravel(v)), dtype=float)
+        if self._stale:
+            self._build_precond()
+        return self
+
+    def solve(self, b):
+        b = np.asarray(b, dtype=float)
+        if b.ndim == 2:
+            return np.column_stack([self.solve(b[:,i]) for i in range(b.shape[1])])
+        x, info = self._gmres(b)
+        if info != 0:
+            self._build_precond()
+            x, info = self._gmres(b)
+            if info != 0:
+                raise np.linalg.LinAlgError('GMRES cannot converge.')
+        self._stale = self._stale or (self.n_iter > self.refresh_iter)
+        return x
+
+    def _gmres(self, b):
+        self.n_iter = 0
+        def count(_):
+            self.n_iter += 1
+        kwargs = dict(restart=self.restart, maxiter=self.maxiter, M=self._precond, 
+                      callback=count, callback_type='pr_norm', atol=0.0)
+        try:
+            return scipy.sparse.linalg.gmres(self._op, b, rtol=self.tol, **kwargs)
+        except TypeError: # scipy < 1.12 names it `tol`
+            return scipy.sparse.linalg.gmres(self._op, b, tol=self.tol, **kwargs)
+
+    def _build_precond(self):
+        jac = self._jac
+        if isinstance(jac, JacobianOperator):
+            jac = jac.assemble() if jac.assemble is not None else None
+        elif isinstance(jac, scipy.sparse.linalg.LinearOperator):
+            jac = None
+        self._stale = False
+        if jac is None:
+            self._precond = None
+            return
+        mat = scipy.sparse.identity(jac.shape[0], format='csc') - self._gamma * scipy.sparse.csc_matrix(jac)
+        try:
+            ilu = scipy.sparse.linalg.spilu(mat, drop_tol=self.drop_tol)
+            self._precond = scipy.sparse.linalg.LinearOperator(mat.shape, matvec=ilu.solve, dtype=float)
+        except RuntimeError: # singular factor, go without preconditioner
+            self._precond = None
+        self.n_precond += 1
+
+
+_linsolver_dict = dict(
+    dense=DenseLinearSolver,
+    sparse=SparseLinearSolver,
+    krylov=KrylovLinearSolver,
+)
+
+
+_solver_dict = dict(
+    SIE=SemiImplicitExtrapolation,
+    ROS4=Rosenbrock,
+    MR=Multirate,
+)
+
+
 class DenseOutput:
     '''the output class of solve_ivp
-    creates an interplation of what was returned by solver methods'''
+    creates an interplation of what was returned by solver methods
+    if dy/dt is provided on the time grid, it is a cubic Hermite interpolation'''
 
     def __init__(self, interpolater):
         self.interp = interpolater
@@ -153,11 +1114,253 @@ class DenseOutput:
         self.y = None
         self.f = None
 
-    def fit(self, t_sol, y_sol):
+    def fit(self, t_sol, y_sol, f_sol=None):
         self.t = t_sol
         self.y = y_sol
-        self.f = self.interp(t_sol, y_sol.T)
+        if f_sol is None:
+            self.f = self.interp(t_sol, y_sol.T)
+        else:
+            self.f = scipy.interpolate.CubicHermiteSpline(t_sol, y_sol.T, f_sol.T)
         return self
 
     def sol(self, t):
         return self.f(t).T
+
+
+class HermiteOutput:
+    '''memory-lean dense output of solve_ivp, a piecewise cubic Hermite interpolant
+
+    the ys and dy/dts are stored on the time grid only, optionally for a subset of the 
+    components and in a smaller dtype (e.g. float32), and each query evaluates the cubic
+    Hermite polynomials of its own segment, so that no interpolant object is built. with a
+    window, only the last `window` of the trajectory is kept, in a buffer that is compacted
+    in place, so that memory stays bounded however long the solve.
+
+    ATTRIBUTES:
+        idx:        list of int, the stored components, None for all of them
+        dtype:      numpy dtype of the stored ys and dy/dts, the times are kept in float
+        window:     float, the length of the trajectory kept, None for all of it
+        t:          array, the kept time grid
+        y:          n_kept*n_t array, the kept ys
+        dydt:       n_kept*n_t array, the kept dy/dts
+        y_last:     n array, the last appended y, of all the components, in float
+        trimmed:    boolean, whether the start of the trajectory was dropped by the window
+
+    METHODS:
+        append:     store the y and dy/dt at time t, later than the last one
+        sol:        the interpolated ys at t, ValueError before the kept window
+        from_arrays: the output of a stored trajectory
+
+    >>> out = HermiteOutput(idx=[1], dtype=np.float32, window=1.0)
+    >>> for t in np.linspace(0, 3, 31):
+    ...     out.append(t, np.array([t, t**2]), np.array([1, 2*t]))
+    >>> out.y.dtype, out.t[0] <= 2.0 < out.t[1]
+    (dtype('float32'), True)
+    >>> print(round(float(out.sol(2.55)[0]), 4))
+    6.5025
+    '''
+
+    def __init__(self, idx=None, dtype=float, window=None, capacity=64):
+        if window is not None and window <= 0:
+            raise ValueError("window = {}: should be positive.".format(window))
+        self.idx = None if idx is None else list(idx)
+        self.dtype = np.dtype(dtype)
+        self.window = window
+        self.y_last = None
+        self._capacity = max(2, int(capacity))
+        self._t = None
+        self._y = self._f = None
+        self._start = self._stop = 0
+        self._trimmed = False
+
+    @classmethod
+    def from_arrays(cls, t, y, dydt, idx=None, trimmed=False):
+        '''the output of a stored trajectory, t of n_t, y and dydt of n_kept*n_t, trimmed 
+        whether its start was dropped by a window'''
+        output = cls(idx=idx, dtype=np.asarray(y).dtype, capacity=len(t))
+        output._t = np.array(t, dtype=float)
+        output._y = np.ascontiguousarray(np.asarray(y).T)
+        output._f = np.ascontiguousarray(np.asarray(dydt).T)
+        output._stop = len(output._t)
+        output._trimmed = bool(trimmed)
+        return output
+
+    @property
+    def trimmed(self):
+        return self._trimmed
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def t(self):
+        return self._t[self._start:self._stop]
+
+    @property
+    def y(self):
+        return self._y[self._start:self._stop].T
+
+    @property
+    def dydt(self):
+        return self._f[self._start:self._stop].T
+
+    def append(self, t, y, f):
+        y = np.asarray(y, dtype=float)
+        self.y_last = y.copy()
+        y_kept = y if self.idx is None else y[self.idx]
+        f_kept = np.asarray(f, dtype=float)
+        f_kept = f_kept if self.idx is None else f_kept[self.idx]
+        if self._t is None:
+            self._t = np.empty(self._capacity)
+            self._y = np.empty((self._capacity, len(y_kept)), dtype=self.dtype)
+            self._f = np.empty((self._capacity, len(y_kept)), dtype=self.dtype)
+        if self._stop == len(self._t):
+            self._make_room()
+        self._t[self._stop] = t
+        self._y[self._stop] = y_kept
+        self._f[self._stop] = f_kept
+        self._stop += 1
+        if self.window is not None:
+            # keep one point at or before the start of the window, so that it is covered
+            cutoff = t - self.window
+            while self._stop - self._start > 2 and self._t[self._start+1] <= cutoff:
+                self._start += 1
+                self._trimmed = True
+
+    def _make_room(self):
+        '''compact the buffer if at least half of it was dropped, otherwise double it'''
+        n = self._stop - self._start
+        if self._start >= len(self._t) // 2:
+            for arr in [self._t, self._y, self._f]:
+                arr[:n] = arr[self._start:self._stop]
+        else:
+            self._t = np.concatenate([self._t[self._start:self._stop], np.empty(n)])
+            self._y = np.concatenate([self._y[self._start:self._stop], np.empty_like(self._y[:n])])
+            self._f = np.concatenate([self._f[self._start:self._stop], np.empty_like(self._f[:n])])
+        self._start, self._stop = 0, n
+
+    def sol(self, t):
+        '''
+        INPUTS:
+            t:  float or array of float
+        OUTPUTS:
+            y:  n_kept array, or n_kept*len(t) array, in float
+        '''
+        t_grid = self.t
+        t_query = np.atleast_1d(np.asarray(t, dtype=float))
+        if self._trimmed and np.any(t_query < t_grid[0]):
+            raise ValueError(
+                "t = {}: before the kept window, which starts at {}.".format(np.min(t_query), t_grid[0]))
+        if len(t_grid) == 1:
+            y = np.repeat(self._y[self._start:self._stop].astype(float), len(t_query), axis=0).T
+            return y[:, 0] if np.ndim(t) == 0 else y
+        i = np.clip(np.searchsorted(t_grid, t_query, side='right') - 1, 0, len(t_grid) - 2)
+        h = t_grid[i+1] - t_grid[i]
+        x = np.divide(t_query - t_grid[i], h, out=np.zeros_like(t_query), where=h > 0)
+        y0, y1 = self._y[self._start + i].T, self._y[self._start + i + 1].T
+        f0, f1 = self._f[self._start + i].T, self._f[self._start + i + 1].T
+        y = ((1 + 2*x) * (1 - x)**2 * y0 + x * (1 - x)**2 * h * f0 
+             + x**2 * (3 - 2*x) * y1 + x**2 * (x - 1) * h * f1)
+        return y[:, 0] if np.ndim(t) == 0 else y
+
+
+class TrajectorySampler:
+    '''output of solve_ivp that samples the trajectory at given times only
+
+    the samples within each accepted step are taken on the cubic Hermite interpolant of the
+    step, as the steps come, and nothing else of the trajectory is stored.
+
+    ATTRIBUTES:
+        t_eval:     array, the sampling times, sorted
+        t:          array, the sampling times reached so far
+        t_last:     float, the time of the last step
+        h_first:    float, the size of the first step, None before it
+        y:          n*n_t array, the samples on t, a view of the transpose of samples
+        samples:    len(t_eval)*n C-contiguous array, filled up to len(t)
+        y_last:     n array, the last appended y
+
+    METHODS:
+        append:     take the step to time t with its y and dy/dt, and sample within it
+    '''
+
+    def __init__(self, t_eval):
+        self.t_eval = np.asarray(t_eval, dtype=float)
+        if np.any(np.diff(self.t_eval) < 0):
+            raise ValueError("t_eval should be sorted in increasing order.")
+        self.samples = None
+        self.y_last = None
+        self.dydt = None
+        self.t_last = None
+        self.h_first = None
+        self._n = 0
+        self._last = None
+
+    @property
+    def t(self):
+        return self.t_eval[:self._n]
+
+    @property
+    def y(self):
+        return self.samples[:self._n].T
+
+    def append(self, t, y, f):
+        y = np.asarray(y, dtype=float)
+        f = np.asarray(f, dtype=float)
+        if self.samples is None:
+            self.samples = np.zeros((len(self.t_eval), len(y)))
+        n_new = self._n + int(np.searchsorted(self.t_eval[self._n:], t, side='right'))
+        if self._last is None:
+            self.samples[self._n:n_new] = y
+        elif n_new > self._n:
+            interp = hermite_interp(*self._last, t, y, f)
+            self.samples[self._n:n_new] = interp(self.t_eval[self._n:n_new, None])
+        if self.t_last is not None and self.h_first is None:
+            self.h_first = t - self.t_last
+        self._n = n_new
+        self._last = (t, y, f)
+        self.y_last = y
+        self.t_last = t
+
+
+def solve_ivp_scipy(fun, t_span, y0, method, output, events=None, **options):
+    '''integrates by a scipy.integrate solver (e.g. 'LSODA', 'BDF', 'Radau') step by step, 
+    streaming the accepted steps into output, a HermiteOutput, instead of keeping the
+    interpolant of every step as scipy.integrate.solve_ivp(dense_output=True) does
+
+    INPUTS:
+        fun:        fun(t,y) gives dy/dt
+        t_span:     2-tuple of float
+        y0:         n array
+        method:     str, name of a scipy.integrate.OdeSolver
+        output:     HermiteOutput
+        events:     event functions, same conventions as solve_ivp, located on the local
+                    interpolant of each step
+        options:    other keyword options of the solver, e.g. rtol, atol, jac, first_step
+    OUTPUTS:
+        output:     the output, with attributes t_events, y_events, status (0 if t_span[1] 
+                    was reached, 1 by a terminal event, -1 if the solver failed), message,
+                    h_last (the last step size)
+    '''
+    solver = getattr(scipy.integrate, method)(fun, t_span[0], np.array(y0, dtype=float), t_span[1], **options)
+    handler = None if events is None else EventHandler(events, solver.t, solver.y)
+    output.append(solver.t, solver.y, fun(solver.t, solver.y))
+    output.status, output.message = 0, 'The solver successfully reached the end of the integration interval.'
+    while solver.status == 'running':
+        t_old = solver.t
+        message = solver.step()
+        if solver.status == 'failed':
+            warnings.warn('The ode solver failed: {}'.format(message))
+            output.status, output.message = -1, message
+            break
+        t, y = solver.t, solver.y
+        if handler is not None:
+            t_term, y_term = handler.check(t_old, t, y, solver.dense_output())
+            if t_term is not None:
+                output.status, output.message = 1, 'A termination event occurred.'
+                if t_term > t_old:
+                    output.append(t_term, y_term, fun(t_term, y_term))
+                break
+        output.append(t, y, fun(t, y))
+    output.t_events, output.y_events = (None, None) if handler is None else handler.get_events()
+    output.h_last = solver.step_size
+    return output
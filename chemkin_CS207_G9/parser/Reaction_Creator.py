@@ -1,4 +1,5 @@
 
+from itertools import islice
 from chemkin_CS207_G9.parser.xml2dict import xml2dict
 from chemkin_CS207_G9.parser.database_query import CoeffQuery
 from chemkin_CS207_G9.reaction.Reaction import Reaction
@@ -6,16 +7,20 @@ from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
 
 def Reaction_Creator(path_xml, path_sql, start = None, end = None):
     reader = xml2dict()
-    reader.parse(path_xml)
-    info = reader.get_info()
-    species = info[0]
-    reactions = [Reaction(**r) for r in info[1]]
     cq = CoeffQuery(path_sql)
 
     if end is None or start is None:
-        rs = ReactionSystem(reactions, species, nasa_query = cq)
-        
+        # the arrays go straight into the system, no Reaction object is built
+        rs = ReactionSystem.from_arrays(reader.parse_arrays(path_xml), nasa_query = cq)
+
+    elif start >= 0 and end >= 0:
+        # only the selected reactions are instantiated, the rest of the file is not read
+        reactions = [Reaction(**r) for r in islice(reader.iterparse(path_xml), start, end)]
+        rs = ReactionSystem(reactions, nasa_query = cq)
+
     else:
-        rs = ReactionSystem(reactions[start:end], nasa_query = cq)
-    
-    return rs                              
\ No newline at end of file
+        # only the selected reactions are instantiated, from the arrays of the whole file
+        reactions = ReactionSystem.from_arrays(reader.parse_arrays(path_xml)).get_reactions()[start:end]
+        rs = ReactionSystem(reactions, nasa_query = cq)
+
+    return rs
@@ -1,6 +1,8 @@
 
 #Written by Baptiste Lemaire
 import xml.etree.ElementTree as ET
+import numpy as np
+import scipy.sparse
 
 class xml2dict:
     """
@@ -27,6 +29,17 @@ class xml2dict:
         of reactions, stored into the array self.Species, and all the information
         about every reaction, stored into self.ListDictionaries
         
+    iterparse(self, file):
+        same as parse, but streams the XML file and yields the dictionary of every
+        reaction one at a time, without keeping the tree nor the list in memory
+        OUTPUTS: generator of dict
+        
+    parse_arrays(self, file, sparse=False):
+        streams the XML file into the compact array form of the system of reactions,
+        without building a dictionary per reaction
+        OUTPUTS: dict, with the species, the stoichiometric matrices nu_1 and nu_2, and
+        an array per reaction attribute and per coefficient of the kinetic laws
+        
     get_info(self):
         return the array self.Species containing the names of the species involved
         and the list of dictionaries self.ListDictionaries
@@ -41,62 +54,124 @@ class xml2dict:
     """
 
     def parse(self, file):
-        self.file = file
-        tree = ET.parse(file)
-        root = tree.getroot()
+        self.ListDictionaries = list(self.iterparse(file))
+        return self
 
-        SpeciesArray=root.find('phase').find('speciesArray')
-        self.Species = SpeciesArray.text.strip().split(" ")
-    
-        self.ListDictionaries = []
-    
-        #Now: go through every reaction to read the features:
-    
-        for reaction in root.find('reactionData').findall('reaction'):
-        
-            #Initialization of the variables
-        
+    def iterparse(self, file):
+        '''
+        INPUTS:
+            file:   str or file object, the XML file
+        OUTPUTS:
+            generator of dict, the information about every reaction, as in self.ListDictionaries.
+            self.Species is set once the speciesArray has been read.
+        '''
+        for reaction in self._stream(file):
+            reactants, Nup = _split_stoich(reaction.find('reactants').text)
+            products, Nupp = _split_stoich(reaction.find('products').text)
+            law = list(reaction.find('rateCoeff'))[-1]
             Dict = {}
-            reactants = []
-            products = []
-            Nup = []
-            Nupp = []
-        
-            ListReactants = reaction.find('reactants').text.split()
-            for elementsR in ListReactants:
-                specie, nu = elementsR.split(':')
-                reactants.append(specie)
-                Nup.append(int(nu))
-            ListProducts = reaction.find('products').text.split()
-            for elementsP in ListProducts:
-                specie, nu = elementsP.split(':')
-                products.append(specie)
-                Nupp.append(int(nu))
-            for name in reaction.find('rateCoeff'):
-                Law = name.tag
-                ListCoeffTag = []
-                ListCoeffValue = []
-                for coeff in name:
-                    ListCoeffTag.append(coeff.tag)
-                    ListCoeffValue.append(float(coeff.text))
-                #    if len(coeff.attrib) != 0:
-                #        ListCoeffUnits.append(coeff.attrib['units'])
-                #    else:
-                #        ListCoeffUnits.append('dimensionless')
-            Dict['coeffParams'] = dict(zip(ListCoeffTag, ListCoeffValue))
-            #Dict['coeffUnits'] = dict(zip(ListCoeffTag,ListCoeffUnits))
+            Dict['coeffParams'] = {coeff.tag: float(coeff.text) for coeff in law}
             Dict['ID'] = reaction.attrib['id']
             Dict['reversible'] = reaction.attrib['reversible']
             Dict['TYPE'] = reaction.attrib['type']
             Dict['reactants'] = dict(zip(reactants, Nup))
             Dict['products'] = dict(zip(products, Nupp))
-            Dict['coeffLaw'] = Law
-            self.ListDictionaries.append(Dict)
+            Dict['coeffLaw'] = law.tag
+            yield Dict
 
-        return self
+    def parse_arrays(self, file, sparse=False):
+        '''
+        INPUTS:
+            file:   str or file object, the XML file, its speciesArray coming before the reactions
+            sparse: boolean, whether nu_1, nu_2 are returned as scipy.sparse.csc_matrix, defaults False
+        OUTPUTS:
+            mechanism: dict, with keys
+                'species':      list of str, the N species of the speciesArray
+                'ID', 'TYPE':   list of str, of the M reactions
+                'reversible':   M array of bool
+                'coeffLaw':     list of str, the tag of the rate coefficient law of each reaction
+                'coeffParams':  dict, M array of float for every coefficient tag met, nan for the
+                                reactions whose law has no such coefficient
+                'nu_1', 'nu_2': N*M array of float, stoichiometric coefficients of the reactants and
+                                the products, as ReactionSystem.get_nu_1(), get_nu_2()
+        '''
+        ID, TYPE, reversible, coeffLaw = [], [], [], []
+        coeffParams = {}
+        nu = {'reactants': ([], [], []), 'products': ([], [], [])}
+        index = None
+        for m, reaction in enumerate(self._stream(file)):
+            if index is None:
+                if self.Species is None:
+                    raise ValueError("Reaction {} comes before the speciesArray.".format(reaction.attrib['id']))
+                index = {sp: i for i, sp in enumerate(self.Species)}
+            ID.append(reaction.attrib['id'])
+            TYPE.append(reaction.attrib['type'])
+            if reaction.attrib['reversible'] not in ['yes', 'no']:
+                raise ValueError('reversible = "{}": should be "yes" or "no".'.format(reaction.attrib['reversible']))
+            reversible.append(reaction.attrib['reversible'] == 'yes')
+            for tag, (rows, cols, values) in nu.items():
+                for sp, n in zip(*_split_stoich(reaction.find(tag).text)):
+                    if sp not in index:
+                        raise ValueError('Species = "{}". Not in the speciesArray.'.format(sp))
+                    rows.append(index[sp])
+                    cols.append(m)
+                    values.append(n)
+            law = list(reaction.find('rateCoeff'))[-1]
+            coeffLaw.append(law.tag)
+            for coeff in law:
+                coeffParams.setdefault(coeff.tag, {})[m] = float(coeff.text)
+
+        if self.Species is None:
+            raise ValueError("No speciesArray in {}.".format(file))
+        N, M = len(self.Species), len(ID)
+        mechanism = dict(species=self.Species, ID=ID, TYPE=TYPE, reversible=np.array(reversible, dtype=bool),
+                         coeffLaw=coeffLaw)
+        mechanism['coeffParams'] = {}
+        for tag, values in coeffParams.items():
+            mechanism['coeffParams'][tag] = np.full(M, np.nan)
+            mechanism['coeffParams'][tag][list(values)] = list(values.values())
+        for tag, key in [('reactants', 'nu_1'), ('products', 'nu_2')]:
+            rows, cols, values = nu[tag]
+            # duplicated species in a reaction are summed up
+            mechanism[key] = scipy.sparse.csc_matrix((np.array(values, dtype=float), (rows, cols)), shape=(N, M))
+            if not sparse:
+                mechanism[key] = mechanism[key].toarray()
+        return mechanism
+
+    def _stream(self, file):
+        '''the reaction elements of the XML file, one at a time. each of them is cleared and dropped
+        from the tree once consumed, so that the memory used does not grow with the number of reactions'''
+        self.file = file
+        self.Species = None
+        stack = []
+        for event, elem in ET.iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                continue
+            stack.pop()
+            if not stack:
+                break
+            parent = stack[-1]
+            if elem.tag == 'speciesArray' and parent.tag == 'phase' and self.Species is None \
+                    and len(stack) == 2:
+                self.Species = elem.text.strip().split()
+            elif elem.tag == 'reaction' and parent.tag == 'reactionData' and len(stack) == 2:
+                yield elem
+                elem.clear()
+                parent.remove(elem)
     
     def get_info(self):
         return self.Species, self.ListDictionaries
     
     def __repr__(self):
         return str(self.Species) + ' ' + str(self.ListDictionaries)
+
+
+def _split_stoich(text):
+    '''species and stoichiometric coefficients of e.g. "H:1 O2:1", in two lists'''
+    species, nus = [], []
+    for elements in text.split():
+        specie, nu = elements.split(':')
+        species.append(specie)
+        nus.append(int(nu))
+    return species, nus
@@ -31,8 +31,7 @@ def plot_concentration(reac_sys, time_grid, logscale=False, species=None, ax=Non
         species = list(reac_sys.get_species())
 
     concs_initial = dict(reac_sys.get_concs())
-    res_evo = reac_sys.evolute(t_end)
-    concs_evo = res_evo(time_grid)
+    concs_evo = reac_sys.evolute(t_end, t_eval=time_grid)
 
     if ax is None:
         ax = plt.subplot()
@@ -76,18 +75,17 @@ def plot_reaction_rate(reac_sys, time_grid, logscale=False, species=None, ax=Non
         species = list(reac_sys.get_species())
 
     concs_initial = dict(reac_sys.get_concs())
-    res_evo = reac_sys.evolute(t_end)
-    rates_evo = {sp:[] for sp in reac_sys.get_species()}
-    for t in time_grid:
-        reac_sys.set_concs(res_evo(t))
-        rate = reac_sys.get_reac_rate()
-        for sp,r in zip(reac_sys.get_species(), rate):
-            rates_evo[sp].append(r)
+    concs_evo = reac_sys.evolute(t_end, t_eval=time_grid)
+    nu = reac_sys.get_nu_2() - reac_sys.get_nu_1()
+    rates_evo = np.empty_like(concs_evo.concs)
+    for n, concs in enumerate(concs_evo.concs):
+        rate_f, rate_b = reac_sys.compute_prog_rates(np.maximum(concs, 0))
+        rates_evo[n] = nu.dot(rate_f - rate_b)
 
     if ax is None:
         ax = plt.subplot()
     for sp in species:
-        rates = rates_evo[sp]
+        rates = rates_evo[:, concs_evo.index[sp]]
         if logscale:
             rates = np.log10(rates)
         ax.plot(time_grid, rates, label=sp, **options)
@@ -242,9 +242,9 @@ class HierarchicalRSGraph(RSGraph):
     set_edges(self, g, reaction, color, node_prefix = ""):
         Generates the edges for a reaction. Edges are dotted for Reactant to Product and filled for product to reactant.
 
-    save_evolution_mp4(self, solver_step_size = 1e-14, timesteps=5, path="HGRSVideo")L:
-        Generates and saves and mp4 with the evolution of the system on n timesteps, 
-        with an ODE step size defined by the user. 
+    save_evolution_movie(self, solver_step_size = None, timesteps=5, path="HGRSVideo", format='gif', colors=None, system=True):
+        Generates and saves a gif or mp4 with the evolution of the system on n timesteps, 
+        with an ODE step size defined by the user, or derived from the timescales of the system. 
     
     EXAMPLES
     ========
@@ -396,14 +396,21 @@ class HierarchicalRSGraph(RSGraph):
         return g
                     
     
-    def save_evolution_movie(self, solver_step_size = 1e-14, timesteps=5, path="HGRSVideo", format = 'gif', colors = None, system=True):
+    def save_evolution_movie(self, solver_step_size = None, timesteps=5, path="HGRSVideo", format = 'gif', colors = None, system=True):
         """
         Generates and saves an mp4 with the evolution of the system on n timesteps, 
-        with an ODE step size defined by the user. 
+        with an ODE step size defined by the user. Each frame advances the system
+        by solver_step_size from the previous one (see ReactionSystem.advance).
+        If solver_step_size is None, the frames span the slowest timescale of the system
+        (see ReactionSystem.estimate_stiffness), and the solver is chosen automatically.
         """
+        if solver_step_size is None:
+            stiffness = self.rs.estimate_stiffness()
+            tau = stiffness['tau_slow'] if np.isfinite(stiffness['tau_slow']) else stiffness['tau_fast']
+            solver_step_size = (tau if np.isfinite(tau) else 1.0) / timesteps
         clip_paths = []        
         for n in range(timesteps):
-            self.rs.evolute(solver_step_size)
+            self.rs.advance(self.rs.get_time() + solver_step_size, method='auto')
             if system:
                 self.plot_system(method = 'png', path = path + "_img"+str(n), colors=self.color_list,view=False)
             else:
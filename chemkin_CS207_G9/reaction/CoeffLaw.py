@@ -28,6 +28,8 @@ class Constant(MathModel):
               this notation is effective to the end of this file.
     check_coeffparams(k, **other_params): check if k is positive, raise ValueError if not.
         NOTE: calls _check_np.reponse(k)
+    compute_param_derivs(self, **other_params): 
+        derivatives of k w.r.t. lnA, b, E, where k itself plays the role of A
     _kernel(k, **other_params): mathematical relation, returns k itself.
     
     other methods follow the MathModel pattern, 
@@ -65,6 +67,9 @@ class Constant(MathModel):
         
     def compute(self, check=True, **other_params):
         return self._k
+
+    def compute_param_derivs(self, check=True, **other_params):
+        return dict(lnA=self._k, b=0.0, E=0.0)
     
     @staticmethod
     def check_coeffparams(k, **other_params):
@@ -109,7 +114,10 @@ class Arrhenius(MathModel):
         NOTE: calls _check_np.reponse() on A and R
     check_stateparams(self, T, **other_params):
         check if T is positive, raise ValueError if not
+    compute_param_derivs(self, check=True, T=1e-16, **other_params):
+        derivatives of k w.r.t. lnA, b, E. b is taken as a modified Arrhenius param at b=0
     _kernel(k, **other_params): mathematical relation.
+    _kernel_param_derivs(T, A, E, R, **other_params): derivatives of the mathematical relation.
     
     other methods follow the MathModel pattern, 
     including: get_coeffparams(...), get_defaults(...)
@@ -124,6 +132,8 @@ class Arrhenius(MathModel):
     ========
     >>> Arrhenius(A=np.e, E=8.314).compute(T=1.0)
     1.0
+    >>> round(Arrhenius(A=np.e, E=8.314).compute_param_derivs(T=1.0)['E'], 6)
+    -0.120279
     
     """
 
@@ -152,6 +162,14 @@ class Arrhenius(MathModel):
         if check: 
             self.check_stateparams(T)
         return self._kernel(T, self._A, self._E, self._R)
+
+    def compute_param_derivs(self, check=True, 
+        T = _default_settings['stateparams']['T'], 
+        **other_params
+    ):
+        if check: 
+            self.check_stateparams(T)
+        return self._kernel_param_derivs(T, self._A, self._E, self._R)
     
     def check_stateparams(self, T, **other_params):
         self._check_np.response(T, 'T', 'temperature')
@@ -165,6 +183,11 @@ class Arrhenius(MathModel):
     def _kernel(T, A, E, R, **other_params):
         return A * (np.e ** (-E / (R * T)))
 
+    @staticmethod
+    def _kernel_param_derivs(T, A, E, R, **other_params):
+        k = Arrhenius._kernel(T, A, E, R)
+        return dict(lnA=k, b=k*np.log(T), E=-k/(R*T))
+
     
     
 # ================================================================================ #
@@ -204,7 +227,10 @@ class modArrhenius(MathModel):
         NOTE: calls _check_np.reponse() on A and R
     check_stateparams(self, T, **other_params):
         check if T is positive, raise ValueError if not
+    compute_param_derivs(self, check=True, T=1e-16, **other_params):
+        derivatives of k w.r.t. lnA, b, E
     _kernel(k, **other_params): mathematical relation.
+    _kernel_param_derivs(T, A, b, E, R, **other_params): derivatives of the mathematical relation.
     
     other methods follow the MathModel pattern, 
     including: get_coeffparams(...), get_defaults(...)
@@ -219,6 +245,8 @@ class modArrhenius(MathModel):
     ========
     >>> modArrhenius(A=np.e, b=-1.0, E=4.157).compute(T=0.5)
     2.0
+    >>> modArrhenius(A=np.e, b=-1.0, E=4.157).compute_param_derivs(T=0.5)['lnA']
+    2.0
 
     """
 
@@ -248,6 +276,14 @@ class modArrhenius(MathModel):
         if check: 
             self.check_stateparams(T)
         return self._kernel(T, self._A, self._b, self._E, self._R)
+
+    def compute_param_derivs(self, check=True, 
+        T = _default_settings['stateparams']['T'], 
+        **other_params
+    ):
+        if check: 
+            self.check_stateparams(T)
+        return self._kernel_param_derivs(T, self._A, self._b, self._E, self._R)
     
     def check_stateparams(self, T, **other_params):
         self._check_np.response(T, 'T', 'temperature')
@@ -261,6 +297,11 @@ class modArrhenius(MathModel):
     def _kernel(T, A, b, E, R, **other_params):
         return A * (T ** b) * (np.e ** (-E / (R * T)))
 
+    @staticmethod
+    def _kernel_param_derivs(T, A, b, E, R, **other_params):
+        k = modArrhenius._kernel(T, A, b, E, R)
+        return dict(lnA=k, b=k*np.log(T), E=-k/(R*T))
+
 
 
 
@@ -0,0 +1,247 @@
+import heapq
+import time
+import numpy as np
+import scipy.sparse
+
+
+class DRGEP:
+    """
+    Mechanism reduction by the directed relation graph with error propagation (DRGEP)
+
+    the direct coupling of species A to species B is evaluated on states sampled from
+    evolute trajectories,
+
+        r_AB = |sum_m nu_Am * w_m * delta_Bm| / max(P_A, C_A)
+
+    where w_m is the net progress rate of reaction m, delta_Bm is 1 if B takes part in
+    reaction m, and P_A, C_A are the total production and consumption rates of A.
+    the overall interaction of a target T with a species B is the max over the paths
+    from T to B of the product of the couplings along the path, which is then maximized
+    over all the sampled states. species interacting with every target below a threshold
+    are removed, together with all the reactions they take part in.
+
+
+    ATTRIBUTES
+    ===========
+    reac_sys:       ReactionSystem, the detailed mechanism
+    t_bound:        float, end time of the sampled evolutions
+    initial_concs:  list of dict, initial concentrations of the sampled evolutions
+    times:          array of float, the sampling times of each evolution
+    samples:        list of array, concentrations of each evolution on the sampling times,
+                    each in len(times)*N array
+    time_full:      float, wall time of the evolutions of the detailed mechanism, in seconds
+
+
+    METHODS
+    ========
+    interaction(self, targets):
+        overall interaction coefficients of the targets with every species
+        OUTPUTS: N array of float, 1 for the targets
+
+    reduce(self, targets, threshold=None, error_tol=0.05):
+        reduce the mechanism, by the given threshold, or by the largest threshold whose
+        error on the targets is within error_tol
+        OUTPUTS: ReactionSystem, and dict of the report
+
+    evaluate(self, reduced, targets):
+        evolute the reduced mechanism from the sampled initial concentrations, and
+        compare the targets with the detailed ones
+        OUTPUTS: dict of errors on the targets, and the wall time in seconds
+
+
+    EXAMPLES
+    ========
+    >>> from chemkin_CS207_G9.reaction.Reaction import Reaction
+    >>> from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+    >>> reactions = [
+    ...     Reaction(reactants=dict(A=1), products=dict(B=1), coeffLaw='Constant', coeffParams=dict(k=1.0)),
+    ...     Reaction(reactants=dict(C=1), products=dict(D=1), coeffLaw='Constant', coeffParams=dict(k=1.0))]
+    >>> rs = ReactionSystem(reactions, initial_concs=dict(A=1.0, B=0.0, C=1.0, D=0.0))
+    >>> reduced, report = DRGEP(rs, 1.0, n_samples=5).reduce(['B'], threshold=1e-3)
+    >>> reduced.get_species()
+    ['A', 'B']
+    >>> report['n_reactions']
+    (2, 1)
+
+    """
+
+    def __init__(self, reac_sys, t_bound, initial_concs=None, n_samples=50, **options):
+        '''
+        INPUTS:
+            reac_sys:       ReactionSystem, the detailed mechanism
+            t_bound:        float, end time of the sampled evolutions
+            initial_concs:  list of dict, initial concentrations of the sampled evolutions,
+                            defaults the current concentrations of reac_sys
+            n_samples:      int, number of sampled states per evolution, at t=0 and on a
+                            log-spaced grid over [1e-6*t_bound, t_bound], defaults 50
+            options:        keyword options passed to reac_sys.evolute, e.g. method, rtol
+        '''
+        self.reac_sys = reac_sys
+        self.t_bound = t_bound
+        if initial_concs is None:
+            initial_concs = [dict(reac_sys.get_concs())]
+        self.initial_concs = list(initial_concs)
+        self.times = np.concatenate([[0], np.geomspace(1e-6 * t_bound, t_bound, n_samples - 1)])
+        self._options = options
+
+        species = reac_sys.get_species()
+        self.samples, self.time_full = [], 0.0
+        for concs in self.initial_concs:
+            res, time_used = self._timed_evolute(reac_sys, concs)
+            self.time_full += time_used
+            self.samples.append(np.array([[res(t)[sp] for sp in species] for t in self.times]))
+
+        nu_1, nu_2 = reac_sys.get_nu_1(), reac_sys.get_nu_2()
+        self._nu = scipy.sparse.csr_matrix(nu_2 - nu_1)
+        self._participate = scipy.sparse.csr_matrix(((nu_1 > 0) | (nu_2 > 0)).astype(float))
+
+    def _timed_evolute(self, reac_sys, concs):
+        concs_current = dict(reac_sys.get_concs())
+        reac_sys.set_concs({sp: concs[sp] for sp in reac_sys.get_species()})
+        time_start = time.perf_counter()
+        res = reac_sys.evolute(self.t_bound, **self._options)
+        time_used = time.perf_counter() - time_start
+        reac_sys.set_concs(concs_current)
+        return res, time_used
+
+    def _coupling(self, concs):
+        '''direct coupling coefficients r_AB on one state, in N*N csr matrix'''
+        rate_f, rate_b = self.reac_sys.compute_prog_rates(np.maximum(concs, 0))
+        nu_rate = self._nu.multiply((rate_f - rate_b).reshape(1, -1)).tocsr()
+        production = np.asarray(nu_rate.maximum(0).sum(axis=1)).ravel()
+        consumption = -np.asarray(nu_rate.minimum(0).sum(axis=1)).ravel()
+        scale = np.maximum(production, consumption)
+        scale[scale == 0] = np.inf
+        coupling = abs(nu_rate.dot(self._participate.T))
+        return scipy.sparse.diags(1 / scale).dot(coupling).tocsr()
+
+    def interaction(self, targets):
+        '''overall interaction coefficients R_TB, maximized over targets and sampled states
+
+        INPUTS:
+            targets:        list of str, the target species
+        OUTPUTS:
+            interaction:    N array of float, in the order of the species list
+        '''
+        species = self.reac_sys.get_species()
+        for sp in targets:
+            if sp not in species:
+                raise ValueError('Species = "{}". Not in the reaction system.'.format(sp))
+        idx_targets = [species.index(sp) for sp in targets]
+        interaction = np.zeros(len(species))
+        for sample in self.samples:
+            for concs in sample:
+                coupling = self._coupling(concs)
+                for idx in idx_targets:
+                    interaction = np.maximum(interaction, _max_product_paths(coupling, idx))
+        return interaction
+
+    def evaluate(self, reduced, targets):
+        '''compare the targets of the reduced mechanism with the detailed one
+
+        INPUTS:
+            reduced:    ReactionSystem, the reduced mechanism
+            targets:    list of str, the target species
+        OUTPUTS:
+            errors:     dict, max over the sampled times of the error on each target,
+                        relative to the max of its detailed concentrations
+            time_used:  float, wall time of the evolutions of the reduced mechanism
+        '''
+        species = self.reac_sys.get_species()
+        errors = {sp: 0.0 for sp in targets}
+        time_reduced = 0.0
+        for concs, sample in zip(self.initial_concs, self.samples):
+            res, time_used = self._timed_evolute(reduced, concs)
+            time_reduced += time_used
+            concs_reduced = [res(t) for t in self.times]
+            for sp in targets:
+                detailed = sample[:, species.index(sp)]
+                diff = np.max(np.abs([c[sp] for c in concs_reduced] - detailed))
+                scale = np.max(np.abs(detailed))
+                errors[sp] = max(errors[sp], diff / scale if scale > 0 else diff)
+        return errors, time_reduced
+
+    def _reduce_at(self, interaction, threshold):
+        '''the reduced mechanism, None if no reaction survives'''
+        species = self.reac_sys.get_species()
+        kept = interaction >= threshold
+        reaction_idx = [
+            m for m, r in enumerate(self.reac_sys.get_reactions())
+            if all(kept[species.index(sp)] for sp in r.get_species())]
+        if not reaction_idx:
+            return None
+        return self.reac_sys.subsystem(reaction_idx, [sp for sp, k in zip(species, kept) if k])
+
+    def reduce(self, targets, threshold=None, error_tol=0.05):
+        '''reduce the mechanism while keeping the targets
+
+        INPUTS:
+            targets:    list of str, the target species, always kept
+            threshold:  float, species with interaction below it are removed. if None, the
+                        largest threshold that keeps the errors within error_tol is searched for
+            error_tol:  float, tolerance of the errors on the targets, see `evaluate`,
+                        defaults 0.05
+        OUTPUTS:
+            reduced:    ReactionSystem, the reduced mechanism
+            report:     dict, with keys
+                        'n_species', 'n_reactions': tuples of the counts before and after,
+                        'threshold': the threshold used,
+                        'errors': dict of the errors on the targets,
+                        'time_full', 'time_reduced': wall times of the evolutions, in seconds,
+                        'speedup': time_full / time_reduced
+        '''
+        interaction = self.interaction(targets)
+        if threshold is None:
+            # the errors grow with the threshold, bisect over the distinct candidates
+            candidates = np.unique(interaction[interaction < 1])
+            reduced, threshold = self._reduce_at(interaction, 0.0), 0.0
+            evaluated = None
+            lo, hi = 0, len(candidates) - 1
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                trial = self._reduce_at(interaction, np.nextafter(candidates[mid], np.inf))
+                errors = None if trial is None else self.evaluate(trial, targets)
+                if errors is not None and max(errors[0].values()) <= error_tol:
+                    reduced, threshold, evaluated = trial, np.nextafter(candidates[mid], np.inf), errors
+                    lo = mid + 1
+                else:
+                    hi = mid - 1
+            if evaluated is None:
+                evaluated = self.evaluate(reduced, targets)
+        else:
+            reduced = self._reduce_at(interaction, threshold)
+            if reduced is None:
+                raise ValueError("No reaction is left at threshold = {}.".format(threshold))
+            evaluated = self.evaluate(reduced, targets)
+
+        errors, time_reduced = evaluated
+        report = dict(
+            n_species=(len(self.reac_sys.get_species()), len(reduced.get_species())),
+            n_reactions=(len(self.reac_sys), len(reduced)),
+            threshold=threshold,
+            errors=errors,
+            time_full=self.time_full,
+            time_reduced=time_reduced,
+            speedup=self.time_full / time_reduced if time_reduced > 0 else np.inf)
+        return reduced, report
+
+
+def _max_product_paths(coupling, source):
+    '''max over paths from source of the product of the couplings along the path,
+    by Dijkstra's algorithm on -log of the couplings (all of them are within [0,1])'''
+    best = np.zeros(coupling.shape[0])
+    best[source] = 1.0
+    heap = [(-1.0, source)]
+    done = np.zeros(coupling.shape[0], dtype=bool)
+    while heap:
+        value, a = heapq.heappop(heap)
+        if done[a]:
+            continue
+        done[a] = True
+        row = slice(coupling.indptr[a], coupling.indptr[a+1])
+        for b, r_ab in zip(coupling.indices[row], coupling.data[row]):
+            path = -value * min(r_ab, 1.0)
+            if path > best[b]:
+                best[b] = path
+                heapq.heappush(heap, (-path, b))
+    return best
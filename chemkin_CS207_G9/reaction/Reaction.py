@@ -59,6 +59,11 @@ class Reaction:
         INPUTS:  kwargs, non-positional, contains the updates 
         OUTPUTS: self, Reaction instance
         
+    rateCoeffParamDerivs(self, check=True, **state):
+        derivatives of the reaction rate coefficient w.r.t. the Arrhenius params lnA, b, E,
+        computed by the compute_param_derivs method of the referred coeff law
+        OUTPUTS: dict, with keys 'lnA', 'b', 'E'
+        
     getReactants(self): 
         returns the reactants in a dict
         OUTPUTS: self._params['reactants'], dict (deepcopy)
@@ -327,6 +332,10 @@ class Reaction:
     
     def get_params(self):
         return deepcopy(self._params)
+
+    def rateCoeffParamDerivs(self, check=True, **state):
+        law_model = self._CoeffLawDict._dict_all[self._params['coeffLaw']]
+        return law_model(check=False, **self._params['coeffParams']).compute_param_derivs(check, **state)
     
     def set_params(self, **kwargs):
         old_params = deepcopy(self._params)
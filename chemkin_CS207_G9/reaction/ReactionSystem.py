@@ -1,10 +1,21 @@
+import hashlib
+from collections import OrderedDict
 import numpy as np
 import scipy.integrate
+import scipy.linalg
+import scipy.sparse
+import scipy.sparse.csgraph
+from concurrent.futures import ThreadPoolExecutor
 from chemkin_CS207_G9.math.ode_solver import solve_ivp as chemkin_ivp
+from chemkin_CS207_G9.math.ode_solver import JacobianOperator, steady_state_event, make_linsolver
+from chemkin_CS207_G9.math.ode_solver import Rosenbrock, RosenbrockSensitivity, solve_adjoint
+from chemkin_CS207_G9.math.ode_solver import HermiteOutput, TrajectorySampler, solve_ivp_scipy
+from chemkin_CS207_G9.math.isat import ISATable
 
 from more_itertools import unique_everseen
 from chemkin_CS207_G9.reaction.CoeffLaw import BackwardLaw
 from chemkin_CS207_G9.reaction.Reaction import Reaction
+from chemkin_CS207_G9.reaction.Trajectory import Trajectory
 
 class ReactionSystem:
 
@@ -33,7 +44,8 @@ class ReactionSystem:
     ATTRIBUTES
     ===========
     
-    _reactions_ls: list of class Reaction, reactions included in the system
+    _reactions_ls: list of class Reaction, reactions included in the system, or a sequence 
+    building them on access for a system made by from_arrays
     
     _species_ls: list of str, concentration element
     
@@ -47,12 +59,36 @@ class ReactionSystem:
 
     _nu_2: ndarray of float, stoich coeffs for products
 
+    _reversible: ndarray of bool, reversibility of each reaction
+
+    _reac_idx, _reac_ord: ndarray, species indices and stoich coeffs of the reactants,
+    padded per reaction, used by the vectorized rate kernels (same for _prod_idx, _prod_ord)
+
+    _jac_sparsity: scipy.sparse csc matrix, sparsity pattern of the jacobian of reaction rates
+
+    _stoich_basis: ndarray of float, N*r orthonormal basis of the range of nu = nu_2 - nu_1,
+    every change of concentrations by reactions lies in this subspace. computed on first use
+    by _stoich_split, as _cons_basis
+
+    _cons_basis: ndarray of float, (N-r)*N orthonormal basis of the left null space of nu,
+    each row is a conservation law, i.e. _cons_basis.concs stays constant
+
     _nasa_query: CoeffQuery object, or object of any type with method response(...) implemented.
     an object that connect this reaction system to the database of nasa coeffs.
 
+    steady_stats: dict, iteration counts n_newton, n_ptc of the last steady_state call
+
+    _auto_choices: OrderedDict, the choices of choose_method remembered by this system, the 
+    least recently used first
+
     
     METHODS:
     ========
+    from_arrays(cls, mechanism, nasa_query=None, initial_T=273, initial_concs={}):
+            classmethod, build the system from the array form of the mechanism given by
+            xml2dict.parse_arrays(...), without building a Reaction object per reaction
+            OUTPUTS: ReactionSystem
+
     set_state(self, **kwargs): 
             set initial state Temperature kwargs['T'] and concentration kwargs['concs']
             if length of e_ls is not equal to number of concentration kwargs['concs'], raise ValueError
@@ -88,6 +124,130 @@ class ReactionSystem:
     get_reac_rate(self):
             returns the reaction rate of a system of irreversible, elementary reactions
             OUTPUTS: numpy array of floats, size: num_species, reaction rate of each specie
+
+    compile_stoich(self):
+            compiles the stoich coeffs into padded index arrays and the jacobian sparsity pattern
+            
+    compute_prog_rates(self, concs):
+            return the forward and backward progress rates on an array of concentrations
+            OUTPUTS: two m arrays of float
+
+    subsystem(self, reaction_idx, species_ls=None):
+            return a new ReactionSystem made of the given reactions, at the same temperature
+            OUTPUTS: ReactionSystem
+
+    get_jac_sparsity(self):
+            return the sparsity pattern of the jacobian, in a scipy.sparse csc matrix
+
+    compute_jac(self, concs, sparse=False):
+            return the analytic jacobian of the reaction rates on an array of concentrations
+            OUTPUTS: n*n ndarray, or scipy.sparse csc matrix if sparse
+
+    compute_jvp(self, concs, v):
+            return the jacobian-vector product jac.v, computed without assembling jac
+            OUTPUTS: n array
+
+    jac_operator(self, concs):
+            return the jacobian as a matrix-free JacobianOperator (scipy LinearOperator)
+
+    evolute(self, t_bound, method='LSODA', rtol=1e-3, atol=1e-6, sparse=False, matrix_free=False, 
+            events=None, steady_tol=None, qss=None, qss_tau=None, t_start=0, exact=True, 
+            conserve=False, fast=None, fast_tau=None, transform=None, dense_species=None, 
+            dense_dtype=None, dense_window=None, t_eval=None, writer=None, **options):
+            solve the evolution of concentrations from t=t_start to t_bound, or until a terminal event,
+            optionally with the qss species solved algebraically instead of integrated,
+            first-order linear kinetics are solved in closed form
+            OUTPUTS: function, solution(t) gives dict of concentrations, or Trajectory on t_eval
+
+    detect_qss(self, tau, concs=None):
+            return the quasi-steady-state species, detected by timescale analysis of the jacobian
+            OUTPUTS: list of str
+
+    detect_fast(self, tau, concs=None):
+            return the fast species of the multirate solver 'MR', by their lifetimes
+            OUTPUTS: list of str
+
+    fingerprint(self):
+            return a hash of the mechanism at the current temperature
+            OUTPUTS: str
+
+    estimate_stiffness(self, concs=None, n_iter=20):
+            estimate the spectral radius of the jacobian by Gershgorin bounds and power
+            iteration, and the fastest and slowest timescales
+            OUTPUTS: dict
+
+    choose_method(self, t_bound, t_start=0, rtol=1e-3, concs=None, multirate=False, refresh=False):
+            choose the ode solver and sparse for evolute(method='auto'), remembered per 
+            mechanism fingerprint
+            OUTPUTS: dict
+
+    mapping(self, dt, concs=None, gradient=False, rtol=1e-6, atol=1e-12, sparse=False):
+            return the concentrations after a time step dt, and optionally the mapping gradient
+            OUTPUTS: n array, and n*n array if gradient
+
+    isat(self, dt, eps_tol=1e-3, max_records=10000, scale=1.0, r_max=1.0, **options):
+            return an in-situ adaptive table of the mapping over dt, for repeated queries
+            OUTPUTS: ISATable
+
+    make_threshold_event(self, species, threshold, terminal=True, direction=0):
+            return an event function that fires when the concentration of species crosses threshold
+
+    get_conservation_basis(self):
+            return the conservation laws, rows of the left null space of nu
+            OUTPUTS: (N-r)*N ndarray
+
+    conservation_partition(self, concs=None):
+            split the species into independent ones and dependent ones, which are determined
+            by the conservation laws
+            OUTPUTS: lists of indices, and the linear map to the dependent concentrations
+
+    is_linear(self):
+            return whether the kinetics are first-order linear, c' = K.c
+            OUTPUTS: boolean
+
+    compute_linear_operator(self):
+            return K of the first-order linear kinetics c' = K.c, ValueError if not linear
+            OUTPUTS: n*n array
+
+    connected_components(self):
+            return the blocks of species and reactions that do not interact with each other
+            OUTPUTS: list of tuples of the species and the reaction indices
+
+    evolute_components(self, t_bound, method='LSODA', rtol=1e-3, atol=1e-6, n_workers=None, 
+            component_options=None, **options):
+            solve the evolution of each connected component as an independent subsystem, 
+            optionally in parallel threads and with per-component options
+            OUTPUTS: function, solution(t) gives dict of concentrations
+
+    advance(self, t, method='ROS4', rtol=1e-3, atol=1e-6, sparse=False, matrix_free=False, **options):
+            continue the evolution from the current time and concentrations to time t, writing
+            the final concentrations back, and carrying the solver state to the next call
+            OUTPUTS: function, solution(t) gives dict of concentrations
+
+    sweep(self, temperatures, t_bound=None, steady=False, method='ROS4', rtol=1e-3, atol=1e-6, 
+            sparse=False, store=None, **options):
+            evolutions or steady states over temperatures, each warm-started from its neighbor,
+            optionally written to a TrajectoryStore
+            OUTPUTS: list of solutions or dicts, and dict of the report
+
+    get_time(self), set_time(self, t):
+            get or set the current time of the system, advanced by `advance`
+
+    steady_state(self, rtol=1e-10, atol=1e-14, max_iter=50, guess=None, ptc=True, max_ptc_iter=1000):
+            solve reac_rate(concs) = 0 under the conservation laws set by the current concentrations
+            OUTPUTS: dict of steady-state concentrations
+
+    sensitivity(self, t_bound, params=('lnA', 'b', 'E'), normalized=False, rtol=1e-6, atol=1e-12, 
+            sparse=False, **options):
+            forward sensitivities of the concentrations at t_bound w.r.t. the Arrhenius params 
+            of every reaction, integrated along with the concentrations by ROS4
+            OUTPUTS: dict of N*M ndarray, one for each param
+
+    adjoint_gradient(self, t_bound, weights=None, event=None, params=('lnA', 'b', 'E'), rtol=1e-6, 
+            atol=1e-12, sparse=False, n_checkpoints=1):
+            gradient of a weighted sum of the concentrations at t_bound, or of the time of an event,
+            w.r.t. the Arrhenius params of every reaction, by a backward adjoint solve
+            OUTPUTS: float, the objective, and dict of M ndarray, one for each param
             
             
     EXAMPLES:
@@ -132,11 +292,45 @@ class ReactionSystem:
 
         self._nu_1 = self.compute_nu_1()
         self._nu_2 = self.compute_nu_2()
+        self.compile_stoich()
+        self._init_state(nasa_query, initial_T, initial_concs)
+
+    @classmethod
+    def from_arrays(cls, mechanism, nasa_query=None, initial_T=273, initial_concs={}):
+        '''a ReactionSystem built from the array form of the mechanism, without a Reaction object
+        per reaction
 
+        the stoich coeffs are taken as they are and the rate coefficients are computed by the 
+        coeff laws on the arrays of params. the Reaction objects are only built when they are
+        accessed, e.g. by get_reactions(), subsystem(...) or sensitivity(...)
+
+        INPUTS:
+            mechanism:      dict, as returned by xml2dict.parse_arrays(...), with keys 'species',
+                            'ID', 'TYPE', 'reversible', 'coeffLaw', 'coeffParams', 'nu_1', 'nu_2',
+                            nu_1 and nu_2 dense or scipy.sparse
+            nasa_query, initial_T, initial_concs: as in ReactionSystem(...)
+        OUTPUTS:
+            rs:             ReactionSystem, with the species in the order of mechanism['species']
+        '''
+        self = cls.__new__(cls)
+        self._reactions_ls = _ReactionArrays(mechanism)
+        self._species_ls = list(mechanism['species'])
+        self._user_defined_order = True
+        self._nu_1 = self._reactions_ls.nu_1.copy()
+        self._nu_2 = self._reactions_ls.nu_2.copy()
+        self.compile_stoich()
+        self._init_state(nasa_query, initial_T, initial_concs)
+        return self
+
+    def _init_state(self, nasa_query, initial_T, initial_concs):
+        '''the nasa query, temperature and concentrations of a new system'''
         self._nasa_query = nasa_query
         self._a = np.zeros( (len(self._species_ls), 7) )
         self._kb = np.zeros( len(self._reactions_ls) )
         self._kf = np.zeros( len(self._reactions_ls) )
+        self._t = 0.0
+        self._continuation = None
+        self._auto_choices = OrderedDict()
             
         self.set_temp(initial_T)
         if initial_concs:
@@ -164,6 +358,13 @@ class ReactionSystem:
     def get_temp(self):
         return self._T
 
+    def get_time(self):
+        return self._t
+
+    def set_time(self, t):
+        self._t = t
+        return self
+
     def get_a(self):
         return self._a
     
@@ -178,6 +379,8 @@ class ReactionSystem:
 
         if initial == True:
             self._init_concs = concs
+            self._t = 0.0
+            self._continuation = None
         self._concs = concs
     
     def get_concs(self):
@@ -213,8 +416,11 @@ class ReactionSystem:
         
     def update_species(self):
         species_list = []
-        for r in self._reactions_ls:
-            species_list+=r.get_species()
+        if isinstance(self._reactions_ls, _ReactionArrays):
+            species_list = self._reactions_ls.get_species()
+        else:
+            for r in self._reactions_ls:
+                species_list+=r.get_species()
         if self._user_defined_order:
             for specie in species_list:
                 if specie not in self._species_ls:
@@ -235,14 +441,68 @@ class ReactionSystem:
     
     def get_reactions(self):
         return self._reactions_ls
+
+    def get_nasa_query(self):
+        return self._nasa_query
+
+    def subsystem(self, reaction_idx, species_ls=None):
+        '''a new ReactionSystem made of some of the reactions, at the same temperature
+
+        INPUTS:
+            reaction_idx:   list of int, indices of the reactions to keep
+            species_ls:     list of str, species of the subsystem, defaults those involved
+                            in the kept reactions, in the order of this system
+        OUTPUTS:
+            sub:            ReactionSystem, sharing the Reaction objects and the nasa query, 
+                            with the current concentrations of its species if they are set
+        '''
+        reactions = [self._reactions_ls[m] for m in reaction_idx]
+        if species_ls is None:
+            involved = set(sp for r in reactions for sp in r.get_species())
+            species_ls = [sp for sp in self._species_ls if sp in involved]
+        for sp in species_ls:
+            if sp not in self._species_ls:
+                raise ValueError('Species = "{}". Not in the reaction system.'.format(sp))
+        concs = {}
+        if self._concs:
+            concs = {sp: self._concs[sp] for sp in species_ls}
+        return ReactionSystem(
+            reactions, list(species_ls), self._nasa_query, initial_T=self._T, initial_concs=concs)
         
+    def connected_components(self):
+        '''the blocks of species and reactions that do not interact with each other
+
+        the components of the bipartite graph linking every reaction to its reactants and 
+        products. a species taking part in no reaction forms a component on its own.
+
+        INPUTS:
+            None
+        OUTPUTS:
+            components: list of tuples (species_ls, reaction_idx), species_ls the list of str of
+                        the species, reaction_idx the list of int of the reactions, both in the
+                        order of this system. the components are ordered by their first species
+        '''
+        N, M = len(self._species_ls), len(self._reactions_ls)
+        incidence = scipy.sparse.csr_matrix((self._nu_1 != 0) | (self._nu_2 != 0), dtype=float)
+        graph = scipy.sparse.bmat([[None, incidence], [incidence.T, None]])
+        _, labels = scipy.sparse.csgraph.connected_components(graph, directed=False)
+        components = []
+        for label in unique_everseen(labels[:N]):
+            species_ls = [sp for sp, l in zip(self._species_ls, labels[:N]) if l == label]
+            reaction_idx = [m for m in range(M) if labels[N + m] == label]
+            components.append((species_ls, reaction_idx))
+        return components
+
     def compute_reac_rate_coefs(self):
         '''reversible method added'''
         if not self._T:
             raise ValueError("Temperature not yet defined. Call set_state() before calling this function.")
-        kf = np.zeros(len(self._reactions_ls))
-        for n, r in enumerate(self._reactions_ls):
-            kf[n] = r.rateCoeff(T = self._T)
+        if isinstance(self._reactions_ls, _ReactionArrays):
+            kf = self._reactions_ls.rate_coefs(self._T)
+        else:
+            kf = np.zeros(len(self._reactions_ls))
+            for n, r in enumerate(self._reactions_ls):
+                kf[n] = r.rateCoeff(T = self._T)
         if self._nasa_query is None:
             kb = np.zeros(len(kf))
         else:
@@ -286,6 +546,147 @@ class ReactionSystem:
 
     def get_nu_2(self):
         return self._nu_2
+
+    def compile_stoich(self):
+        '''compiles nu_1, nu_2 into padded index/order arrays and the jacobian sparsity pattern'''
+        if isinstance(self._reactions_ls, _ReactionArrays):
+            self._reversible = self._reactions_ls.get_reversible()
+        else:
+            self._reversible = np.array([bool(r.is_reversible()) for r in self._reactions_ls])
+        self._reac_idx, self._reac_ord = _pad_stoich(self._nu_1)
+        self._prod_idx, self._prod_ord = _pad_stoich(self._nu_2)
+
+        # every contribution nu[i,m] * d(rate_m)/d(c_j) to jac[i,j] is listed as a triple
+        # (i, j, flat index of the padded slot); the slot value is filled in at evaluation
+        nu = self._nu_2 - self._nu_1
+        nz_i, nz_m = np.nonzero(nu)
+        rows, cols, weights, slots_f, slots_b = [], [], [], [], []
+        for idx, order, sign, mask, slots in [
+                (self._reac_idx, self._reac_ord, 1.0, np.ones(len(nz_m), dtype=bool), slots_f),
+                (self._prod_idx, self._prod_ord, -1.0, self._reversible[nz_m], slots_b)]:
+            K = idx.shape[1]
+            for k in range(K):
+                active = mask & (order[nz_m, k] > 0)
+                rows.append(nz_i[active])
+                cols.append(idx[nz_m[active], k])
+                weights.append(sign * nu[nz_i[active], nz_m[active]])
+                slots.append(nz_m[active] * K + k)
+        rows, cols = np.concatenate(rows).astype(int), np.concatenate(cols).astype(int)
+        self._jac_rows, self._jac_cols = rows, cols
+        self._jac_weights = np.concatenate(weights)
+        self._jac_slots_f = np.concatenate(slots_f).astype(int)
+        self._jac_slots_b = np.concatenate(slots_b).astype(int)
+
+        N = len(self._species_ls)
+        pattern = scipy.sparse.csc_matrix(
+            (np.ones(len(rows)), (rows, cols)), shape=(N, N))
+        pattern.sort_indices()
+        pattern.data[:] = 1.0
+        pattern_keys = np.repeat(np.arange(N), np.diff(pattern.indptr)) * N + pattern.indices
+        self._jac_pos = np.searchsorted(pattern_keys, cols * N + rows)
+        self._jac_sparsity = pattern
+
+        # the conservation laws are only needed by steady_state and conserve, see _stoich_split
+        self._stoich_basis = self._cons_basis = None
+        return self
+
+    def _stoich_split(self):
+        '''_stoich_basis and _cons_basis, the split of the concentration space into the span 
+        of nu and the conservation laws, by an svd of nu on first use'''
+        if self._stoich_basis is None:
+            nu = self._nu_2 - self._nu_1
+            # the full U is needed, but not the M*M right singular vectors of a large mechanism
+            U, S, _ = np.linalg.svd(nu, full_matrices=nu.shape[1] < nu.shape[0])
+            rank = int(np.sum(S > max(nu.shape) * np.finfo(float).eps * (S[0] if len(S) else 0)))
+            self._stoich_basis = U[:, :rank]
+            self._cons_basis = U[:, rank:].T
+        return self._stoich_basis, self._cons_basis
+
+    def get_conservation_basis(self):
+        return self._stoich_split()[1]
+
+    def get_jac_sparsity(self):
+        return self._jac_sparsity
+
+    def _prog_rate_array(self, concs):
+        '''forward and backward progress rates on an array of concentrations'''
+        concs = np.asarray(concs, dtype=float)
+        rate_f = self._kf * np.prod(concs[self._reac_idx] ** self._reac_ord, axis=1)
+        rate_b = self._kb * np.prod(concs[self._prod_idx] ** self._prod_ord, axis=1)
+        rate_b[~self._reversible] = 0
+        return rate_f, rate_b
+
+    def compute_prog_rates(self, concs):
+        '''forward and backward progress rates on an array of concentrations
+
+        INPUTS:
+            concs:  n array of float, concentrations in the order of the species list
+        OUTPUTS:
+            rate_f, rate_b: m arrays, rate_b is zero for irreversible reactions
+        '''
+        return self._prog_rate_array(concs)
+
+    def _reac_rate_array(self, concs):
+        '''reaction rates on an array of concentrations'''
+        rate_f, rate_b = self._prog_rate_array(concs)
+        return np.dot(self._nu_2 - self._nu_1, rate_f - rate_b)
+
+    def _jac_contribs(self, concs):
+        '''values nu[i,m] * d(rate_m)/d(concs_j) of every jacobian contribution triple'''
+        concs = np.asarray(concs, dtype=float)
+        slot_f = _dprog_slots(self._kf, self._reac_idx, self._reac_ord, concs).ravel()
+        slot_b = _dprog_slots(self._kb, self._prod_idx, self._prod_ord, concs).ravel()
+        slot_vals = np.concatenate([slot_f[self._jac_slots_f], slot_b[self._jac_slots_b]])
+        return self._jac_weights * slot_vals
+
+    def _jac_values(self, concs):
+        '''values of the jacobian entries, ordered as the data of self._jac_sparsity'''
+        return np.bincount(
+            self._jac_pos, weights=self._jac_contribs(concs), 
+            minlength=self._jac_sparsity.nnz)
+
+    def compute_jac(self, concs, sparse=False):
+        '''analytic jacobian of the reaction rates w.r.t. concentrations
+
+        INPUTS:
+            concs:  n array of float, concentrations in the order of the species list
+            sparse: boolean, whether to return a scipy.sparse csc matrix, defaults False
+        OUTPUTS:
+            jac:    n*n array (or csc matrix), jac[i,j] = d(reac_rate_i)/d(concs_j)
+        '''
+        pattern = self._jac_sparsity
+        jac = scipy.sparse.csc_matrix(
+            (self._jac_values(concs), pattern.indices, pattern.indptr), shape=pattern.shape)
+        if sparse:
+            return jac
+        return jac.toarray()
+
+    def compute_jvp(self, concs, v):
+        '''jacobian-vector product of the reaction rates, jac is never assembled
+
+        INPUTS:
+            concs:  n array of float, concentrations in the order of the species list
+            v:      n array of float, the vector to multiply
+        OUTPUTS:
+            jvp:    n array, jac.v
+        '''
+        return self._jvp_contribs(self._jac_contribs(concs), v)
+
+    def jac_operator(self, concs):
+        '''matrix-free jacobian at given concentrations, in a JacobianOperator
+        the contributions are evaluated once, each product then costs O(nnz)'''
+        contribs = self._jac_contribs(concs)
+        N = len(self._species_ls)
+        return JacobianOperator(
+            (N, N), 
+            jvp=lambda v: self._jvp_contribs(contribs, v), 
+            assemble=lambda: self.compute_jac(concs, sparse=True))
+
+    def _jvp_contribs(self, contribs, v):
+        v = np.asarray(v, dtype=float)
+        return np.bincount(
+            self._jac_rows, weights=contribs * v[self._jac_cols], 
+            minlength=len(self._species_ls))
     
     def get_progress_rate(self):
         '''reversible method added'''
@@ -300,10 +701,10 @@ class ReactionSystem:
         nu_prod = self._nu_2
         progress_rate_f, progress_rate_b = np.copy(kf), np.copy(kb) # Initialize progress rates with reaction rate coefficients
         
-        for j, r in enumerate(self._reactions_ls):
+        for j in range(len(self._reactions_ls)):
             for i, sp in enumerate(self._species_ls):
                 progress_rate_f[j] *= self._concs[sp]**nu_react[i,j]
-            if r.is_reversible():
+            if self._reversible[j]:
                 for i, sp in enumerate(self._species_ls):
                     progress_rate_b[j] *= self._concs[sp]**nu_prod[i,j]
             else:
@@ -327,70 +728,1413 @@ class ReactionSystem:
             return np.dot(nu[species_idx,:], progress_rate)
      
 
-    def evolute(self, t_bound, method='LSODA', rtol=1e-3, atol=1e-6, **options):
+    def evolute(self, t_bound, method='LSODA', rtol=1e-3, atol=1e-6, sparse=False, matrix_free=False, 
+                events=None, steady_tol=None, qss=None, qss_tau=None, t_start=0, exact=True, 
+                conserve=False, fast=None, fast_tau=None, transform=None, dense_species=None, 
+                dense_dtype=None, dense_window=None, t_eval=None, writer=None, **options):
+        '''solve the evolution of concentrations from t=t_start to t_bound
 
+        the rates are evaluated on arrays (see `compile_stoich`), the concentrations at the end
+        of the evolution being written back to the system once it is over
+
+        INPUTS:
+            t_bound:    float, end time of the evolution
+            method:     str, ode solver, one of 'LSODA', 'Radau', 'BDF', 'SIE', 'ROS4', 'MR', 
+                        defaults 'LSODA'. 'MR' is the multirate ROS4, see `fast`. 'auto' chooses
+                        the solver and sparse by the estimated stiffness, see `choose_method`
+            rtol:       float, relative error tolerance, defaults 1e-3
+            atol:       float, absolute error tolerance, defaults 1e-6
+            sparse:     boolean, whether the solvers should work on a sparse jacobian, defaults False
+                        'Radau' and 'BDF' receive csc jacobians and the `jac_sparsity` pattern,
+                        'SIE', 'ROS4' factorize with sparse LU, 'LSODA' only supports dense jacobians
+            matrix_free: boolean, whether to solve the implicit stages by GMRES on jacobian-vector
+                        products, with no assembled jacobian, defaults False. only for 'SIE', 'ROS4'
+            events:     callable or list of callables, event(t, concs) gives a float, whose zero
+                        crossings are located. see scipy.integrate.solve_ivp for the `terminal` 
+                        and `direction` attributes, and `make_threshold_event` for an example
+            steady_tol: float, if given, the evolution stops once the 2-norm of the reaction rates
+                        drops below steady_tol, right at t_start if it is below already, 
+                        defaults None
+            qss:        list of str, species taken as quasi-steady-state, or 'auto' to detect them by
+                        `detect_qss`, defaults None. only the other species are integrated, the qss
+                        species are solved from reac_rate[qss] = 0 (all together, so that coupled 
+                        qss species are handled), and the jacobian is the Schur complement. the 
+                        steady_tol event then applies to the rates of the integrated species
+            qss_tau:    float, lifetime threshold of qss='auto', defaults 1e-3 * t_bound
+            t_start:    float, start time of the evolution, at which the current concentrations
+                        are taken, defaults 0. see `advance` for a continuation
+            exact:      boolean, whether a first-order linear mechanism (see `is_linear`) is
+                        solved in closed form instead of by the ode solver, unless events, 
+                        steady_tol, qss, transform or writer are given, defaults True. the 
+                        solution is then exact for any t, and cheap to evaluate on a whole time grid.
+                        dense_species, dense_dtype, dense_window restrict it as they do the 
+                        dense output, with solution.dense_output None. the solver settings method,
+                        rtol, atol, sparse, matrix_free play no part, nor conserve, the closed form
+                        keeping the conservation laws
+            conserve:   boolean, whether to integrate only the independent species, see 
+                        `conservation_partition`, the dependent ones being reconstructed from the
+                        conservation laws, which then hold exactly, defaults False. 
+                        not combined with qss or matrix_free
+            fast:       list of str, the fast species of 'MR', which alone take small steps, while
+                        the others follow macro steps, defaults None, i.e. detected by 
+                        `detect_fast`. not combined with events, steady_tol, qss or conserve
+            fast_tau:   float, lifetime threshold of the detection of fast, defaults 
+                        1e-3 * (t_bound - t_start)
+            transform:  str, change of the integration variables, defaults None
+                        'log':   ln(concs), the rates and the jacobian being transformed 
+                                 analytically, so that the concentrations never go negative.
+                                 the error control is then relative for every species, up to 
+                                 rtol, and atol only sets the floor that the initial 
+                                 concentrations are raised to, which are not resolved below it
+                        'scale': concs / scale, scale the initial concentrations, raised to 
+                                 atol, so that atol is relative to the initial magnitude of 
+                                 every species
+                        not combined with qss, conserve, matrix_free or 'MR'
+            dense_species: list of str, keep only these species in the dense output, defaults 
+                        None, i.e. all of them. not combined with qss, conserve or transform
+            dense_dtype: numpy dtype of the dense output, e.g. np.float32, defaults None, i.e. float
+            dense_window: float, keep only the last dense_window of the dense output, defaults 
+                        None, i.e. all of it. solution(t) raises ValueError before it
+                        if any of the three is given, the dense output is a HermiteOutput, which 
+                        stores the concentrations and rates on the steps only, instead of an 
+                        interpolant per step ('LSODA', 'Radau', 'BDF') or a global spline ('SIE')
+            t_eval:     array of float, sorted times within [t_start, t_bound], if given the
+                        concentrations are sampled on them as the steps come and a Trajectory
+                        is returned, with no dense output at all, defaults None. not combined 
+                        with dense_species, dense_dtype, dense_window
+            writer:     TrajectoryWriter, see `TrajectoryStore.writer`, if given the steps are
+                        written to disk as they come, instead of any dense output, and the writer
+                        is closed at the end. solution(t) then reads the run back from the store,
+                        defaults None. not combined with t_eval, dense_*, qss, conserve or transform
+            options:    other keyword options passed to the ode solver, e.g. `first_step` 
+                        (not for 'SIE'), or `linsolver` to override the linear solver of
+                        'SIE', 'ROS4' by a linear solver object
+        OUTPUTS:
+            solution:   function, solution(t) gives dict of concentrations at time t
+                        solution.t_final is the time the evolution ended at,
+                        solution.t_events, solution.y_events record the events (None if no events)
+                        solution.qss lists the qss species, solution.fast the fast ones of 'MR'
+                        solution.h_last is the last step size (None for 'SIE'), 
+                        solution.h_first the first one (of the kept window), solution.method 
+                        the solver used, solution.dense_output the HermiteOutput if dense_* 
+                        are given
+            trajectory: Trajectory, if t_eval is given, trajectory.concs holds the 
+                        concentrations in a len(t_eval)*N array (fewer rows if a terminal event
+                        stopped the evolution), with the same attributes as solution
+        '''
+
+        if method == 'auto':
+            choice = self.choose_method(t_bound, t_start, rtol)
+            method, sparse = choice['method'], sparse or choice['sparse']
+            if matrix_free and method not in ['SIE', 'ROS4']:
+                method = 'ROS4'
         methods_scipy = ['LSODA', 'Radau', 'BDF']
-        methods_chemkin = ['SIE']
+        methods_chemkin = ['SIE', 'ROS4', 'MR']
         methods_allowed = methods_scipy + methods_chemkin
         if method not in methods_allowed:
             raise ValueError(
                 '''ODE solver \'{}\' is not applicable. '''
                 '''ReactionSystem currently support: {}'''.format(method, ', '.join(methods_allowed)) )
+        if method == 'MR' and (events is not None or steady_tol is not None or qss or conserve 
+                               or transform is not None):
+            raise ValueError(
+                "ODE solver 'MR' does not support events, steady_tol, qss, conserve or transform.")
+        if transform not in [None, 'log', 'scale']:
+            raise ValueError("transform = {}: should be None, 'log' or 'scale'.".format(transform))
+        if transform is not None and (qss or conserve or matrix_free):
+            raise ValueError("transform does not support qss, conserve or matrix_free.")
+
+        if matrix_free and method not in methods_chemkin:
+            raise ValueError(
+                '''ODE solver \'{}\' does not support matrix_free. '''
+                '''Try: {}'''.format(method, ', '.join(methods_chemkin)) )
+
+        lean = dense_species is not None or dense_dtype is not None or dense_window is not None
+        if writer is not None and (lean or t_eval is not None or qss or conserve or transform is not None):
+            raise ValueError("writer does not support t_eval, dense_*, qss, conserve or transform.")
+        if t_eval is not None:
+            if lean:
+                raise ValueError("t_eval does not support dense_species, dense_dtype or dense_window.")
+            t_eval = np.asarray(t_eval, dtype=float)
+            if np.any(np.diff(t_eval) < 0) or np.any(t_eval < t_start) or np.any(t_eval > t_bound):
+                raise ValueError("t_eval should be sorted and within [{}, {}].".format(t_start, t_bound))
+
+        if (exact and events is None and steady_tol is None and not qss and transform is None 
+                and writer is None and self.is_linear()):
+            solution = self._evolute_linear(t_bound, t_start, dense_species, dense_dtype, dense_window)
+            if t_eval is not None:
+                concs = solution(t_eval)
+                solution = _as_trajectory(
+                    solution, t_eval, np.array([concs[sp] for sp in self._species_ls]).T, 
+                    self._species_ls)
+            return solution
+
+        # LSODA works on dense jacobians only
+        sparse_jac = sparse and method != 'LSODA'
+        if matrix_free:
+            linsolver = 'krylov'
+        elif sparse_jac:
+            linsolver = 'sparse'
+        else:
+            linsolver = 'dense'
+        linsolver = options.pop('linsolver', linsolver)
 
         def fun_reac_rate(t, concs):
-            '''formulated reac_rate for ode solver'''
-            concs_valid = [c if c>0 else 0 for c in concs]
-            self.set_concs(dict(zip(self._species_ls, concs_valid)))
-            return self.get_reac_rate()
+            '''formulated reac_rate for ode solver, on the padded arrays of compile_stoich.
+            the concentrations are written back once, after the evolution'''
+            return self._reac_rate_array(np.maximum(concs, 0))
 
         def jac_reac_rate(t, concs):
             '''formulated jacobian of reac_rate for ode solver'''
-            concs_valid = [c if c>0 else 0 for c in concs]
-            jac_prog_rate_f = _jac_prog_rate(self._kf, self._nu_1, concs_valid)
-            jac_prog_rate_b = _jac_prog_rate(self._kb, self._nu_2, concs_valid)
-            jac = np.dot(self._nu_2-self._nu_1, jac_prog_rate_f-jac_prog_rate_b)
-            return jac
+            concs_valid = np.maximum(concs, 0)
+            if matrix_free:
+                return self.jac_operator(concs_valid)
+            return self.compute_jac(concs_valid, sparse=sparse_jac)
 
-        def _jac_prog_rate(k, nu, concs):
-            '''jacobian of progress_rate, called by jac_reac_rate'''
-            N = len(self._species_ls)
-            M = len(self._reactions_ls)
-            jac = np.zeros((M, N))
-            for m in range(M):
-                for j in range(N):
-                    if nu[j, m] == 0:
-                        jac[m, j] == 0
-                        continue
-                    jac[m, j] == k[m]
-                    for n in range(N):
-                        if n == j:
-                            jac[m, j] *= nu[j, m] * (concs[j] ** (nu[j, m] - 1))
-                        else:
-                            jac[m, j] *= concs[j] ** nu[j, m]
-            return jac
+        N = len(self._species_ls)
+        y0 = np.array(self.get_concs_array(), dtype=float)
+        qss = [] if qss is None else qss
+        reduced = len(qss) > 0 or conserve or transform is not None
+        if conserve and (len(qss) > 0 or matrix_free):
+            raise ValueError("Conservation reduction does not support qss or matrix_free.")
+        rtol_ode, atol_ode = rtol, atol
+        if not reduced:
+            fun_ode, jac_ode, y0_ode = fun_reac_rate, jac_reac_rate, y0
+            full_concs = lambda concs: concs
+        elif transform == 'log':
+            # d(ln c)/dt = f/c, and its jacobian diag(1/c).jac.diag(c) - diag(f/c)
+            tiny = np.finfo(float).tiny
+            full_concs = lambda log_concs: np.maximum(np.exp(log_concs), tiny)
+
+            def fun_ode(t, log_concs):
+                concs = full_concs(log_concs)
+                return np.asarray(fun_reac_rate(t, concs)) / concs
+
+            def jac_ode(t, log_concs):
+                concs = full_concs(log_concs)
+                jac = scipy.sparse.diags(1 / concs).dot(self.compute_jac(concs, sparse=True)).dot(
+                    scipy.sparse.diags(concs)) - scipy.sparse.diags(self._reac_rate_array(concs) / concs)
+                return scipy.sparse.csc_matrix(jac) if sparse_jac else jac.toarray()
+
+            y0_ode = np.log(np.maximum(y0, atol))
+            # an absolute error on ln(c) is a relative error on c
+            rtol_ode, atol_ode = 100 * np.finfo(float).eps, rtol
+        elif transform == 'scale':
+            scale = np.maximum(y0, atol)
+            full_concs = lambda scaled_concs: scale * scaled_concs
+
+            def fun_ode(t, scaled_concs):
+                return np.asarray(fun_reac_rate(t, full_concs(scaled_concs))) / scale
+
+            def jac_ode(t, scaled_concs):
+                jac = scipy.sparse.diags(1 / scale).dot(
+                    self.compute_jac(np.maximum(full_concs(scaled_concs), 0), sparse=True)).dot(
+                    scipy.sparse.diags(scale))
+                return scipy.sparse.csc_matrix(jac) if sparse_jac else jac.toarray()
+
+            y0_ode = y0 / scale
+        elif conserve:
+            idx_i, idx_d, dep_map, dep_offset = self.conservation_partition(y0)
+
+            def full_concs(concs_i):
+                '''concentrations of all species, the dependent ones from the conservation laws'''
+                concs = np.empty(N)
+                concs[idx_i] = concs_i
+                concs[idx_d] = dep_offset + dep_map.dot(concs_i)
+                return concs
+
+            def fun_ode(t, concs_i):
+                return np.asarray(fun_reac_rate(t, full_concs(concs_i)))[idx_i]
+
+            def jac_ode(t, concs_i):
+                # d(concs_d)/d(concs_i) = dep_map
+                jac = self.compute_jac(np.maximum(full_concs(concs_i), 0), sparse=True).tocsr()
+                jac_i = jac[idx_i][:, idx_i] + jac[idx_i][:, idx_d].dot(dep_map)
+                return scipy.sparse.csc_matrix(jac_i) if sparse_jac else np.asarray(jac_i)
+
+            y0_ode = y0[idx_i]
+        else:
+            if matrix_free:
+                raise ValueError("QSS elimination does not support matrix_free.")
+            if isinstance(qss, str):
+                if qss != 'auto':
+                    raise ValueError("qss should be a list of species or 'auto'.")
+                qss = self.detect_qss(qss_tau if qss_tau is not None else 1e-3 * t_bound, y0)
+            for sp in qss:
+                if sp not in self._species_ls:
+                    raise ValueError('Species = "{}". Not in the reaction system.'.format(sp))
+            idx_q = [self._species_ls.index(sp) for sp in qss]
+            idx_s = [i for i in range(N) if i not in idx_q]
+            qss_guess = [y0[idx_q]]
+
+            def full_concs(concs_s):
+                '''concentrations of all species, the qss ones solved algebraically'''
+                concs = np.zeros(N)
+                concs[idx_s] = np.maximum(concs_s, 0)
+                concs[idx_q] = qss_guess[0]
+                concs[idx_q] = qss_guess[0] = self._qss_solve(concs, idx_q)
+                return concs
+
+            def fun_ode(t, concs_s):
+                return np.asarray(fun_reac_rate(t, full_concs(concs_s)))[idx_s]
 
-        if method in methods_scipy:
+            def jac_ode(t, concs_s):
+                jac = self.compute_jac(full_concs(concs_s))
+                jac_s = jac[np.ix_(idx_s, idx_s)] - jac[np.ix_(idx_s, idx_q)].dot(
+                    np.linalg.solve(jac[np.ix_(idx_q, idx_q)], jac[np.ix_(idx_q, idx_s)]))
+                return scipy.sparse.csc_matrix(jac_s) if sparse_jac else jac_s
+
+            y0_ode = y0[idx_s]
+
+        if events is not None and callable(events):
+            events = [events]
+        if events is not None and reduced:
+            events = [_wrap_event(event, full_concs) for event in events]
+        if steady_tol is not None:
+            fun_steady = fun_ode
+            if transform is not None:
+                fun_steady = lambda t, y: fun_reac_rate(t, full_concs(y))
+            events = list(events or []) + [steady_state_event(fun_steady, steady_tol)]
+        if events is not None:
+            options['events'] = events
+
+        species_dense = self._species_ls
+        output = writer
+        if t_eval is not None:
+            output = TrajectorySampler(t_eval)
+        if lean:
+            if dense_species is not None:
+                if reduced:
+                    raise ValueError("dense_species does not support qss, conserve or transform.")
+                for sp in dense_species:
+                    if sp not in self._species_ls:
+                        raise ValueError('Species = "{}". Not in the reaction system.'.format(sp))
+                species_dense = list(dense_species)
+            output = HermiteOutput(
+                idx=None if dense_species is None else [self._species_ls.index(sp) for sp in species_dense],
+                dtype=float if dense_dtype is None else dense_dtype, window=dense_window)
+
+        steady_start = steady_tol is not None and \
+            np.sqrt(np.sum(np.asarray(fun_steady(t_start, y0_ode))**2)) <= steady_tol
+        if steady_start:
+            # already steady, the event would never see its downward crossing
+            res_int = HermiteOutput() if output is None else output
+            res_int.append(t_start, y0_ode, fun_ode(t_start, y0_ode))
+            res_int.t_events = [np.array([]) for _ in events[:-1]] + [np.array([t_start])]
+            res_int.y_events = [np.empty((0, len(y0_ode))) for _ in events[:-1]] + [np.array([y0_ode])]
+            res_int.h_last = None
+        elif method in methods_scipy and output is not None:
+            if sparse_jac and not reduced:
+                options.setdefault('jac_sparsity', self._jac_sparsity)
+            res_int = solve_ivp_scipy(
+                fun_ode, (t_start, t_bound), y0_ode, method, output, 
+                jac=jac_ode, rtol=rtol_ode, atol=atol_ode, **options)
+        elif method in methods_scipy:
+            if sparse_jac and not reduced:
+                options.setdefault('jac_sparsity', self._jac_sparsity)
             res_int = scipy.integrate.solve_ivp(
                 method=method,
-                fun=fun_reac_rate, 
-                jac=jac_reac_rate, 
-                t_span=(0, t_bound), 
-                y0=self.get_concs_array(),
-                rtol=rtol, atol=atol, 
+                fun=fun_ode, 
+                jac=jac_ode, 
+                t_span=(t_start, t_bound), 
+                y0=y0_ode,
+                rtol=rtol_ode, atol=atol_ode, 
                 dense_output=True,
                 **options)
 
-        if method in methods_chemkin:
+        fast_ls = []
+        if method == 'MR':
+            if fast_tau is None:
+                fast_tau = 1e-3 * (t_bound - t_start)
+            fast_ls, idx_fast, fun_fast, jac_fast = self._fast_rates(
+                self.detect_fast(fast_tau, y0) if fast is None else fast)
+            options.update(idx_fast=idx_fast, fun_fast=fun_fast, jac_fast=jac_fast)
+
+        if method in methods_chemkin and not steady_start:
+            if method in ['ROS4', 'MR']:
+                # reaction rates do not depend on time explicitly
+                options.setdefault('autonomous', True)
             res_int = chemkin_ivp(
                 method=method,
-                fun=fun_reac_rate, 
-                jac=jac_reac_rate, 
-                t_span=(0, t_bound), 
-                y0=self.get_concs_array(),
-                rtol=rtol, atol=atol, 
+                fun=fun_ode, 
+                jac=jac_ode, 
+                t_span=(t_start, t_bound), 
+                y0=y0_ode,
+                rtol=rtol_ode, atol=atol_ode, 
+                linsolver=linsolver,
+                output=output,
                 **options)
         
         def solution(t):
-            return dict(zip(self._species_ls, res_int.sol(t)))
+            concs = res_int.sol(t)
+            if reduced:
+                if np.ndim(concs) == 1:
+                    concs = full_concs(concs)
+                else:
+                    concs = np.array([full_concs(c) for c in concs.T]).T
+            return dict(zip(species_dense, concs))
+        if writer is not None:
+            writer.close()
+            solution = lambda t: writer.store.sample(writer.run, t)
+            solution.t_final, solution.h_first = writer.t_last, writer.h_first
+        elif t_eval is not None:
+            concs = res_int.samples[:len(res_int.t)]
+            if reduced:
+                concs = np.array([full_concs(c) for c in concs]).reshape(-1, N)
+            solution = _as_trajectory(solution, res_int.t, concs, self._species_ls)
+            solution.t_final, solution.h_first = res_int.t_last, res_int.h_first
+        else:
+            solution.t_final = res_int.t[-1]
+            solution.h_first = res_int.t[1] - res_int.t[0] if len(res_int.t) > 1 else None
+        solution.t_events = getattr(res_int, 't_events', None)
+        solution.y_events = getattr(res_int, 'y_events', None)
+        if reduced and solution.y_events is not None:
+            solution.y_events = [
+                np.array([full_concs(y) for y in y_event]).reshape(-1, N) 
+                for y_event in solution.y_events]
+        solution.qss = list(qss)
+        solution.fast = fast_ls
+        solution.method = method
+        if lean:
+            solution.dense_output = output
+        if output is not None:
+            y_final = output.y_last
+        elif method in methods_scipy:
+            y_final = res_int.y[:, -1]
+        else:
+            y_final = res_int.sol(solution.t_final)
+        self.set_concs(dict(zip(self._species_ls, np.maximum(full_concs(y_final), 0))))
+        if method in methods_scipy and output is None and not steady_start:
+            solution.h_last = res_int.t[-1] - res_int.t[-2] if len(res_int.t) > 1 else None
+        else:
+            solution.h_last = res_int.h_last
+
+        return solution
+
+    def conservation_partition(self, concs=None):
+        '''splits the species into independent and dependent ones by the conservation laws
+
+        the conservation laws L.concs = L.concs_0 (L the conservation basis) determine the 
+        dependent species from the independent ones. the dependent ones are picked by QR with
+        column pivoting on L.diag(concs), favoring the abundant species, so that the solve 
+        for them is well conditioned and their reconstruction is accurate.
+
+        INPUTS:
+            concs:      n array of float, concentrations fixing the conserved quantities,
+                        defaults the current ones
+        OUTPUTS:
+            idx_i:      list of int, indices of the independent species, r = rank(nu) of them
+            idx_d:      list of int, indices of the dependent species
+            dep_map:    (n-r)*r array, and
+            dep_offset: n-r array, concs[idx_d] = dep_offset + dep_map.concs[idx_i]
+        '''
+        concs = np.array(self.get_concs_array() if concs is None else concs, dtype=float)
+        L = self._stoich_split()[1]
+        N = len(self._species_ls)
+        if L.shape[0] == 0:
+            return list(range(N)), [], np.zeros((0, N)), np.zeros(0)
+        weights = np.abs(concs) + 1e-8 * max(np.max(np.abs(concs)), 1e-300)
+        _, _, pivots = scipy.linalg.qr(L * weights, pivoting=True, mode='economic')
+        idx_d = sorted(pivots[:L.shape[0]])
+        idx_i = [i for i in range(N) if i not in idx_d]
+        L_d, L_i = L[:, idx_d], L[:, idx_i]
+        dep_map = -np.linalg.solve(L_d, L_i)
+        dep_offset = np.linalg.solve(L_d, L.dot(concs))
+        return idx_i, idx_d, dep_map, dep_offset
+
+    def is_linear(self):
+        '''whether the kinetics are linear, c' = K.c, i.e. every reaction has a single reactant
+        of order 1, and so does the reverse reaction when it is reversible'''
+        def first_order(nu):
+            return np.all(np.sum(nu != 0, axis=0) == 1) and np.all(np.sum(nu, axis=0) == 1)
+        reverse = self._reversible & (self._kb != 0)
+        return bool(first_order(self._nu_1) and first_order(self._nu_2[:, reverse]))
+
+    def compute_linear_operator(self):
+        '''the matrix K of linear kinetics c' = K.c, at the current temperature
+
+        OUTPUTS:
+            K:  n*n array, raises ValueError if the kinetics are not linear
+        '''
+        if not self.is_linear():
+            raise ValueError("The reaction system is not first-order linear.")
+        nu = self._nu_2 - self._nu_1
+        kb = np.where(self._reversible, self._kb, 0)
+        return nu.dot(self._kf[:, None] * self._nu_1.T) - nu.dot(kb[:, None] * self._nu_2.T)
+
+    def _evolute_linear(self, t_bound, t_start=0, species=None, dtype=None, window=None):
+        '''closed-form evolution of linear kinetics, c(t) = expm(K.(t-t_start)).c0
+        by eigendecomposition of K, or by expm if K is defective or ill-conditioned.
+        species, dtype and window restrict the solution as dense_species, dense_dtype and 
+        dense_window of `evolute`'''
+        if species is not None:
+            for sp in species:
+                if sp not in self._species_ls:
+                    raise ValueError('Species = "{}". Not in the reaction system.'.format(sp))
+        columns = list(range(len(self._species_ls))) if species is None else \
+            [self._species_ls.index(sp) for sp in species]
+        t_min = t_start if window is None else max(t_start, t_bound - window)
+        K = self.compute_linear_operator()
+        concs_0 = np.array(self.get_concs_array(), dtype=float)
+        eigvals, eigvecs = np.linalg.eig(K)
+        if np.linalg.cond(eigvecs) < 1e8:
+            coeffs = np.linalg.solve(eigvecs, concs_0)
+            def concs_at(dt):
+                modes = np.exp(np.outer(eigvals, dt)) * coeffs[:, None]
+                return np.real(eigvecs.dot(modes))
+        else:
+            def concs_at(dt):
+                return np.array([scipy.linalg.expm(K * t).dot(concs_0) for t in dt]).T
+
+        def solution(t):
+            if np.min(t) < t_min:
+                raise ValueError("t = {}: before the kept window, which starts at {}.".format(t, t_min))
+            dt = np.asarray(t, dtype=float) - t_start
+            concs = concs_at(np.atleast_1d(dt))[columns]
+            if dtype is not None:
+                concs = concs.astype(dtype)
+            if np.ndim(t) == 0:
+                concs = concs[:, 0]
+            return dict(zip([self._species_ls[i] for i in columns], concs))
+        solution.t_final = t_bound
+        solution.t_events = solution.y_events = None
+        solution.qss = solution.fast = []
+        solution.h_last = solution.h_first = None
+        solution.exact = True
+        solution.method = 'exact'
+        solution.dense_output = None
+
+        concs_final = concs_at(np.array([t_bound - t_start]))[:, 0]
+        self.set_concs({sp: max(c, 0) for sp, c in zip(self._species_ls, concs_final)})
+        return solution
+
+    def advance(self, t, method='ROS4', rtol=1e-3, atol=1e-6, sparse=False, matrix_free=False, **options):
+        '''continue the evolution from the current time and concentrations to time t
+
+        the final concentrations are written back and the current time becomes the end time.
+        the solver state is carried over between consecutive calls with the same settings and
+        temperature: the next step starts from the last step size, and 'SIE', 'ROS4' reuse their 
+        linear solver (e.g. the fill-reducing ordering of the sparse LU, the preconditioner of
+        GMRES), so that extending a run only costs the new steps.
+
+        INPUTS:
+            t:          float, the time to advance to, later than the current time
+            method, rtol, atol, sparse, matrix_free: 
+                        see `evolute`, method defaults 'ROS4', 'auto' is resolved by 
+                        `choose_method` on each call
+            options:    other keyword options passed to `evolute`, e.g. events, qss
+        OUTPUTS:
+            solution:   function, solution(t) gives dict of concentrations, see `evolute`,
+                        defined between the previous and the new current times
+        '''
+        if t <= self._t:
+            raise ValueError(
+                "t = {}: should be later than the current time {}.".format(t, self._t))
+        if method == 'auto':
+            # resolved here, so that the solver state of the chosen method is carried over
+            choice = self.choose_method(t, self._t, rtol)
+            method, sparse = choice['method'], sparse or choice['sparse']
+        key = (method, rtol, atol, sparse, matrix_free, self._T)
+        state = self._continuation
+        if state is None or state['key'] != key:
+            state = dict(key=key, h=None, linsolver=None)
+            if method in ['SIE', 'ROS4']:
+                state['linsolver'] = make_linsolver(
+                    'krylov' if matrix_free else 'sparse' if sparse else 'dense')
+        if state['h'] is not None and method != 'SIE':
+            options.setdefault('first_step', min(state['h'], t - self._t))
+        if state['linsolver'] is not None:
+            options['linsolver'] = state['linsolver']
+
+        solution = self.evolute(
+            t, method=method, rtol=rtol, atol=atol, sparse=sparse, matrix_free=matrix_free, 
+            t_start=self._t, **options)
+        concs = solution(solution.t_final)
+        self.set_concs({sp: max(concs[sp], 0) for sp in self._species_ls})
+        self._t = solution.t_final
+        state['h'] = solution.h_last
+        self._continuation = state
+        return solution
+
+    def evolute_components(self, t_bound, method='LSODA', rtol=1e-3, atol=1e-6, n_workers=None, 
+                           component_options=None, **options):
+        '''solve the evolution by integrating each connected component on its own
+
+        the components (see `connected_components`) are independent, so each one is evolved
+        as a subsystem with its own step sizes, instead of all of them following the stiffest
+        one. the species in no reaction keep their concentrations. the final concentrations
+        are written back, as for `evolute`.
+
+        INPUTS:
+            t_bound:    float, end time of the evolution
+            method, rtol, atol:
+                        see `evolute`, the defaults of every component
+            n_workers:  int, number of threads integrating the components in parallel, 
+                        defaults None, i.e. one after another
+            component_options: 
+                        list of dict, in the order of the components, keyword options of each
+                        component overriding the defaults, e.g. rtol, atol, method, defaults None
+            options:    other keyword options passed to `evolute` of every component, except
+                        events and steady_tol, which involve all the species
+        OUTPUTS:
+            solution:   function, solution(t) gives dict of concentrations at time t, see `evolute`
+                        solution.components lists the components,
+                        solution.solutions the solutions of the components (None for the 
+                        components without reactions)
+        '''
+        for key in ['events', 'steady_tol']:
+            if options.get(key) is not None:
+                raise ValueError("{} is not supported by evolute_components.".format(key))
+        components = self.connected_components()
+        if component_options is None:
+            component_options = [{}] * len(components)
+        if len(component_options) != len(components):
+            raise ValueError(
+                "component_options has {} entries: should be one for each of the {} components.".format(
+                    len(component_options), len(components)))
+
+        def evolute_component(n):
+            species_ls, reaction_idx = components[n]
+            if not reaction_idx:
+                return None
+            kwargs = dict(options, method=method, rtol=rtol, atol=atol)
+            kwargs.update(component_options[n])
+            return self.subsystem(reaction_idx, species_ls).evolute(t_bound, **kwargs)
+
+        if n_workers is not None and n_workers > 1:
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                solutions = list(executor.map(evolute_component, range(len(components))))
+        else:
+            solutions = [evolute_component(n) for n in range(len(components))]
+
+        concs_0 = dict(self._concs)
+        def solution(t):
+            concs = {}
+            for (species_ls, _), sol in zip(components, solutions):
+                if sol is None:
+                    concs.update({sp: concs_0[sp] + 0 * np.asarray(t, dtype=float) for sp in species_ls})
+                else:
+                    concs.update(sol(t))
+            return {sp: concs[sp] for sp in self._species_ls}
+        solution.t_final = min([sol.t_final for sol in solutions if sol is not None], default=t_bound)
+        solution.t_events = solution.y_events = None
+        solution.qss = [sp for sol in solutions if sol is not None for sp in sol.qss]
+        solution.fast = [sp for sol in solutions if sol is not None for sp in sol.fast]
+        solution.components = components
+        solution.solutions = solutions
+
+        concs_final = solution(solution.t_final)
+        self.set_concs({sp: max(concs_final[sp], 0) for sp in self._species_ls})
+        return solution
+
+    def steady_state(self, rtol=1e-10, atol=1e-14, max_iter=50, guess=None, ptc=True, max_ptc_iter=1000):
+        '''solves reac_rate(concs) = 0 directly, by damped Newton on the analytic jacobian
+
+        the unknowns are restricted to concs = concs_0 + Z.xi, with concs_0 the current 
+        concentrations and Z the basis of the range of nu, so that every iterate satisfies
+        the conservation laws set by concs_0. steps are damped to keep concs non-negative,
+        then backtracked until the norm of reac_rate decreases. if Newton fails, 
+        pseudo-transient continuation (I/dtau - jac).dconcs = reac_rate is used to approach
+        the steady state, with dtau growing as the residual decreases, before Newton polishes.
+        a Newton step driving a species at 0 negative counts as a failure, while such 
+        components of the pseudo-transient steps are dropped, so the iterates stay non-negative.
+
+        INPUTS:
+            rtol, atol:     float, converged when a full Newton step dconcs has 
+                            |dconcs| <= atol + rtol*|concs| elementwise
+            max_iter:       int, max Newton iterations, defaults 50
+            guess:          dict or n array, initial guess, projected onto the conservation 
+                            subspace, defaults the current concentrations
+            ptc:            boolean, whether to fall back to pseudo-transient continuation
+            max_ptc_iter:   int, max pseudo-transient iterations, defaults 1000
+        OUTPUTS:
+            concs:          dict of steady-state concentrations
+        '''
+        if not self._concs:
+            raise ValueError("Concentrations not yet defined. Call set_concs() before calling this function.")
+        self.steady_stats = dict(n_newton=0, n_ptc=0)
+        concs_0 = np.array(self.get_concs_array(), dtype=float)
+        Z = self._stoich_split()[0]
+        if guess is None:
+            concs = concs_0
+        else:
+            if isinstance(guess, dict):
+                guess = [guess[sp] for sp in self._species_ls]
+            concs = concs_0 + Z.dot(Z.T.dot(np.asarray(guess, dtype=float) - concs_0))
+            concs = np.maximum(concs, 0) if np.all(concs >= -atol) else concs_0
+
+        concs, converged = self._steady_newton(concs, rtol, atol, max_iter)
+        if not converged and ptc:
+            concs = self._steady_ptc(concs_0, rtol, atol, max_ptc_iter)
+            concs, converged = self._steady_newton(concs, rtol, atol, max_iter)
+        if not converged:
+            raise np.linalg.LinAlgError('Steady state cannot converge within max_iter.')
+        return dict(zip(self._species_ls, concs))
+
+    def _steady_newton(self, concs, rtol, atol, max_iter):
+        '''damped Newton in the conservation subspace, returns (concs, converged)'''
+        Z = self._stoich_split()[0]
+        if Z.shape[1] == 0:
+            return concs, True
+        rate = self._reac_rate_array(concs)
+        for _ in range(max_iter):
+            self.steady_stats['n_newton'] += 1
+            jac_sub = Z.T.dot(self.compute_jac(concs)).dot(Z)
+            try:
+                dconcs = -Z.dot(np.linalg.solve(jac_sub, Z.T.dot(rate)))
+            except np.linalg.LinAlgError:
+                return concs, False
+            if np.all(np.abs(dconcs) <= atol + rtol * np.abs(concs)):
+                return np.maximum(concs + dconcs, 0), True
+            # 0 if the step drives a species at 0 negative, then left to the fallback
+            alpha = _fraction_to_boundary(concs, dconcs)
+            norm = np.sqrt(np.sum(rate**2))
+            while alpha > 1e-8:
+                rate_new = self._reac_rate_array(concs + alpha * dconcs)
+                if np.sqrt(np.sum(rate_new**2)) <= (1 - 1e-4 * alpha) * norm:
+                    break
+                alpha /= 2
+            else:
+                return concs, False
+            concs, rate = concs + alpha * dconcs, rate_new
+        return concs, False
+
+    def _steady_ptc(self, concs, rtol, atol, max_iter):
+        '''pseudo-transient continuation in the conservation subspace, with SER dtau update'''
+        Z = self._stoich_split()[0]
+        rate = self._reac_rate_array(concs)
+        norm = np.sqrt(np.sum(rate**2))
+        jac = self.compute_jac(concs)
+        dtau = 0.1 / max(np.max(np.sum(np.abs(jac), axis=1)), np.finfo(float).tiny)
+        for _ in range(max_iter):
+            self.steady_stats['n_ptc'] += 1
+            jac_sub = Z.T.dot(jac).dot(Z)
+            mat = np.eye(Z.shape[1]) / dtau - jac_sub
+            dconcs = _project_to_boundary(concs, Z.dot(np.linalg.solve(mat, Z.T.dot(rate))))
+            alpha = _fraction_to_boundary(concs, dconcs)
+            concs = np.maximum(concs + alpha * dconcs, 0)
+            rate = self._reac_rate_array(concs)
+            norm_new = np.sqrt(np.sum(rate**2))
+            if np.all(np.abs(dconcs) <= atol + rtol * np.abs(concs)):
+                break
+            # switched evolution relaxation
+            dtau = dtau * min(norm / max(norm_new, np.finfo(float).tiny), 10.0)
+            norm = norm_new
+            jac = self.compute_jac(concs)
+        return concs
+
+    def sweep(self, temperatures, t_bound=None, steady=False, method='ROS4', rtol=1e-3, atol=1e-6, 
+              sparse=False, store=None, **options):
+        '''evolutions or steady states over a range of temperatures, by natural-parameter continuation
+
+        the points are solved in the order of increasing temperature, from the current 
+        concentrations, each solve being warm-started from its neighbor:
+            evolutions start with the first step size of the neighbor, but for 'SIE' which has
+            no first step, and 'SIE', 'ROS4' reuse its linear solver (e.g. the fill-reducing 
+            ordering of the sparse LU).
+            steady states start Newton from the neighbor's solution, extrapolated linearly in
+            temperature from the last two solutions once they are available.
+        a warm start that fails (raises LinAlgError, or gives non-finite concentrations) falls 
+        back to a cold start. the temperature and the concentrations are restored at the end.
+
+        INPUTS:
+            temperatures:   list of float, the temperatures
+            t_bound:        float, end time of the evolutions, required unless steady
+            steady:         boolean, whether to solve steady states instead of evolutions
+            method, rtol, atol, sparse:
+                            see `evolute`, for evolutions only
+            store:          TrajectoryStore, if given each evolution is written to it as it goes,
+                            as run str(n) for temperatures[n], with attribute T, and its solution 
+                            reads the run back, defaults None. for evolutions only
+            options:        other keyword options passed to `evolute`, or to `steady_state`
+        OUTPUTS:
+            results:        list, in the order of temperatures, evolution solutions (see 
+                            `evolute`), or dicts of steady-state concentrations
+            report:         dict, with keys
+                            'order': list of int, the order the points were solved in,
+                            'warm': list of boolean, whether each warm start succeeded,
+                            'n_iter': list of int, Newton and pseudo-transient iterations of 
+                            each steady state, the failed warm starts included
+        '''
+        if not steady and t_bound is None:
+            raise ValueError("t_bound is required for evolutions.")
+        if steady and store is not None:
+            raise ValueError("store is for evolutions only.")
+        for T in temperatures:
+            if T <= 0:
+                raise ValueError("T = {0:18.16e}: Negative Temperature is prohibited!".format(T))
+        T_current, concs_current = self._T, dict(self._concs)
+        order = list(np.argsort(temperatures, kind='stable'))
+        results, warm = [None] * len(temperatures), [False] * len(temperatures)
+        n_iter = [0] * len(temperatures)
+        history = []  # (T, solution array) of the solved steady states
+        h_first = None
+        linsolver = None
+        if method in ['SIE', 'ROS4'] and not steady:
+            linsolver = make_linsolver(
+                'krylov' if options.get('matrix_free', False) else 'sparse' if sparse else 'dense')
+
+        try:
+            for n in order:
+                T = temperatures[n]
+                self.set_temp(T)
+                self.set_concs(concs_current)
+                if steady:
+                    guess = None
+                    if len(history) >= 2 and history[-1][0] != history[-2][0]:
+                        (T_0, c_0), (T_1, c_1) = history[-2:]
+                        guess = np.maximum(c_1 + (c_1 - c_0) * (T - T_1) / (T_1 - T_0), 0)
+                    elif history:
+                        guess = history[-1][1]
+                    res = None
+                    if guess is not None:
+                        try:
+                            res = self.steady_state(guess=guess, ptc=False, **options)
+                        except np.linalg.LinAlgError:
+                            res = None
+                        n_iter[n] += sum(self.steady_stats.values())
+                    warm[n] = res is not None
+                    if res is None:
+                        res = self.steady_state(**options)
+                        n_iter[n] += sum(self.steady_stats.values())
+                    history.append((T, np.array([res[sp] for sp in self._species_ls])))
+                else:
+                    res = None
+                    if h_first is not None:
+                        try:
+                            options_warm = dict(options)
+                            if method != 'SIE':
+                                options_warm['first_step'] = h_first
+                            if store is not None:
+                                options_warm['writer'] = store.writer(
+                                    str(n), self._species_ls, dict(T=T), overwrite=True)
+                            if linsolver is not None:
+                                options_warm['linsolver'] = linsolver
+                            res = self.evolute(
+                                t_bound, method=method, rtol=rtol, atol=atol, sparse=sparse, **options_warm)
+                            if not np.all(np.isfinite(list(res(res.t_final).values()))):
+                                res = None
+                        except np.linalg.LinAlgError:
+                            res = None
+                        self.set_concs(concs_current)
+                    warm[n] = res is not None
+                    if res is None:
+                        options_cold = dict(options)
+                        if store is not None:
+                            options_cold['writer'] = store.writer(
+                                str(n), self._species_ls, dict(T=T), overwrite=True)
+                        if linsolver is not None:
+                            linsolver = options_cold['linsolver'] = make_linsolver(
+                                'krylov' if options.get('matrix_free', False) else 'sparse' if sparse else 'dense')
+                        res = self.evolute(
+                            t_bound, method=method, rtol=rtol, atol=atol, sparse=sparse, **options_cold)
+                    h_first = res.h_first
+                results[n] = res
+        finally:
+            self.set_temp(T_current)
+            self.set_concs(concs_current)
+        report = dict(order=order, warm=warm)
+        if steady:
+            report['n_iter'] = n_iter
+        return results, report
+
+    def sensitivity(self, t_bound, params=('lnA', 'b', 'E'), normalized=False, rtol=1e-6, atol=1e-12, 
+                    sparse=False, **options):
+        '''forward sensitivities of the concentrations at t_bound w.r.t. the Arrhenius params
+
+        the sensitivities S = dconcs/dp follow S' = jac.S + dreac_rate/dp, which is integrated
+        with the concentrations by ROS4, reusing its factorizations. params of a backward rate
+        coefficient are those of its forward one, since the equilibrium coefficient is fixed.
+
+        INPUTS:
+            t_bound:    float, end time of the evolution
+            params:     tuple of str, any of 'lnA', 'b', 'E', defaults all of them
+            normalized: boolean, whether to return d(ln concs)/d(ln p) instead, which is 
+                        zero where the concentration is zero, defaults False
+            rtol:       float, relative error tolerance, defaults 1e-6
+            atol:       float, absolute error tolerance, defaults 1e-12
+            sparse:     boolean, whether to factorize with sparse LU, defaults False
+            options:    other keyword options passed to RosenbrockSensitivity.solve, 
+                        e.g. max_step, first_step
+        OUTPUTS:
+            sens:       dict, sens[p][i,m] = d(concs_i)/d(p of reaction m) at t_bound
+        '''
+        dlnk = self._param_dlnk(params)
+        nu = self._nu_2 - self._nu_1
+        M = len(self._reactions_ls)
+
+        def fun(t, concs):
+            return self._reac_rate_array(np.maximum(concs, 0))
+
+        def jac(t, concs):
+            return self.compute_jac(np.maximum(concs, 0), sparse=sparse)
+
+        def dfdp(t, concs):
+            rate_f, rate_b = self._prog_rate_array(np.maximum(concs, 0))
+            net_rate = rate_f - rate_b
+            return np.hstack([nu * (net_rate * dlnk[p]) for p in params])
+
+        solver = RosenbrockSensitivity(fun, jac, dfdp, 'sparse' if sparse else 'dense')
+        options.setdefault('autonomous', True)
+        _, y_sol = solver.solve(self.get_concs_array(), 0, t_bound, rtol=rtol, atol=atol, **options)
+        concs = y_sol[:, -1]
+
+        sens = {}
+        for n, p in enumerate(params):
+            s = solver.s_sol[:, n*M:(n+1)*M]
+            if normalized:
+                if p == 'lnA':
+                    scale = np.ones(M)
+                else:
+                    scale = np.array([
+                        r.get_params()['coeffParams'].get(p, 0.0) for r in self._reactions_ls], dtype=float)
+                s = np.divide(s * scale, concs[:, None], out=np.zeros(s.shape), where=concs[:, None]>0)
+            sens[p] = s
+        return sens
+
+    def adjoint_gradient(self, t_bound, weights=None, event=None, params=('lnA', 'b', 'E'), 
+                         rtol=1e-6, atol=1e-12, sparse=False, n_checkpoints=1):
+        '''gradient of a scalar objective w.r.t. the Arrhenius params of every reaction, by adjoint
+
+        the objective is either a weighted sum of the concentrations at t_bound, or the time 
+        an event first occurs (e.g. an ignition time, see `make_threshold_event`). the cost is 
+        about that of two evolutions, whatever the number of params, see `solve_adjoint`.
+
+        INPUTS:
+            t_bound:    float, end time of the evolution
+            weights:    dict of {species: weight}, or N array, the objective is the weighted sum 
+                        of the concentrations at t_bound. ignored if event is given
+            event:      callable, event(t, concs) gives a float, the objective is then the time 
+                        of its first zero crossing, which must occur before t_bound
+            params:     tuple of str, any of 'lnA', 'b', 'E', defaults all of them
+            rtol:       float, relative error tolerance, defaults 1e-6
+            atol:       float, absolute error tolerance, defaults 1e-12
+            sparse:     boolean, whether to factorize with sparse LU, defaults False
+            n_checkpoints: int, number of forward segments kept as checkpoints, defaults 1
+        OUTPUTS:
+            value:      float, the objective
+            grad:       dict, grad[p][m] = d(objective)/d(p of reaction m)
+        '''
+        dlnk = self._param_dlnk(params)
+        nu = self._nu_2 - self._nu_1
+        N = len(self._species_ls)
+
+        def fun(t, concs):
+            return self._reac_rate_array(np.maximum(concs, 0))
+
+        def jac(t, concs):
+            return self.compute_jac(np.maximum(concs, 0), sparse=sparse)
+
+        def quad(t, concs, lam):
+            rate_f, rate_b = self._prog_rate_array(np.maximum(concs, 0))
+            lam_rate = nu.T.dot(lam) * (rate_f - rate_b)
+            return np.concatenate([lam_rate * dlnk[p] for p in params])
+
+        if event is not None:
+            event_term = lambda t, concs: event(t, concs)
+            event_term.terminal = True
+            event_term.direction = getattr(event, 'direction', 0)
+            events = [event_term]
+
+            def fun_weights(t, concs):
+                # dt_event/dp = -(dg/dconcs . dconcs/dp) / (dg/dconcs . dconcs/dt)
+                dg = np.zeros(N)
+                for i in range(N):
+                    delta = np.sqrt(np.finfo(float).eps) * max(1.0, abs(concs[i]))
+                    dconcs = np.zeros(N)
+                    dconcs[i] = delta
+                    dg[i] = (event(t, concs + dconcs) - event(t, concs - dconcs)) / (2 * delta)
+                return -dg / np.dot(dg, fun(t, concs))
+        else:
+            events = None
+            if weights is None:
+                raise ValueError("Either weights or event should be given.")
+            if isinstance(weights, dict):
+                weights = [weights.get(sp, 0.0) for sp in self._species_ls]
+            weights = np.array(weights, dtype=float)
+            if len(weights) != N:
+                raise ValueError("Dimensions of weights and species arrays do not match.")
+            fun_weights = lambda t, concs: weights
+
+        res = solve_adjoint(
+            fun, jac, quad, (0, t_bound), self.get_concs_array(), fun_weights, 
+            rtol=rtol, atol=atol, linsolver='sparse' if sparse else 'dense', 
+            n_checkpoints=n_checkpoints, autonomous=True, events=events)
+        if event is not None:
+            if res['t_final'] >= t_bound:
+                raise ValueError("The event does not occur before t_bound.")
+            value = res['t_final']
+        else:
+            value = np.dot(weights, res['y_final'])
+
+        M = len(self._reactions_ls)
+        grad = {p: res['grad'][n*M:(n+1)*M] for n, p in enumerate(params)}
+        return value, grad
+
+    def _param_dlnk(self, params):
+        '''d(ln k)/dp of every reaction, so that d(rate)/dp = rate * d(ln k)/dp'''
+        params_allowed = ('lnA', 'b', 'E')
+        for p in params:
+            if p not in params_allowed:
+                raise ValueError(
+                    '''Sensitivity w.r.t. \'{}\' is not supported. '''
+                    '''Try: {}'''.format(p, ', '.join(params_allowed)) )
+        if len(self._concs) != len(self._species_ls):
+            raise ValueError("Concentrations not yet defined. Call set_concs() before calling this function.")
+        derivs = [r.rateCoeffParamDerivs(T=self._T) for r in self._reactions_ls]
+        dlnk = {}
+        for p in params:
+            dk = np.array([d[p] for d in derivs], dtype=float)
+            dlnk[p] = np.divide(dk, self._kf, out=np.zeros(len(dk)), where=self._kf!=0)
+        return dlnk
+
+    def mapping(self, dt, concs=None, gradient=False, rtol=1e-6, atol=1e-12, sparse=False):
+        '''the reaction mapping, concentrations after a time step dt, solved by ROS4
+
+        INPUTS:
+            dt:         float, the time step
+            concs:      n array of float, the initial concentrations, defaults the current ones
+            gradient:   boolean, whether to also return the mapping gradient, which is 
+                        integrated along as the sensitivities to the initial concentrations
+            rtol, atol: float, error tolerances, default 1e-6, 1e-12
+            sparse:     boolean, whether to factorize with sparse LU, defaults False
+        OUTPUTS:
+            concs_dt:   n array, concentrations after dt
+            grad:       n*n array, grad[i,j] = d(concs_dt[i])/d(concs[j]), if gradient
+        '''
+        concs = np.array(self.get_concs_array() if concs is None else concs, dtype=float)
+        N = len(concs)
+        fun = lambda t, concs: self._reac_rate_array(np.maximum(concs, 0))
+        jac = lambda t, concs: self.compute_jac(np.maximum(concs, 0), sparse=sparse)
+        linsolver = 'sparse' if sparse else 'dense'
+        if not gradient:
+            _, y_sol = Rosenbrock(fun, jac, linsolver).solve(
+                concs, 0, dt, rtol=rtol, atol=atol, autonomous=True)
+            return y_sol[:, -1]
+        solver = RosenbrockSensitivity(fun, jac, lambda t, concs: np.zeros((N, N)), linsolver)
+        _, y_sol = solver.solve(concs, 0, dt, rtol=rtol, atol=atol, autonomous=True, s0=np.eye(N))
+        return y_sol[:, -1], solver.s_sol
+
+    def isat(self, dt, eps_tol=1e-3, max_records=10000, scale=1.0, r_max=1.0, **options):
+        '''in-situ adaptive tabulation of the reaction mapping over a fixed time step dt
+
+        INPUTS:
+            dt:             float, the time step
+            eps_tol:        float, error tolerance of the retrievals, defaults 1e-3
+            max_records:    int, max number of records, the least recently used gets evicted
+            scale:          float or n array, scale of the concentrations, defaults 1.0
+            r_max:          float, max radius of a new ellipsoid of accuracy, defaults 1.0
+            options:        keyword options passed to `mapping`, e.g. rtol, atol, sparse
+        OUTPUTS:
+            table:          ISATable, table.query(concs) gives the concentrations after dt,
+                            concs being n array in the order of the species list
+        '''
+        return ISATable(
+            fun=lambda concs: self.mapping(dt, concs, **options),
+            fun_grad=lambda concs: self.mapping(dt, concs, gradient=True, **options),
+            eps_tol=eps_tol, max_records=max_records, scale=scale, r_max=r_max)
+
+    def detect_qss(self, tau, concs=None):
+        '''detect quasi-steady-state species by timescale analysis of the jacobian
+
+        the number of fast modes is the number of jacobian eigenvalues faster than 1/tau. species 
+        are then taken by increasing lifetime -1/jac[i,i], up to that number, as long as the 
+        lifetime is below tau and the jacobian block of the qss species stays well conditioned,
+        which excludes fast equilibria, e.g. both sides of a fast reversible reaction.
+
+        INPUTS:
+            tau:    float, lifetime threshold
+            concs:  n array of float, the state to analyse, defaults the current concentrations
+        OUTPUTS:
+            qss:    list of str, the qss species, in the order of the species list
+        '''
+        if concs is None:
+            concs = self.get_concs_array()
+        jac = self.compute_jac(np.maximum(concs, 0))
+        n_fast = int(np.sum(-np.linalg.eigvals(jac).real > 1 / tau))
+        with np.errstate(divide='ignore'):
+            lifetime = np.where(np.diag(jac) < 0, -1 / np.diag(jac), np.inf)
+        idx_q = []
+        for i in np.argsort(lifetime, kind='stable'):
+            if len(idx_q) >= n_fast or lifetime[i] >= tau:
+                break
+            trial = idx_q + [i]
+            if np.linalg.cond(jac[np.ix_(trial, trial)]) < 1e10:
+                idx_q = trial
+        return [self._species_ls[i] for i in sorted(idx_q)]
+
+    def detect_fast(self, tau, concs=None):
+        '''detect the fast species of the multirate solver, by their lifetimes -1/jac[i,i]
+
+        INPUTS:
+            tau:    float, lifetime threshold
+            concs:  n array of float, the state to analyse, defaults the current concentrations
+        OUTPUTS:
+            fast:   list of str, the species whose lifetime is below tau, in the order of the
+                    species list
+        '''
+        if concs is None:
+            concs = self.get_concs_array()
+        diag = np.diag(self.compute_jac(np.maximum(concs, 0)))
+        return [sp for sp, d in zip(self._species_ls, diag) if d < 0 and -1 / d < tau]
+
+    def fingerprint(self):
+        '''fingerprint of the mechanism at the current temperature, a hash of the species, the 
+        stoich coeffs, the reversibility and the reaction rate coefficients (not the concentrations)
+
+        OUTPUTS:
+            fingerprint:    str, hex digest
+        '''
+        digest = hashlib.sha1()
+        digest.update('\n'.join(self._species_ls).encode())
+        for arr in [self._nu_1, self._nu_2, self._reversible]:
+            digest.update(np.ascontiguousarray(arr, dtype=float).tobytes())
+        # rounded to 12 significant digits, so that roundoff does not change the fingerprint
+        digest.update(np.array(
+            [float('{:.12g}'.format(k)) for k in np.ravel(self.get_reac_rate_coefs())]).tobytes())
+        return digest.hexdigest()
+
+    def estimate_stiffness(self, concs=None, n_iter=20):
+        '''estimate the timescales of the kinetics from the jacobian, without its eigenvalues
+
+        the spectral radius rho is bounded by Gershgorin discs, max_i sum_j |jac[i,j]|, and 
+        estimated by power iteration on jac^2 (so that complex pairs of eigenvalues converge),
+        which stays within the bound.
+
+        INPUTS:
+            concs:  n array of float, the state to analyse, defaults the current concentrations
+            n_iter: int, number of power iterations, defaults 20
+        OUTPUTS:
+            stiffness:  dict, with keys
+                        'rho_gershgorin', 'rho': the bound and the estimate of the spectral radius,
+                        'tau_fast': 1 / rho, the fastest timescale,
+                        'tau_slow': the longest finite species lifetime -1/jac[i,i],
+                        'density': the fraction of nonzeros of the jacobian
+        '''
+        if concs is None:
+            concs = self.get_concs_array()
+        jac = self.compute_jac(np.maximum(concs, 0), sparse=True)
+        N = jac.shape[0]
+        rho_gershgorin = float(np.max(abs(jac).sum(axis=1))) if N else 0.0
+        rho = 0.0
+        if rho_gershgorin > 0:
+            v = np.random.RandomState(0).rand(N)
+            v /= np.linalg.norm(v)
+            for _ in range(n_iter):
+                w = jac.dot(jac.dot(v))
+                norm = np.linalg.norm(w)
+                if norm == 0:
+                    break
+                rho, v = np.sqrt(norm), w / norm
+            rho = min(rho, rho_gershgorin)
+        diag = jac.diagonal()
+        lifetimes = -1 / diag[diag < 0]
+        return dict(
+            rho_gershgorin=rho_gershgorin,
+            rho=rho,
+            tau_fast=1 / rho if rho > 0 else np.inf,
+            tau_slow=float(np.max(lifetimes)) if len(lifetimes) else np.inf,
+            density=jac.nnz / N**2 if N else 0.0)
+
+    def choose_method(self, t_bound, t_start=0, rtol=1e-3, concs=None, multirate=False, refresh=False):
+        '''choose the ode solver and the linear algebra for `evolute(method='auto')`
+
+        the stiffness index rho * (t_bound - t_start), see `estimate_stiffness`, decides:
+            below 100, the problem is not stiff, 'LSODA' (explicit Adams steps until it detects
+            stiffness itself),
+            otherwise, 'MR' if the mechanism has at least 50 species of which at most a quarter
+            are fast (lifetime below 1e-3 of the time span) and multirate is allowed, 'ROS4' 
+            for rtol >= 1e-6, 'BDF' for tighter tolerances, where its higher order pays off.
+        evolute(method='auto') does not allow 'MR', which beats 'ROS4' only where factorizing the
+        whole system dominates, rarely on sparse mechanisms, see `Multirate`.
+        sparse linear algebra is chosen for at least 50 species and a jacobian density below 0.2.
+        the choice is remembered by this system per mechanism fingerprint (see `fingerprint`), 
+        temperature, decade of every concentration, of the time span and of rtol, and multirate,
+        and reused by later calls at a similar state. the last _AUTO_CHOICES_MAX choices are kept.
+
+        INPUTS:
+            t_bound:    float, end time of the evolution
+            t_start:    float, start time of the evolution, defaults 0
+            rtol:       float, relative error tolerance, defaults 1e-3
+            concs:      n array of float, the state to analyse, defaults the current concentrations
+            multirate:  boolean, whether 'MR' may be chosen, defaults False
+            refresh:    boolean, whether to analyse again instead of reusing the remembered 
+                        choice, defaults False
+        OUTPUTS:
+            choice:     dict, with keys 'method', 'sparse', 'stiffness_index', and 'stiffness',
+                        see `estimate_stiffness`
+        '''
+        span = t_bound - t_start
+        if span <= 0:
+            raise ValueError("t_bound = {}: should be later than t_start = {}.".format(t_bound, t_start))
+        if concs is None:
+            concs = self.get_concs_array()
+        # the decades of the concentrations, those below 1e-300 (e.g. zero) all in one
+        decades = np.floor(np.log10(np.maximum(np.abs(np.asarray(concs, dtype=float)), 1e-300)))
+        key = (self.fingerprint(), float(self._T), decades.astype(int).tobytes(), 
+               int(np.floor(np.log10(span))), int(np.floor(np.log10(rtol))), bool(multirate))
+        if not refresh and key in self._auto_choices:
+            self._auto_choices.move_to_end(key)
+            return dict(self._auto_choices[key])
+
+        stiffness = self.estimate_stiffness(concs)
+        stiffness_index = stiffness['rho'] * span
+        N = len(self._species_ls)
+        large = N >= 50
+        if stiffness_index < 100:
+            method = 'LSODA'
+        elif multirate and large and 0 < len(self.detect_fast(1e-3 * span, concs)) <= N / 4:
+            method = 'MR'
+        elif rtol >= 1e-6:
+            method = 'ROS4'
+        else:
+            method = 'BDF'
+        choice = dict(
+            method=method,
+            sparse=large and stiffness['density'] < 0.2 and method != 'LSODA',
+            stiffness_index=stiffness_index,
+            stiffness=stiffness)
+        self._auto_choices[key] = choice
+        if len(self._auto_choices) > _AUTO_CHOICES_MAX:
+            self._auto_choices.popitem(last=False)
+        return dict(choice)
+
+    def _fast_rates(self, fast):
+        '''rates and jacobian of the fast species on the whole concentrations, evaluated on 
+        the subsystem of the reactions that change them only'''
+        for sp in fast:
+            if sp not in self._species_ls:
+                raise ValueError('Species = "{}". Not in the reaction system.'.format(sp))
+        nu = self._nu_2 - self._nu_1
+        idx_fast = [i for i, sp in enumerate(self._species_ls) if sp in fast and np.any(nu[i])]
+        fast_ls = [self._species_ls[i] for i in idx_fast]
+        if not idx_fast:
+            return fast_ls, idx_fast, None, None
+        sub = self.subsystem(list(np.nonzero(np.any(nu[idx_fast] != 0, axis=0))[0]))
+        idx_sub = [self._species_ls.index(sp) for sp in sub.get_species()]
+        pos = [sub.get_species().index(sp) for sp in fast_ls]
+
+        def fun_fast(t, concs):
+            return sub._reac_rate_array(np.maximum(concs[idx_sub], 0))[pos]
+
+        def jac_fast(t, concs):
+            return sub.compute_jac(np.maximum(concs[idx_sub], 0))[np.ix_(pos, pos)]
+
+        return fast_ls, idx_fast, fun_fast, jac_fast
+
+    def _qss_solve(self, concs, idx_q, rtol=1e-10, max_iter=50):
+        '''damped Newton on reac_rate[idx_q] = 0 for concs[idx_q], the others fixed'''
+        concs = np.array(concs, dtype=float)
+        atol = 1e-14 * max(np.max(concs), np.finfo(float).tiny)
+        for _ in range(max_iter):
+            rate_q = self._reac_rate_array(concs)[idx_q]
+            jac_qq = self.compute_jac(concs)[np.ix_(idx_q, idx_q)]
+            try:
+                dconcs = -np.linalg.solve(jac_qq, rate_q)
+            except np.linalg.LinAlgError:
+                raise np.linalg.LinAlgError("The jacobian of the QSS species is singular.")
+            dconcs = _project_to_boundary(concs[idx_q], dconcs)
+            alpha = _fraction_to_boundary(concs[idx_q], dconcs)
+            concs[idx_q] = np.maximum(concs[idx_q] + alpha * dconcs, 0)
+            if np.all(np.abs(dconcs) <= atol + rtol * np.abs(concs[idx_q])):
+                return concs[idx_q]
+        raise np.linalg.LinAlgError("The QSS concentrations cannot converge.")
+
+    def make_threshold_event(self, species, threshold, terminal=True, direction=0):
+        '''event function for `evolute`, fires when concs of species crosses threshold
+
+        INPUTS:
+            species:    str, name of the species
+            threshold:  float, the concentration to detect
+            terminal:   boolean, whether to stop the evolution at the crossing, defaults True
+            direction:  float, >0 for rising crossings only, <0 for falling, 0 for both, defaults 0
+        OUTPUTS:
+            event:      function, event(t, concs) gives concs[species] - threshold
+        '''
+        if species not in self._species_ls:
+            raise ValueError('Species = "{}". Not in the reaction system.'.format(species))
+        idx = self._species_ls.index(species)
+        def event(t, concs):
+            return concs[idx] - threshold
+        event.terminal = terminal
+        event.direction = direction
+        return event
+
+
+# number of choices of evolute(method='auto') remembered per system, see ReactionSystem.choose_method
+_AUTO_CHOICES_MAX = 64
+
+
+def _as_trajectory(solution, t, concs, species):
+    '''Trajectory of the samples, with the attributes already set on solution'''
+    trajectory = Trajectory(t, concs, species)
+    for attr, value in vars(solution).items():
+        setattr(trajectory, attr, value)
+    return trajectory
+
+
+def _wrap_event(event, full_concs):
+    '''event on the integrated species, evaluating event on the concentrations of all species'''
+    def event_wrapped(t, concs):
+        return event(t, full_concs(concs))
+    for attr in ['terminal', 'direction']:
+        if hasattr(event, attr):
+            setattr(event_wrapped, attr, getattr(event, attr))
+    return event_wrapped
+
+
+class _ReactionArrays:
+    '''the reactions of the array form of a mechanism, as a sequence of Reaction objects which
+    are only built, once, when accessed. the rate coefficients and the reversibility are read
+    from the arrays. reactions appended afterwards are kept as Reaction objects'''
+
+    def __init__(self, mechanism):
+        self.species = list(mechanism['species'])
+        self.nu_1, self.nu_2 = [
+            np.asarray(nu.toarray() if scipy.sparse.issparse(nu) else nu, dtype=float)
+            for nu in (mechanism['nu_1'], mechanism['nu_2'])]
+        self.ID, self.TYPE = list(mechanism['ID']), list(mechanism['TYPE'])
+        self.coeffLaw = list(mechanism['coeffLaw'])
+        self.reversible = np.asarray(mechanism['reversible'], dtype=bool)
+        M = len(self.ID)
+        if not M:
+            raise ValueError("Reaction array is empty or None.")
+        if self.nu_1.shape != (len(self.species), M) or self.nu_2.shape != (len(self.species), M):
+            raise ValueError("nu_1, nu_2 should be {}*{} arrays.".format(len(self.species), M))
+        for nu in (self.nu_1, self.nu_2):
+            if np.any(nu < 0) or np.any(nu != np.round(nu)):
+                raise ValueError("Stoich. coeff must be a non-negative integer.")
+
+        # the reactions are grouped by coeff law and by the coeff params they provide, the
+        # params that are not provided take the defaults of the law, as for a Reaction
+        for TYPE in set(self.TYPE):
+            if TYPE != 'Elementary':
+                raise NotImplementedError(' '.join([
+                    'TYPE = {}.'.format(TYPE),
+                    'Non-elementary reaction is not implemented.']))
+        self.coeffParams = {tag: np.asarray(v, dtype=float) for tag, v in mechanism['coeffParams'].items()}
+        tags = list(self.coeffParams)
+        present = np.array([~np.isnan(self.coeffParams[tag]) for tag in tags], dtype=bool).reshape(-1, M)
+        self._groups = {}
+        for m, key in enumerate(zip(self.coeffLaw, map(tuple, present.T.tolist()))):
+            self._groups.setdefault(key, []).append(m)
+        self._groups = {
+            (law, tuple(tag for tag, p in zip(tags, mask) if p)): np.array(idx)
+            for (law, mask), idx in self._groups.items()}
+        for (law, group_tags), idx in self._groups.items():
+            if law not in Reaction._CoeffLawDict._dict_all:
+                raise NotImplementedError(' '.join([
+                    'coeffLaw = {}.'.format(law),
+                    'Referred reaction rate coefficient law is not implemented.']))
+            law_model = Reaction._CoeffLawDict._dict_all[law]
+            values = [self.coeffParams[tag][idx].tolist() for tag in group_tags]
+            for n in range(len(idx)):
+                law_model(check=True, **{tag: v[n] for tag, v in zip(group_tags, values)})
+        self._reactions = {}
+        self._extra = []
+
+    def _get_coeffParams(self, m):
+        return {tag: float(v[m]) for tag, v in self.coeffParams.items() if not np.isnan(v[m])}
+
+    def _build(self, m):
+        stoich = [
+            {self.species[i]: int(nu[i, m]) for i in np.nonzero(nu[:, m])[0]} for nu in (self.nu_1, self.nu_2)]
+        return Reaction(
+            reversible=bool(self.reversible[m]), TYPE=self.TYPE[m], ID=self.ID[m],
+            coeffLaw=self.coeffLaw[m], coeffParams=self._get_coeffParams(m),
+            reactants=stoich[0], products=stoich[1])
+
+    def __len__(self):
+        return len(self.ID) + len(self._extra)
+
+    def __getitem__(self, m):
+        if isinstance(m, slice):
+            return [self[n] for n in range(*m.indices(len(self)))]
+        if m < 0:
+            m += len(self)
+        if not 0 <= m < len(self):
+            raise IndexError('reaction index out of range')
+        if m >= len(self.ID):
+            return self._extra[m - len(self.ID)]
+        if m not in self._reactions:
+            self._reactions[m] = self._build(m)
+        return self._reactions[m]
+
+    def __iter__(self):
+        for m in range(len(self)):
+            yield self[m]
+
+    def __bool__(self):
+        return True
+
+    def append(self, reaction):
+        self._extra.append(reaction)
+
+    def get_species(self):
+        '''the species involved in the reactions, in the order of the mechanism'''
+        involved = np.any(self.nu_1 != 0, axis=1) | np.any(self.nu_2 != 0, axis=1)
+        species = [sp for sp, i in zip(self.species, involved) if i]
+        for r in self._extra:
+            species += r.get_species()
+        return species
+
+    def get_reversible(self):
+        return np.concatenate([self.reversible, [bool(r.is_reversible()) for r in self._extra]]).astype(bool)
+
+    def rate_coefs(self, T):
+        '''the rate coefficients at temperature T, each group of reactions at once'''
+        kf = np.zeros(len(self))
+        for (law, tags), idx in self._groups.items():
+            law_model = Reaction._CoeffLawDict._dict_all[law]
+            if law_model in Reaction._CoeffLawDict._dict_builtin.values():
+                params = {tag: self.coeffParams[tag][idx] for tag in tags}
+                kf[idx] = law_model(check=False, **params).compute(check=False, T=T)
+            else:
+                # a user defined law may not take arrays
+                kf[idx] = [self[m].rateCoeff(T=T) for m in idx]
+        for n, r in enumerate(self._extra):
+            kf[len(self.ID) + n] = r.rateCoeff(T=T)
+        return kf
+
+
+def _pad_stoich(nu):
+    '''pads the nonzero stoich coeffs of each reaction (column of nu) into M*K arrays
+    of species indices and orders, unused slots have index 0 and order 0'''
+    N, M = nu.shape
+    nz_m, nz_i = np.nonzero(nu.T)
+    counts = np.bincount(nz_m, minlength=M)
+    K = max(1, int(np.max(counts))) if M else 1
+    idx = np.zeros((M, K), dtype=int)
+    order = np.zeros((M, K))
+    # the species of a reaction fill its slots in ascending order
+    slots = np.arange(len(nz_m)) - np.repeat(np.cumsum(counts) - counts, counts)
+    idx[nz_m, slots] = nz_i
+    order[nz_m, slots] = nu[nz_i, nz_m]
+    return idx, order
+
+
+def _fraction_to_boundary(concs, dconcs, tau=0.99):
+    '''largest step fraction in [0, 1] that keeps concs + alpha*dconcs non-negative, 0 if a 
+    species at 0 already is driven negative, see `_project_to_boundary`'''
+    neg = dconcs < 0
+    if not np.any(neg):
+        return 1.0
+    ratio = -concs[neg] / dconcs[neg]
+    return float(min(1.0, tau * np.min(ratio))) if np.min(ratio) > 0 else 0.0
+
+
+def _project_to_boundary(concs, dconcs):
+    '''dconcs with the components driving species at 0 already negative zeroed out'''
+    return np.where((concs <= 0) & (dconcs < 0), 0.0, dconcs)
+
 
-        return solution
\ No newline at end of file
+def _dprog_slots(k, idx, order, concs):
+    '''d(k_m * prod_j concs_j**ord_mj)/d(concs_j) for every padded slot (m, j)'''
+    powers = concs[idx] ** order
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dpowers = np.where(order > 0, order * concs[idx] ** (order - 1), 0.0)
+    K = idx.shape[1]
+    others = np.ones_like(powers)
+    for kk in range(K):
+        others[:, kk] = np.prod(np.delete(powers, kk, axis=1), axis=1)
+    return k[:, None] * dpowers * others
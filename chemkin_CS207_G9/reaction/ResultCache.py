@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import uuid
+import zipfile
+from contextlib import contextmanager
+import numpy as np
+from chemkin_CS207_G9.math.ode_solver import HermiteOutput
+from chemkin_CS207_G9.reaction.Trajectory import Trajectory
+
+try:
+    import fcntl
+except ImportError: # not on POSIX, the eviction then runs unlocked
+    fcntl = None
+
+
+# bumped whenever the stored format or the meaning of the options changes
+_CACHE_VERSION = 1
+
+
+class EvoluteCache:
+    """
+    Persistent on-disk cache of ReactionSystem.evolute results, addressed by content
+
+    the key is a sha256 of the mechanism fingerprint (see ReactionSystem.fingerprint), the
+    temperature, the initial concentrations, t_bound and every keyword option of evolute, so
+    that identical integrations from any process or session hit the same entry. an entry is a
+    compressed .npz file holding
+        the samples of the Trajectory if t_eval is given,
+        the final concentrations only if final_only,
+        the steps of the Hermite dense output otherwise,
+    along with the concentrations that evolute writes back to the system, which are written
+    back on a hit as well. calls that cannot be keyed (e.g. events or linear solver objects,
+    which are not plain data) or whose dense output is not a plain trajectory (qss, conserve,
+    transform, linear mechanisms solved in closed form) are run without the cache.
+
+    unless dense_species, dense_dtype or dense_window are given, a miss runs evolute with 
+    dense_dtype=float, so that the dense output is a HermiteOutput whose steps can be stored.
+    a cached evolute then differs from a plain call with the same arguments: solution.dense_output
+    is set, and solution(t) interpolates between the steps by cubic Hermite instead of by the
+    interpolant of the solver ('LSODA', 'Radau', 'BDF', 'SIE'). the steps, t_final and the 
+    concentrations written back are the same, and a hit returns exactly what the miss did.
+
+    entries are written to a temporary file and renamed, so that a reader never sees a partial
+    entry. the cache is bounded by max_bytes, the least recently used entries (by modification
+    time, which a hit refreshes) being evicted under an exclusive file lock, so that several
+    processes can share one cache directory.
+
+
+    ATTRIBUTES
+    ===========
+    path:       str, the cache directory
+    max_bytes:  int, the max total size of the entries
+    stats:      dict, counters of hits, misses, bypassed calls and evictions
+
+
+    METHODS
+    ========
+    key(self, reac_sys, t_bound, final_only=False, **options):
+        the key of an evolute call, None if it cannot be keyed
+        OUTPUTS: str
+
+    evolute(self, reac_sys, t_bound, final_only=False, bypass=False, **options):
+        reac_sys.evolute(t_bound, **options), from the cache if stored, unless bypass
+        OUTPUTS: as evolute, or dict of the final concentrations if final_only
+
+    size(self):
+        the total size of the entries, in bytes
+        OUTPUTS: int
+
+    clear(self):
+        remove every entry
+
+
+    EXAMPLES
+    ========
+    >>> import tempfile
+    >>> from chemkin_CS207_G9.reaction.Reaction import Reaction
+    >>> from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+    >>> reactions = [Reaction(reactants=dict(A=2), products=dict(B=1), coeffLaw='Constant', coeffParams=dict(k=1.0))]
+    >>> rs = ReactionSystem(reactions, initial_concs=dict(A=1.0, B=0.0))
+    >>> cache = EvoluteCache(tempfile.mkdtemp())
+    >>> first = cache.evolute(rs, 1.0, final_only=True, method='ROS4')
+    >>> rs.set_concs(dict(A=1.0, B=0.0))
+    >>> second = cache.evolute(rs, 1.0, final_only=True, method='ROS4')
+    >>> first == second, cache.stats['n_hit'], cache.stats['n_miss']
+    (True, 1, 1)
+
+    """
+
+    def __init__(self, path, max_bytes=2**30):
+        '''
+        INPUTS:
+            path:       str, the cache directory, created if needed
+            max_bytes:  int, the max total size of the entries, defaults 1 GiB
+        '''
+        if max_bytes <= 0:
+            raise ValueError("max_bytes = {}: should be positive.".format(max_bytes))
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = dict(n_hit=0, n_miss=0, n_bypass=0, n_evict=0)
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, reac_sys, t_bound, final_only=False, **options):
+        '''
+        INPUTS:
+            reac_sys:   ReactionSystem, at its current temperature and concentrations
+            t_bound, options:
+                        the arguments of evolute
+            final_only: boolean, whether only the final concentrations are asked for
+        OUTPUTS:
+            key:        str, hex digest, None if the call cannot be keyed
+        '''
+        try:
+            options = _canonical(options)
+        except TypeError:
+            return None
+        payload = dict(
+            version=_CACHE_VERSION,
+            mechanism=reac_sys.fingerprint(),
+            T=float(reac_sys.get_temp()).hex(),
+            concs=_canonical(np.asarray(reac_sys.get_concs_array(), dtype=float)),
+            t_bound=_canonical(t_bound),
+            final_only=bool(final_only),
+            options=options)
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def evolute(self, reac_sys, t_bound, final_only=False, bypass=False, **options):
+        '''
+        INPUTS:
+            reac_sys:   ReactionSystem, at its current temperature and concentrations
+            t_bound:    float, end time of the evolution
+            final_only: boolean, whether to return and store the final concentrations only,
+                        defaults False. not combined with t_eval
+            bypass:     boolean, whether to run evolute without reading or writing the cache,
+                        defaults False
+            options:    keyword options passed to evolute
+        OUTPUTS:
+            result:     as returned by evolute, or dict of the concentrations at the end of
+                        the evolution if final_only
+        '''
+        if final_only and options.get('t_eval') is not None:
+            raise ValueError("final_only does not support t_eval.")
+        key = None if bypass else self.key(reac_sys, t_bound, final_only, **options)
+        dense = not final_only and options.get('t_eval') is None
+        if key is not None and dense and (options.get('qss') or options.get('conserve')
+                                          or options.get('transform') is not None):
+            key = None
+        if key is None:
+            self.stats['n_bypass'] += 1
+            return _final(reac_sys.evolute(t_bound, **options), reac_sys) if final_only \
+                else reac_sys.evolute(t_bound, **options)
+
+        result = self._load(key, reac_sys)
+        if result is not None:
+            self.stats['n_hit'] += 1
+            return result
+        self.stats['n_miss'] += 1
+
+        if dense and not any(options.get(arg) is not None
+                             for arg in ['dense_species', 'dense_dtype', 'dense_window']):
+            # a HermiteOutput, the steps of which are stored
+            options = dict(options, dense_dtype=float)
+        solution = reac_sys.evolute(t_bound, **options)
+        attrs = {attr: _plain(getattr(solution, attr, None)) for attr in 
+                 ['t_final', 'h_first', 'h_last', 'method', 'qss', 'fast', 't_events', 'y_events']}
+        arrays = dict(state=np.asarray(reac_sys.get_concs_array(), dtype=float))
+        if final_only:
+            result = _final(solution, reac_sys)
+            arrays.update(kind='final', species=list(result), final=list(result.values()))
+        elif isinstance(solution, Trajectory):
+            result = solution
+            arrays.update(kind='trajectory', species=solution.species, t=solution.t, concs=solution.concs)
+        elif getattr(solution, 'dense_output', None) is not None:
+            result = solution
+            output = solution.dense_output
+            species = reac_sys.get_species()
+            idx = list(range(len(species))) if output.idx is None else output.idx
+            arrays.update(kind='dense', species=[species[i] for i in idx], t=output.t,
+                          y=output.y, dydt=output.dydt, idx=idx, trimmed=output.trimmed)
+        else: # solved in closed form, nothing worth storing
+            return solution
+        arrays['attrs'] = json.dumps(attrs)
+        self._store(key, arrays)
+        return result
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def _load(self, key, reac_sys):
+        '''the result stored under key, None if it is not, or was evicted meanwhile'''
+        try:
+            with np.load(self._entry_path(key)) as data:
+                entry = {name: data[name] for name in data.files}
+            os.utime(self._entry_path(key)) # the entry is now the most recently used
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+
+        reac_sys.set_concs(dict(zip(reac_sys.get_species(), entry['state'])))
+        species = [str(sp) for sp in entry['species']]
+        kind = str(entry['kind'])
+        if kind == 'final':
+            return dict(zip(species, entry['final'].tolist()))
+        if kind == 'trajectory':
+            result = Trajectory(entry['t'], entry['concs'], species)
+        else:
+            output = HermiteOutput.from_arrays(
+                entry['t'], entry['y'], entry['dydt'], list(entry['idx']), bool(entry['trimmed']))
+            result = lambda t: dict(zip(species, output.sol(t)))
+            result.dense_output = output
+        for attr, value in json.loads(str(entry['attrs'])).items():
+            if attr in ['t_events', 'y_events'] and value is not None:
+                value = [np.array(v) for v in value]
+            setattr(result, attr, value)
+        return result
+
+    def _store(self, key, arrays):
+        # written aside and then renamed, so that readers never see a partial entry
+        tmp = os.path.join(self.path, '.{}.{}.tmp'.format(key, uuid.uuid4().hex))
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, self._entry_path(key))
+        self._evict()
+
+    def _entries(self):
+        '''(mtime, size, path) of the entries, the least recently used first'''
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith('.npz') and not name.startswith('.'):
+                path = os.path.join(self.path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError: # evicted by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        with self._lock():
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    self.stats['n_evict'] += 1
+                except OSError:
+                    pass
+                total -= size
+
+    def clear(self):
+        with self._lock():
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def _lock(self):
+        '''exclusive lock of the cache directory, across processes'''
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, '.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _final(solution, reac_sys):
+    '''the concentrations at the end of an evolution, as a dict of float'''
+    concs = solution(solution.t_final)
+    return {sp: float(concs[sp]) for sp in reac_sys.get_species()}
+
+
+def _plain(value):
+    '''json-serializable form of a solution attribute'''
+    if isinstance(value, (np.floating, np.integer)):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _canonical(value):
+    '''a json-serializable form of plain data that is equal for equal values, exact for floats,
+    TypeError for anything else (e.g. functions, linear solver objects)'''
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value).hex()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, np.ndarray) and value.dtype.kind in 'biuf':
+        return dict(dtype=value.dtype.str, shape=list(value.shape),
+                    sha256=hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest())
+    if isinstance(value, (type, np.dtype)):
+        try:
+            return np.dtype(value).str
+        except TypeError:
+            pass
+    raise TypeError("{!r} is not plain data.".format(value))
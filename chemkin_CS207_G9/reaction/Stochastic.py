@@ -0,0 +1,546 @@
+import math
+import numpy as np
+import scipy.sparse
+from chemkin_CS207_G9.auxiliary.useful_structure import IndexedPriorityQueue
+
+
+class NextReactionMethod:
+    """
+    Exact stochastic simulation (Gillespie) of a ReactionSystem by the next-reaction method
+    of Gibson and Bruck
+
+    every reaction is a channel, and so is the reverse of every reversible reaction. the
+    propensity of a channel with rate coefficient k and reactant orders nu_j is
+
+        a = k * volume * prod_j [x_j]_nu_j / volume**nu_j
+
+    with x the molecule counts and [x]_n the falling factorial x(x-1)...(x-n+1), so that
+    a / volume tends to the deterministic progress rate as the counts grow. volume is the
+    number of molecules per unit of concentration.
+
+    each channel keeps a putative firing time in an indexed priority queue. an event fires
+    the earliest channel, then only the propensities of the channels depending on it (the
+    dependency graph, from the stoichiometry) are updated, and their firing times rescaled
+    by a_old / a_new, so that one event costs O(log M) rather than O(M).
+
+
+    ATTRIBUTES
+    ===========
+    reac_sys:       ReactionSystem, the mechanism, with its rate coefficients at its current
+                    temperature, taken at construction
+    volume:         float, molecules per unit of concentration
+    species:        list of str, the species, in the order of reac_sys
+    stoich:         N*C int array, the change of the counts by each channel
+    dependency:     list of int arrays, the channels whose propensity changes when each
+                    channel fires, the channel itself included
+    t:              float, the current time
+    n_events:       int, the number of events fired so far
+
+
+    METHODS
+    ========
+    get_counts(self):
+        return the current molecule counts
+        OUTPUTS: dict
+
+    set_counts(self, counts, t=None):
+        set the molecule counts, and optionally the time, the firing times are drawn anew
+
+    propensities(self, counts=None):
+        the propensities of all the channels
+        OUTPUTS: C array of float
+
+    simulate(self, t_end, t_eval=None, record_every=1, max_events=None):
+        fire the events from the current time up to t_end, recording the counts sparsely,
+        on t_eval, or every record_every events
+        OUTPUTS: array of times, and n_record*N int array of counts
+
+
+    EXAMPLES
+    ========
+    >>> from chemkin_CS207_G9.reaction.Reaction import Reaction
+    >>> from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+    >>> rs = ReactionSystem(
+    ...     [Reaction(reactants=dict(A=1), products=dict(B=1), coeffLaw='Constant', coeffParams=dict(k=1.0))],
+    ...     initial_concs=dict(A=1.0, B=0.0))
+    >>> ssa = NextReactionMethod(rs, volume=100, seed=0)
+    >>> times, counts = ssa.simulate(50.0, t_eval=[0.0, 50.0])
+    >>> counts.tolist()
+    [[100, 0], [0, 100]]
+
+    """
+
+    def __init__(self, reac_sys, volume=1.0, counts=None, seed=None):
+        '''
+        INPUTS:
+            reac_sys:   ReactionSystem
+            volume:     float, molecules per unit of concentration, defaults 1.0
+            counts:     dict of int, initial molecule counts, defaults the current
+                        concentrations of reac_sys times volume, rounded
+            seed:       int or numpy random Generator, defaults None
+        '''
+        if volume <= 0:
+            raise ValueError("volume = {}: should be positive.".format(volume))
+        self.reac_sys = reac_sys
+        self.volume = float(volume)
+        self.species = list(reac_sys.get_species())
+        self._rng = np.random.default_rng(seed)
+
+        reactants, products, k = _channels(reac_sys)
+        self.stoich = products - reactants
+
+        # propensity of channel c: coefs[c] * prod over its reactants (j, n) of [x_j]_n
+        orders = reactants.sum(axis=0)
+        self._coefs = list(_propensity_coefs(k, orders, self.volume))
+        self._reactants = [
+            tuple((int(j), int(reactants[j, c])) for j in np.nonzero(reactants[:, c])[0])
+            for c in range(reactants.shape[1])]
+        self._changes = [
+            tuple((int(j), int(self.stoich[j, c])) for j in np.nonzero(self.stoich[:, c])[0])
+            for c in range(reactants.shape[1])]
+
+        # channel d depends on channel c if c changes a reactant of d
+        changed = scipy.sparse.csc_matrix(self.stoich != 0, dtype=float)
+        used = scipy.sparse.csc_matrix(reactants != 0, dtype=float)
+        depends = (changed.T.dot(used) + scipy.sparse.identity(len(k))).tocsr()
+        self.dependency = [depends.indices[depends.indptr[c]:depends.indptr[c+1]]
+                           for c in range(len(k))]
+
+        if counts is None:
+            concs = reac_sys.get_concs()
+            counts = {sp: int(round(concs.get(sp, 0) * self.volume)) for sp in self.species}
+        self.set_counts(counts, t=0.0)
+
+    def get_counts(self):
+        return dict(zip(self.species, self._x))
+
+    def set_counts(self, counts, t=None):
+        '''
+        INPUTS:
+            counts: dict of int, molecule counts of every species
+            t:      float, the new current time, defaults the current one
+        '''
+        for sp in self.species:
+            if sp not in counts:
+                raise ValueError('Species = "{}". Count is missing.'.format(sp))
+            if counts[sp] < 0 or counts[sp] != int(counts[sp]):
+                raise ValueError('Species = "{}". Count should be a non-negative integer.'.format(sp))
+        self._x = [int(counts[sp]) for sp in self.species]
+        if t is not None:
+            self.t = float(t)
+        self.n_events = 0
+        self._a = [self._propensity(c) for c in range(len(self._coefs))]
+        self._queue = IndexedPriorityQueue([self._firing_time(a) for a in self._a])
+        return self
+
+    def _propensity(self, c):
+        a = self._coefs[c]
+        x = self._x
+        for j, n in self._reactants[c]:
+            for i in range(n):
+                a *= x[j] - i
+        return max(a, 0.0)
+
+    def _firing_time(self, a):
+        '''putative firing time of a channel of propensity a, drawn anew'''
+        if a <= 0:
+            return math.inf
+        return self.t + self._rng.exponential(1 / a)
+
+    def propensities(self, counts=None):
+        '''
+        INPUTS:
+            counts: dict of int, molecule counts, defaults the current ones
+        OUTPUTS:
+            a:      C array of float, the propensities of the channels, the reactions
+                    first, then the reverse of the reversible ones
+        '''
+        if counts is None:
+            return np.array(self._a)
+        x_current = self._x
+        self._x = [int(counts[sp]) for sp in self.species]
+        try:
+            return np.array([self._propensity(c) for c in range(len(self._coefs))])
+        finally:
+            self._x = x_current
+
+    def simulate(self, t_end, t_eval=None, record_every=1, max_events=None):
+        '''fire the events from the current time up to t_end, the counts are then those at t_end
+
+        INPUTS:
+            t_end:          float, end time, later than the current time
+            t_eval:         list of float, increasing times within [current time, t_end], at
+                            which the counts are recorded, defaults None
+            record_every:   int, if t_eval is None, the counts are recorded at the current time,
+                            after every record_every events, and at t_end, defaults 1
+            max_events:     int, the simulation stops early after that many events, defaults None
+        OUTPUTS:
+            times:          n_record array of float, the recording times
+            counts:         n_record*N int array, the counts at those times
+        '''
+        if t_end < self.t:
+            raise ValueError(
+                "t_end = {}: should not be earlier than the current time {}.".format(t_end, self.t))
+        if t_eval is not None:
+            t_eval = np.asarray(t_eval, dtype=float)
+            if np.any(np.diff(t_eval) < 0) or (len(t_eval) and (t_eval[0] < self.t or t_eval[-1] > t_end)):
+                raise ValueError("t_eval should be increasing, within the simulated time span.")
+        if record_every < 1:
+            raise ValueError("record_every = {}: should be at least 1.".format(record_every))
+
+        times, records = [], []
+        if t_eval is None:
+            times.append(self.t)
+            records.append(list(self._x))
+        n_next = 0 # the next time of t_eval to record at
+        queue, a, x = self._queue, self._a, self._x
+        n_fired = 0
+        while max_events is None or n_fired < max_events:
+            c, t_fire = queue.top()
+            if t_fire > t_end:
+                break
+            if t_eval is not None:
+                while n_next < len(t_eval) and t_eval[n_next] < t_fire:
+                    times.append(t_eval[n_next])
+                    records.append(list(x))
+                    n_next += 1
+            self.t = t_fire
+            for j, dx in self._changes[c]:
+                x[j] += dx
+            for d in self.dependency[c]:
+                a_old, a_new = a[d], self._propensity(d)
+                a[d] = a_new
+                if d == c or a_old <= 0 or a_new <= 0:
+                    t_d = self._firing_time(a_new)
+                else:
+                    # the unused part of the exponential clock of d, rescaled
+                    t_d = self.t + (a_old / a_new) * (queue[d] - self.t)
+                queue.update(d, t_d)
+            n_fired += 1
+            self.n_events += 1
+            if t_eval is None and n_fired % record_every == 0:
+                times.append(self.t)
+                records.append(list(x))
+        else:
+            # stopped by max_events, before t_end
+            t_end = self.t
+
+        if t_eval is not None:
+            for t in t_eval[n_next:]:
+                if t > t_end:
+                    break
+                times.append(t)
+                records.append(list(x))
+        elif times[-1] != t_end:
+            times.append(t_end)
+            records.append(list(x))
+        self.t = t_end
+        return np.array(times, dtype=float), np.array(records, dtype=int).reshape(-1, len(self.species))
+
+
+class TauLeapingEnsemble:
+    """
+    Ensemble of stochastic simulations of a ReactionSystem by adaptive tau-leaping, all the
+    realizations advancing together, vectorized over a (R, N) array of molecule counts
+
+    the channels and propensities are those of NextReactionMethod. each step of each
+    realization
+        marks the channels that are within n_critical firings of exhausting a reactant as
+        critical,
+        selects the leap tau of the other channels by the method of Cao, Gillespie and 
+        Petzold (2006), which bounds the expected relative change of every propensity by 
+        epsilon, through the mean and variance of the change of every reactant count,
+        takes exact SSA steps instead, if tau is below 10 / (total propensity),
+        otherwise leaps by the min of tau and the time to the next firing of a critical 
+        channel, the non-critical channels firing Poisson(a*tau) times, and at most one
+        critical channel firing, the leap is halved and retried if a count goes negative.
+        the next critical firing is drawn as an Exp(1) integrated propensity, which is 
+        consumed by the accepted leaps, so that neither the rejections nor the leaps bias it.
+    all the realizations stop exactly at every time of t_eval, where the mean and variance
+    of the counts are accumulated, so that no trajectory is ever stored.
+
+
+    ATTRIBUTES
+    ===========
+    reac_sys:       ReactionSystem, the mechanism, with its rate coefficients at its current
+                    temperature, taken at construction
+    volume:         float, molecules per unit of concentration
+    species:        list of str, the species, in the order of reac_sys
+    stoich:         N*C int array, the change of the counts by each channel
+    counts:         R*N int array, the current counts of every realization
+    t:              float, the current time
+    epsilon:        float, error control parameter of the leaps
+    n_critical:     int, threshold of the number of firings of a critical channel
+    stats:          dict, counters of the steps of the realizations, 'n_leap', 'n_exact',
+                    and the halved leaps 'n_reject'
+
+
+    METHODS
+    ========
+    propensities(self, counts=None):
+        the propensities of every channel in every realization
+        OUTPUTS: R*C array of float
+
+    simulate(self, t_eval):
+        advance all the realizations to the times of t_eval in turn
+        OUTPUTS: dict of the ensemble moments of the counts at t_eval
+
+
+    EXAMPLES
+    ========
+    >>> from chemkin_CS207_G9.reaction.Reaction import Reaction
+    >>> from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+    >>> rs = ReactionSystem(
+    ...     [Reaction(reactants=dict(A=1), products=dict(B=1), coeffLaw='Constant', coeffParams=dict(k=1.0))],
+    ...     initial_concs=dict(A=1.0, B=0.0))
+    >>> ensemble = TauLeapingEnsemble(rs, volume=1000, n_realizations=100, seed=0)
+    >>> moments = ensemble.simulate([0.0, 30.0])
+    >>> moments['mean'].tolist()
+    [[1000.0, 0.0], [0.0, 1000.0]]
+
+    """
+
+    def __init__(self, reac_sys, volume=1.0, n_realizations=1000, counts=None, seed=None, 
+                 epsilon=0.03, n_critical=10):
+        '''
+        INPUTS:
+            reac_sys:       ReactionSystem
+            volume:         float, molecules per unit of concentration, defaults 1.0
+            n_realizations: int, the number R of realizations, defaults 1000
+            counts:         dict of int, initial molecule counts of every realization, defaults 
+                            the current concentrations of reac_sys times volume, rounded
+            seed:           int or numpy random Generator, defaults None
+            epsilon:        float, error control parameter of the leaps, defaults 0.03
+            n_critical:     int, threshold of the number of firings of a critical channel, 
+                            defaults 10
+        '''
+        if volume <= 0:
+            raise ValueError("volume = {}: should be positive.".format(volume))
+        if n_realizations < 1:
+            raise ValueError("n_realizations = {}: should be at least 1.".format(n_realizations))
+        if not 0 < epsilon < 1:
+            raise ValueError("epsilon = {}: should be within (0, 1).".format(epsilon))
+        self.reac_sys = reac_sys
+        self.volume = float(volume)
+        self.species = list(reac_sys.get_species())
+        self.epsilon = epsilon
+        self.n_critical = n_critical
+        self._rng = np.random.default_rng(seed)
+
+        reactants, products, k = _channels(reac_sys)
+        self.stoich = products - reactants
+        orders = reactants.sum(axis=0)
+        self._coefs = _propensity_coefs(k, orders, self.volume)
+        # padded reactant slots of the channels, C*K arrays of species indices and orders
+        n_slots = max(1, int(np.max(np.sum(reactants > 0, axis=0))) if reactants.size else 1)
+        self._slot_idx = np.zeros((len(k), n_slots), dtype=int)
+        self._slot_ord = np.zeros((len(k), n_slots), dtype=int)
+        for c in range(len(k)):
+            idx = np.nonzero(reactants[:, c])[0]
+            self._slot_idx[c, :len(idx)] = idx
+            self._slot_ord[c, :len(idx)] = reactants[idx, c]
+
+        # highest order of the channels consuming each species, and the max number of 
+        # molecules of it they need, for the g_i of the leap selection
+        self._hor = np.zeros(len(self.species), dtype=int)
+        self._hor_mult = np.zeros(len(self.species), dtype=int)
+        for c in range(len(k)):
+            for i in np.nonzero(reactants[:, c])[0]:
+                if orders[c] > self._hor[i]:
+                    self._hor[i], self._hor_mult[i] = orders[c], reactants[i, c]
+                elif orders[c] == self._hor[i]:
+                    self._hor_mult[i] = max(self._hor_mult[i], reactants[i, c])
+        self._reactant_species = self._hor > 0
+
+        if counts is None:
+            concs = reac_sys.get_concs()
+            counts = {sp: int(round(concs.get(sp, 0) * self.volume)) for sp in self.species}
+        for sp in self.species:
+            if sp not in counts:
+                raise ValueError('Species = "{}". Count is missing.'.format(sp))
+            if counts[sp] < 0 or counts[sp] != int(counts[sp]):
+                raise ValueError('Species = "{}". Count should be a non-negative integer.'.format(sp))
+        self.counts = np.tile(np.array([int(counts[sp]) for sp in self.species]), (n_realizations, 1))
+        self.t = 0.0
+        self._clock = np.full(n_realizations, np.nan)
+        self.stats = dict(n_leap=0, n_exact=0, n_reject=0)
+
+    # exact SSA steps taken in a row, once the leaps become too short
+    n_exact_batch = 100
+
+    def propensities(self, counts=None):
+        '''
+        INPUTS:
+            counts: R*N int array, defaults the current counts
+        OUTPUTS:
+            a:      R*C array of float, the propensities of the channels of every realization
+        '''
+        x = self.counts if counts is None else np.asarray(counts)
+        x_slots = x[:, self._slot_idx]
+        a = np.broadcast_to(self._coefs, x_slots.shape[:2]).copy()
+        for i in range(int(np.max(self._slot_ord, initial=0))):
+            a *= np.prod(np.where(self._slot_ord > i, x_slots - i, 1), axis=2)
+        return np.maximum(a, 0)
+
+    def _critical(self, x, a):
+        '''whether each channel of each realization is within n_critical firings of 
+        exhausting one of its reactants'''
+        with np.errstate(divide='ignore'):
+            firings = np.where(self._slot_ord > 0, x[:, self._slot_idx] // np.maximum(self._slot_ord, 1), np.inf)
+        return (a > 0) & (np.min(firings, axis=2) < self.n_critical)
+
+    def _leap_size(self, x, a_noncritical):
+        '''largest leap keeping the expected relative change of every propensity below epsilon'''
+        mu = a_noncritical.dot(self.stoich.T)
+        sigma2 = a_noncritical.dot((self.stoich**2).T)
+        x = x.astype(float)
+        x_1, x_2 = np.maximum(x - 1, 1), np.maximum(x - 2, 1)
+        hor, mult = self._hor, self._hor_mult
+        g = np.select(
+            [(hor == 2) & (mult == 2), hor == 2, 
+             (hor == 3) & (mult == 3), (hor == 3) & (mult == 2), hor == 3],
+            [2 + 1 / x_1, 2, 3 + 1 / x_1 + 2 / x_2, 1.5 * (2 + 1 / x_1), 3],
+            default=np.maximum(hor, 1))
+        bound = np.maximum(self.epsilon * x / g, 1)
+        with np.errstate(divide='ignore'):
+            tau = np.minimum(
+                np.where(mu != 0, bound / np.abs(mu), np.inf), 
+                np.where(sigma2 > 0, bound**2 / sigma2, np.inf))
+        return np.min(np.where(self._reactant_species, tau, np.inf), axis=1, initial=np.inf)
+
+    def _pick(self, a, rows):
+        '''one channel of each of rows, with probabilities proportional to a'''
+        cum = np.cumsum(a[rows], axis=1)
+        u = self._rng.random(len(rows)) * cum[:, -1]
+        return np.minimum(np.sum(cum <= u[:, None], axis=1), a.shape[1] - 1)
+
+    def _step(self, x, t, t_out, clock):
+        '''one step of each realization, returns the new counts, times and critical clocks
+
+        the clock of a realization is the remaining integrated propensity of the critical 
+        channels until the next critical firing, an Exp(1) draw, nan when it is to be drawn.
+        it is kept across rejected and accepted leaps, so that the rejections do not bias the
+        firing times of the critical channels'''
+        a = self.propensities(x)
+        a0 = a.sum(axis=1)
+        dt_max = t_out - t
+        critical = self._critical(x, a)
+        a_noncritical = np.where(critical, 0, a)
+        tau_leap = self._leap_size(x, a_noncritical)
+        with np.errstate(divide='ignore'):
+            exact = (a0 > 0) & (tau_leap < 10 / a0)
+        x_new = x.copy()
+        clock_new = np.full(len(x), np.nan)
+        # exact steps start at t, the others are set below, or jump to t_out if nothing fires
+        t_new = np.where(exact, t, t_out)
+
+        # a batch of exact SSA steps, the memoryless waiting time is cut at t_out
+        rows = np.nonzero(exact)[0]
+        a_exact, a0_exact = a[rows], a0[rows]
+        for _ in range(self.n_exact_batch):
+            if not len(rows):
+                break
+            self.stats['n_exact'] += len(rows)
+            dt = self._rng.exponential(1 / np.maximum(a0_exact, 1e-300))
+            fire = (a0_exact > 0) & (dt < t_out[rows] - t_new[rows])
+            t_new[rows[~fire]] = t_out[rows[~fire]]
+            rows, a_exact, dt = rows[fire], a_exact[fire], dt[fire]
+            x_new[rows] += self.stoich[:, self._pick(a_exact, np.arange(len(rows)))].T
+            t_new[rows] = t_new[rows] + dt
+            a_exact = self.propensities(x_new[rows])
+            a0_exact = a_exact.sum(axis=1)
+        # leaps, with at most one critical firing
+        rows = np.nonzero(~exact & (a0 > 0))[0]
+        if len(rows):
+            self.stats['n_leap'] += len(rows)
+            a0_critical = np.sum(np.where(critical, a, 0), axis=1)[rows]
+            clock = clock[rows].copy()
+            unset = np.isnan(clock)
+            clock[unset] = self._rng.exponential(size=int(np.sum(unset)))
+            with np.errstate(divide='ignore'):
+                tau_critical = np.where(a0_critical > 0, clock / np.maximum(a0_critical, 1e-300), np.inf)
+            tau_leap = tau_leap[rows]
+            while len(rows):
+                tau = np.minimum(np.minimum(tau_leap, tau_critical), dt_max[rows])
+                firings = self._rng.poisson(a_noncritical[rows] * tau[:, None])
+                fire_critical = (tau_critical <= tau_leap) & (tau_critical <= dt_max[rows])
+                if np.any(fire_critical):
+                    rows_critical = rows[fire_critical]
+                    channels = self._pick(np.where(critical, a, 0), rows_critical)
+                    firings[np.nonzero(fire_critical)[0], channels] += 1
+                x_leap = x[rows] + firings.dot(self.stoich.T)
+                accept = np.all(x_leap >= 0, axis=1)
+                x_new[rows[accept]] = x_leap[accept]
+                t_new[rows[accept]] = np.where(
+                    tau[accept] == dt_max[rows[accept]], t_out[rows[accept]], t[rows[accept]] + tau[accept])
+                clock_new[rows[accept]] = np.where(
+                    fire_critical[accept], np.nan, 
+                    np.maximum(clock[accept] - a0_critical[accept] * tau[accept], 0))
+                self.stats['n_reject'] += int(np.sum(~accept))
+                # the time to the next critical firing is kept, and compared with the halved leap
+                rows, tau_leap = rows[~accept], tau_leap[~accept] / 2
+                tau_critical, clock, a0_critical = tau_critical[~accept], clock[~accept], a0_critical[~accept]
+        return x_new, t_new, clock_new
+
+    def simulate(self, t_eval):
+        '''advance all the realizations to the times of t_eval in turn, the counts are then
+        those at t_eval[-1]
+
+        INPUTS:
+            t_eval:     list of float, increasing times, not earlier than the current time
+        OUTPUTS:
+            moments:    dict, with keys
+                        't': n_t array, t_eval,
+                        'mean', 'var': n_t*N arrays, the ensemble mean and variance of the 
+                        counts at t_eval
+        '''
+        t_eval = np.asarray(t_eval, dtype=float)
+        if len(t_eval) == 0 or np.any(np.diff(t_eval) < 0) or t_eval[0] < self.t:
+            raise ValueError("t_eval should be increasing, not earlier than the current time.")
+        R, N = self.counts.shape
+        # moments are accumulated around the initial mean, against cancellation
+        shift = self.counts.mean(axis=0)
+        sum_1, sum_2 = np.zeros((len(t_eval), N)), np.zeros((len(t_eval), N))
+
+        x, t, clock = self.counts, np.full(R, self.t), self._clock
+        n_next = np.zeros(R, dtype=int)
+        while True:
+            # record the realizations that reached their next time of t_eval
+            while True:
+                active = n_next < len(t_eval)
+                hit = np.nonzero(active)[0]
+                hit = hit[t[hit] == t_eval[n_next[hit]]]
+                if not len(hit):
+                    break
+                dx = x[hit] - shift
+                np.add.at(sum_1, n_next[hit], dx)
+                np.add.at(sum_2, n_next[hit], dx**2)
+                n_next[hit] += 1
+            rows = np.nonzero(n_next < len(t_eval))[0]
+            if not len(rows):
+                break
+            x[rows], t[rows], clock[rows] = self._step(x[rows], t[rows], t_eval[n_next[rows]], clock[rows])
+
+        self.counts, self.t, self._clock = x, float(t_eval[-1]), clock
+        mean = sum_1 / R
+        return dict(t=t_eval, mean=mean + shift, var=np.maximum(sum_2 / R - mean**2, 0))
+
+
+def _channels(reac_sys):
+    '''the reactions, then the reverse of the reversible ones, as stochastic channels
+
+    OUTPUTS:
+        reactants, products:    N*C int arrays, stoich coeffs of the channels
+        k:                      C array, rate coefficients of the channels
+    '''
+    nu_1, nu_2 = reac_sys.get_nu_1(), reac_sys.get_nu_2()
+    reversible = reac_sys._reversible & (reac_sys._kb != 0)
+    reactants = np.hstack([nu_1, nu_2[:, reversible]]).astype(int)
+    products = np.hstack([nu_2, nu_1[:, reversible]]).astype(int)
+    k = np.concatenate([reac_sys._kf, reac_sys._kb[reversible]])
+    return reactants, products, k
+
+
+def _propensity_coefs(k, orders, volume):
+    '''k * volume**(1-order), the propensity of a channel per falling factorial of counts'''
+    return np.asarray(k, dtype=float) * float(volume)**(1 - np.asarray(orders, dtype=float))
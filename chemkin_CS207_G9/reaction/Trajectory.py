@@ -0,0 +1,486 @@
+import json
+import os
+import shutil
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # not on POSIX, the manifest is then updated unlocked
+    fcntl = None
+
+
+class Trajectory:
+    """
+    Concentrations of a reaction system sampled on a time grid, as returned by
+    ReactionSystem.evolute(t_bound, t_eval=...)
+
+    the samples are stored in one contiguous len(t)*N array, one row per time and one column
+    per species, so that whole trajectories are sliced without copies.
+
+
+    ATTRIBUTES
+    ===========
+    t:          array of float, the sampling times, those after a terminal event are dropped
+    concs:      len(t)*N C-contiguous array of float, the concentrations
+    species:    list of str, the species of the columns
+    index:      dict, the column of each species
+    t_final, t_events, y_events, qss, fast, method, h_last, h_first:
+                see the attributes of the solution of ReactionSystem.evolute
+
+
+    METHODS
+    ========
+    __getitem__(self, species):
+        the concentrations of one species on t, a view of its column
+        OUTPUTS: array of float
+
+    __len__(self):
+        the number of sampling times
+        OUTPUTS: int
+
+    as_dict(self):
+        the concentrations in the format of the solution of ReactionSystem.evolute
+        OUTPUTS: dict of arrays
+
+
+    EXAMPLES
+    ========
+    >>> traj = Trajectory([0., 1.], np.array([[1., 0.], [0.5, 0.5]]), ['A', 'B'])
+    >>> traj['B']
+    array([0. , 0.5])
+    >>> traj.concs.shape, traj.index['B']
+    ((2, 2), 1)
+
+    """
+
+    def __init__(self, t, concs, species):
+        self.t = np.asarray(t, dtype=float)
+        self.concs = np.ascontiguousarray(concs, dtype=float)
+        if self.concs.shape != (len(self.t), len(species)):
+            raise ValueError("concs of shape {} does not match {} times and {} species.".format(
+                self.concs.shape, len(self.t), len(species)))
+        self.species = list(species)
+        self.index = {sp: i for i, sp in enumerate(self.species)}
+
+    def __len__(self):
+        return len(self.t)
+
+    def __getitem__(self, species):
+        if species not in self.index:
+            raise ValueError('Species = "{}". Not in the trajectory.'.format(species))
+        return self.concs[:, self.index[species]]
+
+    def __repr__(self):
+        return 'Trajectory({} times, {} species)'.format(len(self.t), len(self.species))
+
+    def as_dict(self):
+        return {sp: self.concs[:, i] for i, sp in enumerate(self.species)}
+
+
+class TrajectoryStore:
+    """
+    On-disk store of trajectories, a directory of chunks in .npy files with a json manifest
+
+    each run (e.g. one evolution of a sweep) is written step by step by a TrajectoryWriter,
+    which flushes every chunk_size steps to a chunk of columnar files: the times, the 
+    concentrations, and optionally the reaction rates, for Hermite interpolation. the manifest
+    records the species of each run and its attributes, and is only rewritten when a run starts,
+    closes or is deleted. the time range of each chunk is appended to the chunk index of its 
+    run as the chunk is flushed, so that a time window is read from the overlapping chunks only.
+    uncompressed chunks are memory-mapped on reading, compressed ones are .npz files, loaded 
+    whole but chunk by chunk. several writers, e.g. in different processes, may share a store:
+    the manifest is read again and updated under an exclusive file lock.
+
+        path/manifest.json
+        path/.lock
+        path/run_00000/chunks.jsonl                                  (chunk index, a line per chunk)
+        path/run_00000/t_00000.npy, c_00000.npy, f_00000.npy, ...   (compress=False)
+        path/run_00000/chunk_00000.npz, ...                          (compress=True)
+
+
+    ATTRIBUTES
+    ===========
+    path:       str, the directory of the store
+    chunk_size: int, number of steps per chunk
+    compress:   boolean, whether the chunks are compressed
+    rates:      boolean, whether the reaction rates are stored along the concentrations
+
+
+    METHODS
+    ========
+    runs(self):
+        the names of the stored runs
+        OUTPUTS: list of str
+
+    attrs(self, run):
+        the attributes of a run, e.g. its temperature, and 'species', 'n_steps', 'complete'
+        OUTPUTS: dict
+
+    writer(self, run, species, attrs=None, overwrite=False):
+        start a run, whose steps are then appended to the writer (see `evolute(writer=...)`)
+        OUTPUTS: TrajectoryWriter
+
+    iter_chunks(self, run, t_min=None, t_max=None, species=None):
+        the stored steps within [t_min, t_max], chunk by chunk, without loading the others
+        OUTPUTS: generator of Trajectory
+
+    read(self, run, t_min=None, t_max=None, species=None):
+        the stored steps within [t_min, t_max]
+        OUTPUTS: Trajectory
+
+    sample(self, run, t, species=None):
+        the concentrations at times t, interpolated between the stored steps, cubic Hermite
+        if the rates are stored, linear otherwise
+        OUTPUTS: dict of float or arrays, as the solution of ReactionSystem.evolute
+
+    delete(self, run):
+        remove a run and its files
+
+
+    EXAMPLES
+    ========
+    >>> import tempfile
+    >>> store = TrajectoryStore(tempfile.mkdtemp(), chunk_size=4, rates=True)
+    >>> with store.writer('decay', ['A'], attrs=dict(k=1.0)) as writer:
+    ...     for t in np.linspace(0, 1, 11):
+    ...         writer.append(t, [np.exp(-t)], [-np.exp(-t)])
+    >>> store.runs(), store.attrs('decay')['n_steps']
+    (['decay'], 11)
+    >>> store.read('decay', 0.25, 0.45).t
+    array([0.2, 0.3, 0.4, 0.5])
+    >>> print(round(float(store.sample('decay', 0.55)['A']), 5))
+    0.57695
+
+    """
+
+    def __init__(self, path, chunk_size=4096, compress=False, rates=False):
+        '''
+        INPUTS:
+            path:       str, directory of the store, created if needed. the settings of an
+                        existing store are read from its manifest
+            chunk_size: int, number of steps per chunk, defaults 4096
+            compress:   boolean, whether to compress the chunks, defaults False
+            rates:      boolean, whether to store the reaction rates, defaults False
+        '''
+        if chunk_size < 1:
+            raise ValueError("chunk_size = {}: should be at least 1.".format(chunk_size))
+        self.path = path
+        self._chunks = {}
+        os.makedirs(path, exist_ok=True)
+        with self._lock():
+            if not os.path.exists(self._manifest_path()):
+                self._manifest = dict(
+                    version=1, chunk_size=int(chunk_size), compress=bool(compress), rates=bool(rates), runs={})
+                self._save_manifest()
+            self._reload()
+        self.chunk_size = self._manifest['chunk_size']
+        self.compress = self._manifest['compress']
+        self.rates = self._manifest['rates']
+
+    def _manifest_path(self):
+        return os.path.join(self.path, 'manifest.json')
+
+    def _save_manifest(self):
+        # written aside and then renamed, so that the manifest is never left half written
+        tmp = self._manifest_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmp, self._manifest_path())
+
+    def _reload(self):
+        with open(self._manifest_path()) as f:
+            self._manifest = json.load(f)
+        return self._manifest
+
+    @contextmanager
+    def _lock(self):
+        '''exclusive lock of the store directory, across processes'''
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.path, '.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _update_manifest(self, update):
+        '''applies update to the runs of the manifest, read again under the lock, so that the 
+        runs started, closed or deleted meanwhile by other writers of the store are kept'''
+        with self._lock():
+            update(self._reload()['runs'])
+            self._save_manifest()
+
+    def _run(self, run):
+        return self._check_run(self._reload()['runs'], run)
+
+    @staticmethod
+    def _check_run(runs, run):
+        if run not in runs:
+            raise ValueError('Run = "{}". Not in the trajectory store.'.format(run))
+        return runs[run]
+
+    def _chunk_index_path(self, entry):
+        return os.path.join(self.path, entry['dir'], 'chunks.jsonl')
+
+    def _run_chunks(self, run):
+        '''the records of the chunks of a run, read from its chunk index. those of the runs 
+        written or completed are kept, the index of a run still open elsewhere is read again'''
+        if run in self._chunks:
+            return self._chunks[run]
+        entry = self._run(run)
+        chunks = []
+        if os.path.exists(self._chunk_index_path(entry)):
+            with open(self._chunk_index_path(entry)) as f:
+                for line in f:
+                    try:
+                        chunks.append(json.loads(line))
+                    except ValueError: # the last line of an interrupted writer
+                        break
+        if entry['complete']:
+            self._chunks[run] = chunks
+        return chunks
+
+    def runs(self):
+        return list(self._reload()['runs'])
+
+    def attrs(self, run):
+        entry = self._run(run)
+        return dict(entry['attrs'], species=list(entry['species']), 
+                    n_steps=sum(chunk['n'] for chunk in self._run_chunks(run)), complete=entry['complete'])
+
+    def writer(self, run, species, attrs=None, overwrite=False):
+        '''
+        INPUTS:
+            run:        str, name of the run
+            species:    list of str, the species of the concentrations
+            attrs:      dict, json-serializable attributes of the run, defaults None
+            overwrite:  boolean, whether to replace an existing run, defaults False
+        OUTPUTS:
+            writer:     TrajectoryWriter
+        '''
+        run = str(run)
+
+        def start(runs):
+            if run in runs:
+                if not overwrite:
+                    raise ValueError('Run = "{}". Already in the trajectory store.'.format(run))
+                self._remove(runs, run)
+            used = {entry['dir'] for entry in runs.values()}
+            n = len(runs)
+            while 'run_{:05d}'.format(n) in used:
+                n += 1
+            entry = dict(dir='run_{:05d}'.format(n), species=list(species), attrs=dict(attrs or {}), 
+                         complete=False)
+            os.makedirs(os.path.join(self.path, entry['dir']), exist_ok=True)
+            open(self._chunk_index_path(entry), 'w').close()
+            runs[run] = entry
+
+        self._update_manifest(start)
+        self._chunks[run] = []
+        return TrajectoryWriter(self, run, len(species))
+
+    def _write_chunk(self, run, t, concs, rates):
+        entry = self._manifest['runs'][run]
+        chunks = self._chunks[run]
+        name = '{:05d}'.format(len(chunks))
+        folder = os.path.join(self.path, entry['dir'])
+        if self.compress:
+            arrays = dict(t=t, c=concs)
+            if self.rates:
+                arrays['f'] = rates
+            np.savez_compressed(os.path.join(folder, 'chunk_' + name + '.npz'), **arrays)
+        else:
+            np.save(os.path.join(folder, 't_' + name + '.npy'), t)
+            np.save(os.path.join(folder, 'c_' + name + '.npy'), concs)
+            if self.rates:
+                np.save(os.path.join(folder, 'f_' + name + '.npy'), rates)
+        # the chunk is recorded once its files are written, by appending a line to the index
+        chunk = dict(name=name, n=len(t), t_min=float(t[0]), t_max=float(t[-1]))
+        with open(self._chunk_index_path(entry), 'a') as f:
+            f.write(json.dumps(chunk) + '\n')
+        chunks.append(chunk)
+
+    def _close_run(self, run):
+        def close(runs):
+            self._check_run(runs, run)['complete'] = True
+        self._update_manifest(close)
+
+    def _load_chunk(self, entry, chunk):
+        '''times, concentrations and rates (None if not stored) of a chunk'''
+        folder = os.path.join(self.path, entry['dir'])
+        if self.compress:
+            with np.load(os.path.join(folder, 'chunk_' + chunk['name'] + '.npz')) as data:
+                return data['t'], data['c'], data['f'] if self.rates else None
+        load = lambda key: np.load(os.path.join(folder, key + '_' + chunk['name'] + '.npy'), mmap_mode='r')
+        return load('t'), load('c'), load('f') if self.rates else None
+
+    def _chunks_within(self, chunks, t_min, t_max, margin=0):
+        '''indices of the chunks overlapping [t_min, t_max], with margin more on each side'''
+        idx = [k for k, chunk in enumerate(chunks) 
+               if (t_min is None or chunk['t_max'] >= t_min) and (t_max is None or chunk['t_min'] <= t_max)]
+        if not idx:
+            return []
+        return list(range(max(idx[0] - margin, 0), min(idx[-1] + margin + 1, len(chunks))))
+
+    def _columns(self, entry, species):
+        if species is None:
+            return list(entry['species']), slice(None)
+        for sp in species:
+            if sp not in entry['species']:
+                raise ValueError('Species = "{}". Not in the run.'.format(sp))
+        return list(species), [entry['species'].index(sp) for sp in species]
+
+    def iter_chunks(self, run, t_min=None, t_max=None, species=None):
+        entry = self._run(run)
+        species, columns = self._columns(entry, species)
+        chunks = self._run_chunks(run)
+        for k in self._chunks_within(chunks, t_min, t_max):
+            t, concs, _ = self._load_chunk(entry, chunks[k])
+            rows = np.ones(len(t), dtype=bool)
+            if t_min is not None:
+                rows &= t >= t_min
+            if t_max is not None:
+                rows &= t <= t_max
+            yield Trajectory(t[rows], concs[rows][:, columns], species)
+
+    def read(self, run, t_min=None, t_max=None, species=None):
+        '''the stored steps within [t_min, t_max], with the steps just outside it, if any, so 
+        that the window is covered'''
+        entry = self._run(run)
+        species, columns = self._columns(entry, species)
+        t, concs, _ = self._load_window(run, t_min, t_max)
+        return Trajectory(t, concs[:, columns], species)
+
+    def _load_window(self, run, t_min, t_max):
+        entry, chunks = self._run(run), self._run_chunks(run)
+        loaded = [self._load_chunk(entry, chunks[k]) 
+                  for k in self._chunks_within(chunks, t_min, t_max, margin=1)]
+        if not loaded:
+            n = len(entry['species'])
+            return np.empty(0), np.empty((0, n)), np.empty((0, n)) if self.rates else None
+        t = np.concatenate([chunk[0] for chunk in loaded])
+        start = 0 if t_min is None else max(int(np.searchsorted(t, t_min, side='right')) - 1, 0)
+        stop = len(t) if t_max is None else min(int(np.searchsorted(t, t_max, side='left')) + 1, len(t))
+        concs = np.concatenate([chunk[1][max(start - offset, 0):max(stop - offset, 0)] 
+                                for chunk, offset in zip(loaded, _offsets(loaded))])
+        rates = None
+        if self.rates:
+            rates = np.concatenate([chunk[2][max(start - offset, 0):max(stop - offset, 0)] 
+                                    for chunk, offset in zip(loaded, _offsets(loaded))])
+        return t[start:stop], concs, rates
+
+    def sample(self, run, t, species=None):
+        '''
+        INPUTS:
+            run:        str, name of the run
+            t:          float or array of float, within the stored times
+            species:    list of str, defaults all the species of the run
+        OUTPUTS:
+            concs:      dict, the concentrations of each species at t
+        '''
+        entry = self._run(run)
+        species, columns = self._columns(entry, species)
+        t_query = np.atleast_1d(np.asarray(t, dtype=float))
+        t_grid, concs, rates = self._load_window(run, np.min(t_query), np.max(t_query))
+        if len(t_grid) == 0 or np.min(t_query) < t_grid[0] or np.max(t_query) > t_grid[-1]:
+            raise ValueError("t = {}: outside of the stored times of run {}.".format(t, run))
+        concs = np.asarray(concs)[:, columns]
+        if len(t_grid) == 1:
+            values = np.repeat(concs, len(t_query), axis=0)
+        else:
+            i = np.clip(np.searchsorted(t_grid, t_query, side='right') - 1, 0, len(t_grid) - 2)
+            h = (t_grid[i+1] - t_grid[i])[:, None]
+            x = np.divide(t_query - t_grid[i], h[:, 0], out=np.zeros_like(t_query), where=h[:, 0] > 0)[:, None]
+            if rates is None:
+                values = (1 - x) * concs[i] + x * concs[i+1]
+            else:
+                rates = np.asarray(rates)[:, columns]
+                values = ((1 + 2*x) * (1 - x)**2 * concs[i] + x * (1 - x)**2 * h * rates[i]
+                          + x**2 * (3 - 2*x) * concs[i+1] + x**2 * (x - 1) * h * rates[i+1])
+        if np.ndim(t) == 0:
+            return dict(zip(species, values[0]))
+        return dict(zip(species, values.T))
+
+    def delete(self, run):
+        self._update_manifest(lambda runs: self._remove(runs, run))
+
+    def _remove(self, runs, run):
+        entry = self._check_run(runs, run)
+        shutil.rmtree(os.path.join(self.path, entry['dir']), ignore_errors=True)
+        del runs[run]
+        self._chunks.pop(run, None)
+
+
+class TrajectoryWriter:
+    """
+    Appends the steps of one run to a TrajectoryStore, flushing them chunk by chunk
+
+    a writer follows the output protocol of the streaming solvers (see 
+    chemkin_CS207_G9.math.ode_solver.solve_ivp), so that an evolution is written as it goes,
+    with at most one chunk in memory. `close` flushes the last chunk and marks the run complete.
+
+    ATTRIBUTES
+    ===========
+    store:      TrajectoryStore
+    run:        str, the name of the run
+    t_last:     float, the time of the last step
+    y_last:     array, the concentrations of the last step
+    h_first:    float, the size of the first step, None before it
+
+    METHODS
+    ========
+    append(self, t, y, f=None):
+        append a step, the concentrations y and their rates f at time t
+    close(self):
+        flush the buffered steps and mark the run complete
+    """
+
+    def __init__(self, store, run, n_species):
+        self.store = store
+        self.run = run
+        self.t_last = None
+        self.y_last = None
+        self.h_first = None
+        self._t = np.empty(store.chunk_size)
+        self._concs = np.empty((store.chunk_size, n_species))
+        self._rates = np.empty((store.chunk_size, n_species)) if store.rates else None
+        self._n = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, t, y, f=None):
+        if self._rates is not None and f is None:
+            raise ValueError("The rates are required by the trajectory store.")
+        if self.t_last is not None and self.h_first is None:
+            self.h_first = t - self.t_last
+        self._t[self._n] = t
+        self._concs[self._n] = y
+        if self._rates is not None:
+            self._rates[self._n] = f
+        self._n += 1
+        self.t_last, self.y_last = t, np.array(y, dtype=float)
+        if self._n == len(self._t):
+            self._flush()
+
+    def _flush(self):
+        if self._n:
+            self.store._write_chunk(
+                self.run, self._t[:self._n], self._concs[:self._n], 
+                None if self._rates is None else self._rates[:self._n])
+            self._n = 0
+
+    def close(self):
+        self._flush()
+        self.store._close_run(self.run)
+
+
+def _offsets(loaded):
+    '''row offsets of the loaded chunks in their concatenation'''
+    return np.cumsum([0] + [len(chunk[0]) for chunk in loaded[:-1]])
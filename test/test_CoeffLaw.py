@@ -41,6 +41,20 @@ def test_backward_ke():
     res = BackwardLaw(p0, R).equilibrium_coeffs(nu, a, T)
     assert( res[0]-truth<tol and res[1]-1/truth<tol )
 
+def test_param_derivs():
+    eps = 1e-6
+    A, b, E, T0 = 2.0, 0.5, 10.0, 3.0
+    derivs = modArrhenius(A=A, b=b, E=E).compute_param_derivs(T=T0)
+    k = lambda A, b, E: modArrhenius(A=A, b=b, E=E).compute(T=T0)
+    fd = dict(
+        lnA = (k(A*np.exp(eps), b, E) - k(A*np.exp(-eps), b, E)) / (2*eps),
+        b = (k(A, b+eps, E) - k(A, b-eps, E)) / (2*eps),
+        E = (k(A, b, E+eps) - k(A, b, E-eps)) / (2*eps))
+    for p in ['lnA', 'b', 'E']:
+        assert( np.abs(derivs[p] - fd[p]) < 1e-6 )
+    derivs = Arrhenius(A=A, E=E).compute_param_derivs(T=T0)
+    assert( np.abs(derivs['lnA'] - Arrhenius(A=A, E=E).compute(T=T0)) < tol )
+    assert( Constant(k=2.0).compute_param_derivs() == dict(lnA=2.0, b=0.0, E=0.0) )
 
 
 # ============ Tests on Errors ============ #
\ No newline at end of file
@@ -0,0 +1,42 @@
+from chemkin_CS207_G9.reaction.Reaction import Reaction
+from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+from chemkin_CS207_G9.reaction.MechanismReduction import DRGEP
+import numpy as np
+
+
+def make_system():
+    # A -> B -> C carries the target C, A + D -> E is a weak side branch,
+    # F -> G is not coupled to C at all
+    reactions = [
+        Reaction(reactants=dict(A=1), products=dict(B=1), coeffLaw='Constant', coeffParams=dict(k=1.0)),
+        Reaction(reactants=dict(B=1), products=dict(C=1), coeffLaw='Constant', coeffParams=dict(k=2.0)),
+        Reaction(reactants=dict(A=1,D=1), products=dict(E=1), coeffLaw='Constant', coeffParams=dict(k=1e-4)),
+        Reaction(reactants=dict(F=1), products=dict(G=1), coeffLaw='Constant', coeffParams=dict(k=1.0))]
+    concs = dict(A=1.0, B=0.0, C=0.0, D=1.0, E=0.0, F=1.0, G=0.0)
+    return ReactionSystem(reactions, initial_concs=concs)
+
+def test_interaction():
+    rs = make_system()
+    interaction = dict(zip(rs.get_species(), DRGEP(rs, 5.0, n_samples=10).interaction(['C'])))
+    assert( interaction['C'] == 1.0 )
+    assert( interaction['B'] > 0.5 and interaction['A'] > 0.5 )
+    assert( 0 < interaction['D'] < 1e-3 )
+    assert( interaction['F'] == 0 and interaction['G'] == 0 )
+
+def test_reduce():
+    rs = make_system()
+    drgep = DRGEP(rs, 5.0, n_samples=10, method='BDF', rtol=1e-8, atol=1e-10)
+    for kwargs in [dict(threshold=1e-2), dict(error_tol=1e-2)]:
+        reduced, report = drgep.reduce(['C'], **kwargs)
+        assert( reduced.get_species() == ['A', 'B', 'C'] )
+        assert( report['n_species'] == (7, 3) and report['n_reactions'] == (4, 2) )
+        assert( report['errors']['C'] < 1e-2 )
+    # the concentrations of the detailed mechanism are left untouched
+    assert( rs.get_concs()['C'] == 0.0 )
+    # a tight tolerance keeps the side branch
+    reduced, report = drgep.reduce(['C'], error_tol=1e-8)
+    assert( 'D' in reduced.get_species() )
+    try:
+        drgep.reduce(['X'])
+    except Exception as err:
+        assert( type(err) == ValueError )
@@ -21,6 +21,13 @@ def test_rateCoeff():
     assert(r2.rateCoeff(T=1.0) == 1/np.e)
     assert(r3.rateCoeff(T=2.0) == 8/np.e)
 
+def test_rateCoeffParamDerivs():
+    r = Reaction(coeffLaw='modArrhenius', coeffParams=dict(b=3,E=2*8.314))
+    derivs = r.rateCoeffParamDerivs(T=2.0)
+    assert(derivs['lnA'] == r.rateCoeff(T=2.0))
+    assert(np.abs(derivs['b'] - np.log(2.0)*8/np.e) < 1e-12)
+    assert(np.abs(derivs['E'] + 1/(2*8.314)*8/np.e) < 1e-12)
+
 def test_CoeffLaws_get():
     assert(Reaction._CoeffLawDict.getcopy('Arrhenius') == CoeffLaw.Arrhenius)
     assert(Reaction._CoeffLawDict.getcopy_all() == Reaction._CoeffLawDict._dict_all)
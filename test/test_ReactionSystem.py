@@ -243,3 +243,614 @@ def test_evolute_to_equilibrium():
     reac_rate_final = rs.get_reac_rate()
     ratio = np.sqrt( np.sum(reac_rate_final**2) / np.sum(reac_rate_initial**2) )
     assert( ratio < tol )
+
+def test_from_arrays():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    rs_arrays = ReactionSystem.from_arrays(
+        xml2dict().parse_arrays(path_xml, sparse=True), nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    assert(rs_arrays.get_species() == species)
+    assert(np.array_equal(rs_arrays.get_nu_1(), rs.get_nu_1()))
+    assert(np.array_equal(rs_arrays.get_nu_2(), rs.get_nu_2()))
+    for k, k_arrays in zip(rs.get_reac_rate_coefs(), rs_arrays.get_reac_rate_coefs()):
+        assert(np.allclose(k_arrays, k, rtol=1e-12, atol=0))
+    assert(np.allclose(rs_arrays.get_reac_rate(), rs.get_reac_rate(), rtol=1e-12, atol=0))
+    rs_arrays.set_temp(1500)
+    rs.set_temp(1500)
+    assert(np.allclose(rs_arrays.get_reac_rate_coefs()[0], rs.get_reac_rate_coefs()[0], rtol=1e-12, atol=0))
+
+    # the Reaction objects are built on access
+    assert(len(rs_arrays) == len(reactions))
+    assert([r.get_params() for r in rs_arrays.get_reactions()] == [r.get_params() for r in reactions])
+
+    mechanism = xml2dict().parse_arrays(path_xml)
+    mechanism['coeffParams']['A'][0] = -1.0
+    try:
+        ReactionSystem.from_arrays(mechanism)
+    except Exception as err:
+        assert(type(err) == ValueError)
+    else:
+        assert(False)
+
+def test_jac_against_finite_difference():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    concs = np.array(rs.get_concs_array(), dtype=float)
+    jac = rs.compute_jac(concs)
+    jac_fd = np.zeros_like(jac)
+    for j in range(len(concs)):
+        dc = np.zeros(len(concs))
+        dc[j] = 1e-6
+        rs.set_concs(dict(zip(species, concs + dc)))
+        rate_plus = rs.get_reac_rate()
+        rs.set_concs(dict(zip(species, concs - dc)))
+        rate_minus = rs.get_reac_rate()
+        jac_fd[:,j] = (rate_plus - rate_minus) / 2e-6
+    assert( np.max(np.abs(jac - jac_fd)) < 1e-6 * np.max(np.abs(jac)) )
+    assert( np.allclose(rs.compute_jac(concs, sparse=True).toarray(), jac) )
+    assert( rs.get_jac_sparsity().shape == jac.shape )
+
+def test_evolute_sparse():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    res_dense = rs.evolute(1e-13, method='BDF')
+    rs.set_concs(concentrations)
+    res_sparse = rs.evolute(1e-13, method='BDF', sparse=True)
+    rs.set_concs(concentrations)
+    res_sie = rs.evolute(1e-13, method='SIE', sparse=True)
+    for sp in species:
+        assert( np.abs(res_sparse(1e-13)[sp] - res_dense(1e-13)[sp]) < 1e-2 )
+        assert( np.abs(res_sie(1e-13)[sp] - res_dense(1e-13)[sp]) < 1e-2 )
+
+def test_jvp_and_matrix_free_evolute():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    concs = np.array(rs.get_concs_array(), dtype=float)
+    v = np.linspace(-1, 1, len(concs))
+    assert( np.allclose(rs.compute_jvp(concs, v), rs.compute_jac(concs).dot(v)) )
+    assert( np.allclose(rs.jac_operator(concs).dot(v), rs.compute_jac(concs).dot(v)) )
+
+    res_dense = rs.evolute(1e-13, method='SIE')
+    rs.set_concs(concentrations)
+    res_krylov = rs.evolute(1e-13, method='SIE', matrix_free=True)
+    for sp in species:
+        assert( np.abs(res_krylov(1e-13)[sp] - res_dense(1e-13)[sp]) < 1e-6 )
+    try:
+        rs.evolute(1e-13, method='LSODA', matrix_free=True)
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_evolute_rosenbrock():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    res_bdf = rs.evolute(1e-13, method='BDF', rtol=1e-8, atol=1e-10)
+    rs.set_concs(concentrations)
+    res_ros = rs.evolute(1e-13, method='ROS4', rtol=1e-6, atol=1e-8)
+    for t in [3e-14, 1e-13]:
+        for sp in species:
+            assert( np.abs(res_ros(t)[sp] - res_bdf(t)[sp]) < 1e-4 )
+
+def test_evolute_events():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    res_full = rs.evolute(1e-13, method='ROS4', rtol=1e-8, atol=1e-10)
+    # H2O2 decomposes from 1. find when it drops to 0.5
+    event = rs.make_threshold_event('H2O2', 0.5, direction=-1)
+    for method, tol_event in [('BDF', 1e-2), ('ROS4', 1e-6)]:
+        rs.set_concs(concentrations)
+        res_evo = rs.evolute(1e-13, method=method, rtol=1e-8, atol=1e-10, events=event)
+        t_event = res_evo.t_events[0][0]
+        assert( res_evo.t_final == t_event )
+        assert( np.abs(res_full(t_event)['H2O2'] - 0.5) < tol_event )
+
+def test_evolute_steady_state_detection():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    res_evo = rs.evolute(1e-6, method='ROS4', steady_tol=100)
+    assert( res_evo.t_final < 1e-6 )
+    rs.set_concs(res_evo(res_evo.t_final))
+    assert( np.sqrt(np.sum(rs.get_reac_rate()**2)) < 100.01 )
+    # started at equilibrium, the evolution stops right away
+    concs_eq = rs.steady_state()
+    for method, kwargs in [('ROS4', {}), ('LSODA', {}), ('BDF', dict(dense_dtype=np.float32)), 
+                           ('ROS4', dict(t_eval=[0., 1e-6])), ('LSODA', dict(conserve=True))]:
+        rs.set_concs(concs_eq)
+        res = rs.evolute(1e-6, method=method, steady_tol=100, **kwargs)
+        assert( res.t_final == 0 and res.t_events[-1].tolist() == [0.] )
+        assert( np.allclose(rs.get_concs_array(), [concs_eq[sp] for sp in species]) )
+    assert( np.allclose([res(0.)[sp] for sp in species], [concs_eq[sp] for sp in species]) )
+
+def test_steady_state():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    concs_0 = np.array(rs.get_concs_array())
+    res_evo = rs.evolute(1e-3, method='ROS4', rtol=1e-8, atol=1e-12)
+    for kwargs in [dict(), dict(max_iter=3)]: # max_iter=3 forces the pseudo-transient fallback
+        rs.set_concs(concentrations)
+        res_ss = rs.steady_state(**kwargs)
+        concs_ss = np.array([res_ss[sp] for sp in species])
+        # conservation laws set by the initial concentrations hold
+        assert( np.allclose(rs.get_conservation_basis().dot(concs_ss - concs_0), 0) )
+        for sp in species:
+            assert( np.abs(res_ss[sp] - res_evo(1e-3)[sp]) < 1e-8 )
+    try:
+        rs.steady_state(max_iter=3, ptc=False)
+    except Exception as err:
+        assert( type(err) == np.linalg.LinAlgError )
+
+def test_steady_state_at_boundary():
+    make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+    rs = ReactionSystem([
+        make(dict(A=1, C=1), dict(B=1, D=1), 1.21), make(dict(A=1, B=1), dict(C=1), 2.96),
+        make(dict(C=1), dict(A=1, B=1), 1.28), make(dict(D=1), dict(C=1), 0.97)],
+        initial_concs=dict(A=1.63, B=0.93, C=0., D=0.57))
+    # the first Newton step points to negative C, which is at 0 already
+    concs_0 = rs.get_concs_array()
+    Z = rs.get_conservation_basis()
+    visited = []
+    reac_rate_array = rs._reac_rate_array
+    def recorded(concs):
+        visited.append(np.min(concs))
+        return reac_rate_array(concs)
+    rs._reac_rate_array = recorded
+    res_ss = rs.steady_state()
+    assert( min(visited) >= 0 )
+    concs_ss = np.array([res_ss[sp] for sp in rs.get_species()])
+    assert( np.all(concs_ss >= 0) )
+    assert( np.allclose(Z.dot(concs_ss - concs_0), 0) )
+    assert( np.allclose(reac_rate_array(concs_ss), 0, atol=1e-10) )
+
+def test_sensitivity_against_finite_difference():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    t_bound = 1e-14 # still in the transient, at equilibrium scaling kf, kb together has no effect
+    sens = rs.sensitivity(t_bound)
+    sens_norm = rs.sensitivity(t_bound, params=('lnA',), normalized=True)
+    kf, kb = [np.copy(k) for k in rs.get_reac_rate_coefs()]
+    eps = 1e-4
+    for m in range(len(reactions)):
+        concs_pm = []
+        for sign in [1, -1]:
+            rs.set_concs(concentrations)
+            rs._kf, rs._kb = np.copy(kf), np.copy(kb)
+            rs._kf[m] *= np.exp(sign * eps)
+            rs._kb[m] *= np.exp(sign * eps)
+            res = rs.evolute(t_bound, method='ROS4', rtol=1e-8, atol=1e-14)
+            concs_pm.append(np.array([res(t_bound)[sp] for sp in species]))
+        fd = (concs_pm[0] - concs_pm[1]) / (2 * eps)
+        assert( np.allclose(sens['lnA'][:, m], fd, rtol=1e-3, atol=1e-5 * np.max(np.abs(sens['lnA']))) )
+        # k depends on E only through -E/RT
+        assert( np.allclose(sens['E'][:, m], -sens['lnA'][:, m] / (8.314 * temperature)) )
+    rs._kf, rs._kb = kf, kb
+    rs.set_concs(concentrations)
+    res = rs.evolute(t_bound, method='ROS4', rtol=1e-8, atol=1e-14)
+    concs = np.array([res(t_bound)[sp] for sp in species])
+    assert( np.allclose(sens_norm['lnA'] * concs[:, None], sens['lnA'], rtol=1e-4, atol=1e-12) )
+    try:
+        rs.sensitivity(t_bound, params=('k',))
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_adjoint_gradient():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    t_bound = 1e-14
+    weights = np.arange(1, len(species)+1, dtype=float)
+    sens = rs.sensitivity(t_bound, rtol=1e-8, atol=1e-14)
+    for n_checkpoints in [1, 3]:
+        value, grad = rs.adjoint_gradient(
+            t_bound, weights=weights, rtol=1e-8, atol=1e-14, n_checkpoints=n_checkpoints)
+        for p in ['lnA', 'b', 'E']:
+            assert( np.allclose(grad[p], weights.dot(sens[p]), rtol=1e-5, atol=1e-5*np.max(np.abs(grad[p]))) )
+    # gradient of the time H2O reaches 1.5, against finite difference
+    event = rs.make_threshold_event('H2O', 1.5)
+    t_event, grad = rs.adjoint_gradient(t_bound, event=event, params=('lnA',), rtol=1e-8, atol=1e-14)
+    kf, kb = [np.copy(k) for k in rs.get_reac_rate_coefs()]
+    eps = 1e-4
+    for m in [0, 4]:
+        t_pm = []
+        for sign in [1, -1]:
+            rs._kf, rs._kb = np.copy(kf), np.copy(kb)
+            rs._kf[m] *= np.exp(sign * eps)
+            rs._kb[m] *= np.exp(sign * eps)
+            t_pm.append(rs.adjoint_gradient(t_bound, event=event, params=('lnA',), rtol=1e-8, atol=1e-14)[0])
+        fd = (t_pm[0] - t_pm[1]) / (2 * eps)
+        assert( np.abs(grad['lnA'][m] - fd) < 1e-3 * np.max(np.abs(grad['lnA'])) )
+    rs._kf, rs._kb = kf, kb
+    for kwargs in [dict(), dict(event=rs.make_threshold_event('H2O', 10.))]:
+        try:
+            rs.adjoint_gradient(t_bound, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_evolute_qss():
+    # X, Y are short-lived radicals coupled by fast exchange, forming a qss group
+    make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+    rs = ReactionSystem([
+        make(dict(A=1), dict(X=1), 1.), make(dict(X=1), dict(Y=1), 1e4), 
+        make(dict(Y=1), dict(X=1), 1e4), make(dict(Y=1), dict(B=1), 1e4)], 
+        initial_concs=dict(A=1., B=0., X=0., Y=0.))
+    assert( rs.detect_qss(1e-2) == ['X', 'Y'] )
+    concs_0 = dict(rs.get_concs())
+    for qss in ['auto', ['X', 'Y']]:
+        for method in ['BDF', 'ROS4']:
+            rs.set_concs(concs_0)
+            res = rs.evolute(5., method=method, rtol=1e-6, atol=1e-10, qss=qss)
+            assert( res.qss == ['X', 'Y'] )
+            concs = res(np.array([1., 5.]))
+            # the pre-equilibrated radicals add an O(1e-4) shift to B(t) = 1 - exp(-t)
+            assert( np.allclose(concs['B'], 1 - np.exp(-np.array([1., 5.])), atol=2e-4) )
+            assert( np.allclose(concs['Y'], 1e-4 * concs['A'], rtol=1e-3) )
+            assert( np.allclose(concs['X'], 2e-4 * concs['A'], rtol=1e-3) )
+    for kwargs in [dict(qss='all'), dict(qss=['Z']), dict(qss=['X'], method='SIE', matrix_free=True)]:
+        rs.set_concs(concs_0)
+        try:
+            rs.evolute(5., **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_mapping_and_isat():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    dt = 1e-15
+    concs_0 = np.array(rs.get_concs_array(), dtype=float)
+    concs_dt, grad = rs.mapping(dt, gradient=True)
+    res = rs.evolute(dt, method='ROS4', rtol=1e-8, atol=1e-14)
+    assert( np.allclose(concs_dt, [res(dt)[sp] for sp in species], atol=1e-6) )
+    eps = 1e-6
+    for j in range(len(species)):
+        dconcs = np.zeros(len(species))
+        dconcs[j] = eps
+        fd = (rs.mapping(dt, concs_0 + dconcs, rtol=1e-10, atol=1e-14) 
+              - rs.mapping(dt, concs_0 - dconcs, rtol=1e-10, atol=1e-14)) / (2 * eps)
+        assert( np.allclose(grad[:, j], fd, atol=1e-5) )
+    table = rs.isat(dt, eps_tol=1e-4, max_records=50)
+    rng = np.random.RandomState(0)
+    for _ in range(100):
+        concs = concs_0 * (1 + 0.01 * rng.randn(len(species)))
+        assert( np.linalg.norm(table.query(concs) - rs.mapping(dt, concs)) < 1e-3 )
+    assert( table.stats['n_hit'] > 20 )
+    assert( table.stats['n_add'] < 10 )
+
+def test_advance_continuation():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    res_ref = rs.evolute(1e-13, method='ROS4', rtol=1e-8, atol=1e-14)
+    for method, kwargs in [('ROS4', dict(sparse=True)), ('BDF', dict())]:
+        rs.set_concs(concentrations, initial=True)
+        assert( rs.get_time() == 0 )
+        concs_frames = []
+        for k in range(1, 11):
+            res = rs.advance(k * 1e-14, method=method, rtol=1e-6, atol=1e-12, **kwargs)
+            concs_frames.append(dict(rs.get_concs()))
+            assert( res.t_final == rs.get_time() == k * 1e-14 )
+        # the state moves on between the frames, and matches a single evolution
+        assert( concs_frames[0]['H2O2'] != concs_frames[1]['H2O2'] )
+        for sp in species:
+            assert( np.abs(rs.get_concs()[sp] - res_ref(1e-13)[sp]) < 1e-7 )
+    # the sparse LU ordering was computed once for all the calls
+    rs.set_concs(concentrations, initial=True)
+    for k in range(1, 4):
+        rs.advance(k * 1e-14, sparse=True)
+    assert( rs._continuation['linsolver'].n_order == 1 )
+    try:
+        rs.advance(1e-14)
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_sweep_warm_start():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    temperatures = [3200., 2800., 3100., 2900., 3000.]
+    results, report = rs.sweep(temperatures, steady=True)
+    assert( report['order'] == [1, 3, 4, 2, 0] )
+    assert( report['warm'] == [True, False, True, True, True] )
+    n_iter_cold = 0
+    for T, res in zip(temperatures, results):
+        rs.set_temp(T)
+        rs.set_concs(concentrations)
+        res_cold = rs.steady_state()
+        n_iter_cold += sum(rs.steady_stats.values())
+        for sp in species:
+            assert( np.abs(res[sp] - res_cold[sp]) < 1e-10 )
+    assert( sum(report['n_iter']) < n_iter_cold )
+    # the state of the system is restored
+    assert( rs.get_temp() == temperature and rs.get_concs() == concentrations )
+
+    results, report = rs.sweep(temperatures[:3], t_bound=1e-13, rtol=1e-6, atol=1e-12, sparse=True)
+    assert( report['warm'] == [True, False, True] )
+    for T, res in zip(temperatures[:3], results):
+        rs.set_temp(T)
+        rs.set_concs(concentrations)
+        res_cold = rs.evolute(1e-13, method='ROS4', rtol=1e-6, atol=1e-12)
+        for sp in species:
+            assert( np.abs(res(1e-13)[sp] - res_cold(1e-13)[sp]) < 1e-6 )
+    # SIE has no first step to warm start, only its linear solver is reused
+    rs.set_concs(concentrations)
+    results, report = rs.sweep([2900., 3000., 3100.], t_bound=1e-13, method='SIE')
+    assert( report['warm'] == [False, True, True] )
+    for T, res in zip([2900., 3000., 3100.], results):
+        rs.set_temp(T)
+        rs.set_concs(concentrations)
+        res_cold = rs.evolute(1e-13, method='SIE')
+        for sp in species:
+            assert( np.abs(res(1e-13)[sp] - res_cold(1e-13)[sp]) < 1e-6 )
+    try:
+        rs.sweep(temperatures)
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_evolute_linear_exact():
+    make = lambda r, p, k, rev=False: Reaction(
+        reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k), reversible=rev)
+    # decay chain A -> B -> C, with distinct rates
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(B=1), dict(C=1), 3.)], 
+        initial_concs=dict(A=1., B=0., C=0.))
+    assert( rs.is_linear() )
+    assert( np.allclose(rs.compute_linear_operator(), [[-1, 0, 0], [1, -3, 0], [0, 3, 0]]) )
+    t = np.linspace(0, 5, 11)
+    res = rs.evolute(5.)
+    assert( res.exact )
+    assert( np.allclose(res(t)['A'], np.exp(-t)) )
+    assert( np.allclose(res(t)['B'], (np.exp(-t) - np.exp(-3*t)) / 2) )
+    assert( np.abs(res(2.)['C'] - (1 - 1.5*np.exp(-2.) + 0.5*np.exp(-6.))) < 1e-12 )
+    # the final state is written back, and the numerical path agrees
+    assert( np.abs(rs.get_concs()['A'] - np.exp(-5.)) < 1e-12 )
+    rs.set_concs(dict(A=1., B=0., C=0.))
+    res_num = rs.evolute(5., method='ROS4', rtol=1e-8, atol=1e-12, exact=False)
+    assert( not hasattr(res_num, 'exact') )
+    assert( np.allclose(res_num(t)['B'], res(t)['B'], atol=1e-7) )
+    # the dense options restrict the closed form too
+    rs.set_concs(dict(A=1., B=0., C=0.))
+    res = rs.evolute(5., dense_species=['B'], dense_dtype=np.float32, dense_window=2.)
+    assert( res.exact and res.dense_output is None )
+    assert( list(res(4.)) == ['B'] and res(t[-5:])['B'].dtype == np.float32 )
+    assert( np.allclose(res(t[-5:])['B'], (np.exp(-t[-5:]) - np.exp(-3*t[-5:])) / 2, rtol=1e-6) )
+    assert( np.abs(rs.get_concs()['A'] - np.exp(-5.)) < 1e-12 )
+    for call in [lambda: res(2.5), lambda: rs.evolute(5., dense_species=['D'])]:
+        try:
+            call()
+        except Exception as err:
+            assert( type(err) == ValueError )
+        else:
+            assert( False )
+    # equal rates make K defective, t*exp(-t) appears
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(B=1), dict(C=1), 1.)], 
+        initial_concs=dict(A=1., B=0., C=0.))
+    assert( np.allclose(rs.evolute(5.)(t)['B'], t * np.exp(-t)) )
+    # a second-order reaction is not linear
+    rs = ReactionSystem(
+        [make(dict(A=2), dict(B=1), 1.)], initial_concs=dict(A=1., B=0.))
+    assert( not rs.is_linear() )
+    try:
+        rs.compute_linear_operator()
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_evolute_conserve():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    # the svd of nu is left to the first use of the conservation laws
+    assert( rs._cons_basis is None )
+    L = rs.get_conservation_basis()
+    assert( rs._stoich_basis.shape == (len(species), len(species) - L.shape[0]) )
+    idx_i, idx_d, dep_map, dep_offset = rs.conservation_partition()
+    assert( len(idx_d) == L.shape[0] and sorted(idx_i + idx_d) == list(range(len(species))) )
+    concs_0 = np.array(rs.get_concs_array())
+    assert( np.allclose(dep_offset + dep_map.dot(concs_0[idx_i]), concs_0[idx_d]) )
+    ref = rs.evolute(1e-13, method='ROS4', rtol=1e-8, atol=1e-14)
+    concs_ref = np.array([ref(1e-13)[sp] for sp in species])
+    for method, sparse in [('ROS4', False), ('BDF', True)]:
+        rs.set_concs(concentrations)
+        res = rs.evolute(1e-13, method=method, rtol=1e-6, atol=1e-12, sparse=sparse, conserve=True)
+        concs = np.array([res(1e-13)[sp] for sp in species])
+        assert( np.abs(concs - concs_ref).max() < 1e-7 )
+        # the conservation laws hold to roundoff
+        assert( np.abs(L.dot(concs - concs_0)).max() < 1e-14 )
+        assert( np.allclose(rs.get_concs_array(), concs) )
+    for kwargs in [dict(qss=['H']), dict(method='SIE', matrix_free=True)]:
+        rs.set_concs(concentrations)
+        try:
+            rs.evolute(1e-14, conserve=True, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_evolute_components():
+    make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+    # two blocks that never interact, and an inert species G
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(C=1), dict(D=1), 1e4), 
+         make(dict(B=2), dict(A=1), 0.5), make(dict(D=1, E=1), dict(F=1), 1e3)], 
+        species_ls=['A', 'B', 'C', 'D', 'E', 'F', 'G'],
+        initial_concs=dict(A=1., B=0., C=1., D=0., E=1., F=0., G=0.3))
+    components = rs.connected_components()
+    assert( components == [(['A', 'B'], [0, 2]), (['C', 'D', 'E', 'F'], [1, 3]), (['G'], [])] )
+    concs_0 = dict(rs.get_concs())
+    ref = rs.evolute(2., method='BDF', rtol=1e-8, atol=1e-12)
+    t = np.array([0.5, 2.])
+    for kwargs in [dict(), dict(n_workers=2, component_options=[dict(method='LSODA'), dict(atol=1e-10), {}])]:
+        rs.set_concs(concs_0)
+        res = rs.evolute_components(2., method='BDF', rtol=1e-8, atol=1e-12, **kwargs)
+        assert( res.t_final == 2. and res.solutions[2] is None )
+        concs, concs_ref = res(t), ref(t)
+        for sp in rs.get_species():
+            assert( np.allclose(concs[sp], concs_ref[sp], atol=1e-6) )
+        assert( np.abs(rs.get_concs()['F'] - ref(2.)['F']) < 1e-6 and rs.get_concs()['G'] == 0.3 )
+    for kwargs in [dict(steady_tol=1e-3), dict(component_options=[{}])]:
+        try:
+            rs.evolute_components(2., **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_evolute_multirate():
+    make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+    # the fuel F is consumed by the short-lived radicals R, Q, beside a slow chain A -> B -> C
+    rs = ReactionSystem([
+        make(dict(F=1), dict(R=1), 1.), make(dict(R=1, F=1), dict(P=1, R=1), 0.5),
+        make(dict(R=1), dict(Q=1), 1e4), make(dict(Q=1), dict(R=1), 5e3), 
+        make(dict(Q=1), dict(P=1), 2e3), make(dict(A=1), dict(B=1), 0.3), 
+        make(dict(B=1), dict(C=1), 0.2)], 
+        initial_concs=dict(F=1., R=0., Q=0., P=0., A=1., B=0., C=0.))
+    assert( rs.detect_fast(1e-2) == ['Q', 'R'] )
+    concs_0 = dict(rs.get_concs())
+    ref = rs.evolute(5., method='BDF', rtol=1e-10, atol=1e-14)
+    t = np.linspace(0.1, 5., 20)
+    for fast in [None, ['R', 'Q']]:
+        rs.set_concs(concs_0)
+        res = rs.evolute(5., method='MR', rtol=1e-6, atol=1e-10, fast=fast)
+        assert( res.fast == ['Q', 'R'] )
+        for sp in rs.get_species():
+            assert( np.allclose(res(t)[sp], ref(t)[sp], atol=1e-5) )
+        assert( np.abs(rs.get_concs()['P'] - ref(5.)['P']) < 1e-5 )
+    for kwargs in [dict(steady_tol=1e-3), dict(conserve=True), dict(fast=['Z'])]:
+        rs.set_concs(concs_0)
+        try:
+            rs.evolute(5., method='MR', **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_evolute_transform():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    ref = rs.evolute(1e-13, method='ROS4', rtol=1e-10, atol=1e-16)
+    concs_ref = np.array([ref(1e-13)[sp] for sp in species])
+    for transform, method in [('log', 'ROS4'), ('log', 'BDF'), ('scale', 'Radau'), ('scale', 'ROS4')]:
+        rs.set_concs(concentrations)
+        res = rs.evolute(1e-13, method=method, rtol=1e-6, atol=1e-12, sparse=True, transform=transform)
+        concs = np.array([res(1e-13)[sp] for sp in species])
+        assert( np.allclose(concs, concs_ref, rtol=1e-4) )
+        assert( np.allclose(rs.get_concs_array(), concs) )
+
+    make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+    # A decays over 20 orders of magnitude, while B is produced from zero
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1e3), make(dict(B=1), dict(C=1), 1.)], 
+        initial_concs=dict(A=1., B=0., C=0.))
+    t = np.linspace(0, 0.05, 101)
+    res = rs.evolute(0.05, method='ROS4', rtol=1e-6, atol=1e-10, transform='log')
+    concs = res(t)
+    assert( np.all(concs['A'] > 0) and np.all(concs['B'] > 0) )
+    # the relative accuracy holds far below atol
+    assert( np.allclose(concs['A'], np.exp(-1e3 * t), rtol=1e-4, atol=0) )
+    for kwargs in [dict(transform='sqrt'), dict(transform='log', conserve=True), dict(transform='log', method='MR')]:
+        rs.set_concs(dict(A=1., B=0., C=0.))
+        try:
+            rs.evolute(0.05, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_evolute_auto():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    stiffness = rs.estimate_stiffness()
+    rho = np.max(np.abs(np.linalg.eigvals(rs.compute_jac(rs.get_concs_array()))))
+    assert( np.isclose(stiffness['rho'], rho, rtol=1e-3) )
+    assert( stiffness['rho'] <= stiffness['rho_gershgorin'] )
+    assert( rs.choose_method(1e-13)['method'] == 'LSODA' )
+    assert( rs.choose_method(1e-10)['method'] == 'ROS4' )
+    assert( rs.choose_method(1e-10, rtol=1e-8)['method'] == 'BDF' )
+    # remembered by the system per state, analysed again at another temperature or concentrations
+    assert( rs.choose_method(1e-10)['stiffness'] is rs.choose_method(1e-10)['stiffness'] )
+    stiffness = rs.choose_method(1e-10)['stiffness']
+    rs_same = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    assert( rs_same.fingerprint() == rs.fingerprint() )
+    assert( rs_same.choose_method(1e-10)['stiffness'] is not stiffness )
+    assert( rs.choose_method(1e-10, concs=1e3 * np.array(rs.get_concs_array()))['stiffness'] is not stiffness )
+    rs.set_temp(2000)
+    assert( rs.choose_method(1e-10)['stiffness'] is not stiffness )
+    rs.set_temp(temperature)
+    assert( rs.choose_method(1e-10)['stiffness'] is stiffness )
+    for n in range(100):
+        rs.choose_method(10.0**(-n))
+    assert( len(rs._auto_choices) == 64 )
+
+    ref = rs.evolute(1e-13, method='ROS4', rtol=1e-10, atol=1e-16)
+    rs.set_concs(concentrations)
+    res = rs.evolute(1e-13, method='auto', rtol=1e-6, atol=1e-14)
+    assert( res.method == 'LSODA' )
+    concs = np.array([res(1e-13)[sp] for sp in species])
+    assert( np.allclose(concs, [ref(1e-13)[sp] for sp in species], rtol=1e-4) )
+    try:
+        rs.choose_method(0.)
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_evolute_dense_lean():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    ref = rs.evolute(1e-13, method='ROS4', rtol=1e-10, atol=1e-16)
+    t = np.linspace(5e-14, 1e-13, 11)
+    concs_ref = ref(t)
+    for method in ['LSODA', 'BDF', 'ROS4']:
+        rs.set_concs(concentrations)
+        res = rs.evolute(1e-13, method=method, rtol=1e-8, atol=1e-16, dense_species=['H', 'OH'], 
+                         dense_dtype=np.float32, dense_window=5e-14)
+        concs = res(t)
+        assert( sorted(concs) == ['H', 'OH'] )
+        for sp in concs:
+            assert( np.allclose(concs[sp], concs_ref[sp], rtol=1e-5) )
+        assert( np.allclose(rs.get_concs_array(), [concs_ref[sp][-1] for sp in species], rtol=1e-5) )
+        try:
+            res(1e-14)
+        except Exception as err:
+            assert( type(err) == ValueError )
+    for kwargs in [dict(dense_species=['H'], conserve=True), dict(dense_species=['X'])]:
+        rs.set_concs(concentrations)
+        try:
+            rs.evolute(1e-13, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_evolute_t_eval():
+    rs = ReactionSystem(
+        reactions, species, nasa_query, 
+        initial_concs=concentrations, initial_T=temperature)
+    ref = rs.evolute(1e-13, method='ROS4', rtol=1e-10, atol=1e-16)
+    t = np.linspace(0, 1e-13, 21)
+    concs_ref = np.array([ref(t)[sp] for sp in species]).T
+    for method, kwargs in [('BDF', {}), ('ROS4', {}), ('ROS4', dict(conserve=True)), ('MR', {})]:
+        rs.set_concs(concentrations)
+        traj = rs.evolute(1e-13, method=method, rtol=1e-8, atol=1e-16, t_eval=t, **kwargs)
+        assert( traj.concs.shape == (len(t), len(species)) and traj.concs.flags['C_CONTIGUOUS'] )
+        assert( traj.species == species and traj.index['OH'] == species.index('OH') )
+        assert( np.allclose(traj.concs, concs_ref, rtol=1e-5) )
+        assert( np.allclose(traj['OH'], concs_ref[:, species.index('OH')], rtol=1e-5) )
+        assert( traj.t_final == 1e-13 and traj.method == method )
+        assert( np.allclose(rs.get_concs_array(), concs_ref[-1], rtol=1e-5) )
+
+    # samples after a terminal event are dropped
+    threshold = (concs_ref[0, species.index('OH')] + concs_ref[-1, species.index('OH')]) / 2
+    rs.set_concs(concentrations)
+    traj = rs.evolute(1e-13, method='ROS4', rtol=1e-8, atol=1e-16, t_eval=t, 
+                      events=rs.make_threshold_event('OH', threshold))
+    assert( len(traj) < len(t) and np.all(traj.t <= traj.t_final) )
+    assert( np.allclose(traj.concs, concs_ref[:len(traj)], rtol=1e-5) )
+
+    for t_eval in [[0, 2e-13], [1e-14, 0]]:
+        rs.set_concs(concentrations)
+        try:
+            rs.evolute(1e-13, t_eval=t_eval)
+        except Exception as err:
+            assert( type(err) == ValueError )
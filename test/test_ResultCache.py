@@ -0,0 +1,109 @@
+from chemkin_CS207_G9.reaction.Reaction import Reaction
+from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+from chemkin_CS207_G9.reaction.ResultCache import EvoluteCache
+import multiprocessing
+import numpy as np
+import os
+
+
+make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+initial = dict(A=1., B=0., C=0.)
+
+def make_system():
+    return ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(B=2), dict(C=1), 1.)], initial_concs=initial)
+
+def test_evolute_cache(tmpdir):
+    rs = make_system()
+    cache = EvoluteCache(str(tmpdir))
+    t = np.linspace(0, 2, 9)
+    for kwargs in [dict(method='ROS4'), dict(method='BDF', t_eval=t), dict(method='LSODA', final_only=True), 
+                   dict(method='ROS4', steady_tol=0.3)]:
+        rs.set_concs(initial)
+        first = cache.evolute(rs, 2., rtol=1e-6, atol=1e-10, **kwargs)
+        state = rs.get_concs_array()
+        rs.set_concs(initial)
+        n_hit = cache.stats['n_hit']
+        second = cache.evolute(rs, 2., rtol=1e-6, atol=1e-10, **kwargs)
+        assert( cache.stats['n_hit'] == n_hit + 1 and np.all(rs.get_concs_array() == state) )
+        if kwargs.get('final_only'):
+            assert( first == second )
+        elif 't_eval' in kwargs:
+            assert( np.all(first.concs == second.concs) and second.species == first.species )
+        else:
+            assert( all(np.all(first(t)[sp] == second(t)[sp]) for sp in rs.get_species()) )
+            assert( first.t_final == second.t_final and first.method == second.method )
+            if 'steady_tol' in kwargs:
+                assert( first.t_final < 2 and np.allclose(first.t_events[0], second.t_events[0]) )
+    assert( cache.stats['n_miss'] == 4 )
+
+    # without dense_* the cached solution is the Hermite dense output of the steps, which 
+    # agrees with the interpolant of the solver within the tolerances only
+    rs.set_concs(initial)
+    plain = rs.evolute(2., method='LSODA', rtol=1e-6, atol=1e-10)
+    state = rs.get_concs_array()
+    rs.set_concs(initial)
+    cached = cache.evolute(rs, 2., method='LSODA', rtol=1e-6, atol=1e-10)
+    assert( np.all(rs.get_concs_array() == state) and cached.t_final == plain.t_final )
+    assert( cached.dense_output is not None and getattr(plain, 'dense_output', None) is None )
+    for sp in rs.get_species():
+        assert( np.allclose(cached(t)[sp], plain(t)[sp], rtol=1e-5, atol=1e-8) )
+
+    # the key changes with the mechanism, the temperature, the concentrations and the options
+    rs.set_concs(initial)
+    key = cache.key(rs, 2., method='ROS4')
+    assert( key == cache.key(make_system(), 2., method='ROS4') )
+    assert( key != cache.key(rs, 2., method='ROS4', rtol=1e-4) and key != cache.key(rs, 3., method='ROS4') )
+    rs.set_concs(dict(initial, B=1e-12))
+    assert( key != cache.key(rs, 2., method='ROS4') )
+    rs.set_temp(500)
+    rs.set_concs(initial)
+    assert( key != cache.key(rs, 2., method='ROS4') )
+    assert( cache.key(rs, 2., events=lambda t, y: y[0] - 0.5) is None )
+
+    n_bypass = cache.stats['n_bypass']
+    cache.evolute(rs, 2., method='ROS4', bypass=True)
+    cache.evolute(rs, 2., method='ROS4', qss=['B'])
+    assert( cache.stats['n_bypass'] == n_bypass + 2 )
+    try:
+        cache.evolute(rs, 2., final_only=True, t_eval=t)
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_evolute_cache_eviction(tmpdir):
+    rs = make_system()
+    cache = EvoluteCache(str(tmpdir))
+    for n, t_bound in enumerate([1., 2., 3.]):
+        rs.set_concs(initial)
+        cache.evolute(rs, t_bound, method='ROS4')
+        # entries of increasing age
+        rs.set_concs(initial)
+        path = os.path.join(str(tmpdir), cache.key(rs, t_bound, method='ROS4') + '.npz')
+        os.utime(path, (1e9 + n, 1e9 + n))
+    size = cache.size()
+    # a hit makes the oldest entry the most recently used
+    rs.set_concs(initial)
+    cache.evolute(rs, 1., method='ROS4')
+    cache.max_bytes = size * 3 // 4
+    rs.set_concs(initial)
+    cache.evolute(rs, 4., method='ROS4')
+    assert( cache.stats['n_evict'] == 2 and cache.size() <= cache.max_bytes )
+    for t_bound, stored in [(1., True), (2., False), (3., False), (4., True)]:
+        rs.set_concs(initial)
+        assert( os.path.exists(os.path.join(str(tmpdir), cache.key(rs, t_bound, method='ROS4') + '.npz')) == stored )
+    cache.clear()
+    assert( cache.size() == 0 )
+
+def _evolute_cached(args):
+    path, t_bound = args
+    rs = make_system()
+    return EvoluteCache(path, max_bytes=20000).evolute(rs, t_bound, method='ROS4', final_only=True)
+
+def test_evolute_cache_processes(tmpdir):
+    jobs = [(str(tmpdir), 1. + n % 5) for n in range(40)]
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        results = pool.map(_evolute_cached, jobs)
+    for (_, t_bound), result in zip(jobs, results):
+        assert( result == _evolute_cached((str(tmpdir), t_bound)) )
+    assert( not [name for name in os.listdir(str(tmpdir)) if name.endswith('.tmp')] )
+    assert( EvoluteCache(str(tmpdir), max_bytes=20000).size() <= 20000 )
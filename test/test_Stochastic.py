@@ -0,0 +1,128 @@
+from chemkin_CS207_G9.reaction.Reaction import Reaction
+from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+from chemkin_CS207_G9.reaction.Stochastic import NextReactionMethod, TauLeapingEnsemble
+import numpy as np
+
+
+make = lambda r, p, k, rev=False: Reaction(
+    reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k), reversible=rev)
+
+def test_next_reaction_decay():
+    # A -> B: A(t) is binomial with p = exp(-t)
+    rs = ReactionSystem([make(dict(A=1), dict(B=1), 1.)], initial_concs=dict(A=1., B=0.))
+    counts = []
+    for seed in range(1000):
+        ssa = NextReactionMethod(rs, volume=20, seed=seed)
+        times, records = ssa.simulate(1., t_eval=[0.5, 1.])
+        assert( times.tolist() == [0.5, 1.] and ssa.t == 1. )
+        assert( np.all(records.sum(axis=1) == 20) and records[0, 0] >= records[1, 0] )
+        counts.append(records[1, 0])
+    p = np.exp(-1)
+    assert( np.abs(np.mean(counts) - 20 * p) < 4 * np.sqrt(20 * p * (1 - p) / 1000) )
+    assert( np.abs(np.var(counts) / (20 * p * (1 - p)) - 1) < 0.2 )
+
+def test_next_reaction_large_volume():
+    # 2A <-> B approaches the deterministic evolution as the volume grows
+    rs = ReactionSystem(
+        [make(dict(A=2), dict(B=1), 1.), make(dict(B=1), dict(A=2), 0.5)], 
+        initial_concs=dict(A=1., B=0.))
+    ssa = NextReactionMethod(rs, volume=1e4, seed=1)
+    assert( [d.tolist() for d in ssa.dependency] == [[0, 1], [0, 1]] )
+    assert( np.allclose(ssa.propensities(), [1e4 * (1 - 1e-4), 0.]) )
+    times, records = ssa.simulate(2., record_every=100)
+    assert( times[0] == 0 and times[-1] == 2. and len(times) == ssa.n_events // 100 + 2 )
+    assert( np.all(records[:, 0] + 2 * records[:, 1] == 1e4) )
+    res = rs.evolute(2., method='BDF', rtol=1e-8, atol=1e-12)
+    assert( np.abs(records[-1, 0] / 1e4 - res(2.)['A']) < 0.02 )
+    # the simulation continues from the current state
+    n_events = ssa.n_events
+    times, records = ssa.simulate(3., max_events=10)
+    assert( ssa.n_events == n_events + 10 and times[-1] < 3. and ssa.t == times[-1] )
+
+def test_next_reaction_dependency():
+    # A -> B, B -> C, D -> E: the last channel depends on no other
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(B=1), dict(C=1), 1.), make(dict(D=1), dict(E=1), 1.)], 
+        initial_concs=dict(A=1., B=0., C=0., D=1., E=0.))
+    ssa = NextReactionMethod(rs, volume=10, seed=0)
+    assert( [d.tolist() for d in ssa.dependency] == [[0, 1], [1], [2]] )
+
+def test_next_reaction_invalid():
+    rs = ReactionSystem([make(dict(A=1), dict(B=1), 1.)], initial_concs=dict(A=1., B=0.))
+    for kwargs in [dict(volume=0), dict(counts=dict(A=1.5, B=0)), dict(counts=dict(A=1))]:
+        try:
+            NextReactionMethod(rs, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+    ssa = NextReactionMethod(rs, volume=10)
+    ssa.simulate(1.)
+    for kwargs in [dict(t_end=0.5), dict(t_end=2., t_eval=[0.5, 1.5]), dict(t_end=2., record_every=0)]:
+        try:
+            ssa.simulate(**kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+
+def test_tau_leaping_decay():
+    # A -> B: A(t) is binomial with p = exp(-t), leaps at large counts, exact steps at low ones
+    rs = ReactionSystem([make(dict(A=1), dict(B=1), 1.)], initial_concs=dict(A=1., B=0.))
+    t = np.array([0., 0.5, 2.])
+    p = np.exp(-t)
+    for volume, rtol in [(20, 0.02), (1000, 0.03)]:
+        ensemble = TauLeapingEnsemble(rs, volume=volume, n_realizations=5000, seed=0)
+        moments = ensemble.simulate(t)
+        assert( moments['mean'].shape == (3, 2) and ensemble.t == 2. )
+        assert( np.allclose(moments['mean'][:, 0], volume * p, rtol=rtol) )
+        assert( np.allclose(moments['var'][1:, 0], volume * p[1:] * (1 - p[1:]), rtol=0.1) )
+        assert( np.all(ensemble.counts.sum(axis=1) == volume) and np.all(ensemble.counts >= 0) )
+        assert( ensemble.stats['n_exact'] > 0 )
+    assert( ensemble.stats['n_leap'] > 0 )
+
+def test_tau_leaping_large_volume():
+    # 2A <-> B, compared with the deterministic evolution and the exact SSA variance
+    rs = ReactionSystem(
+        [make(dict(A=2), dict(B=1), 1.), make(dict(B=1), dict(A=2), 0.5)], 
+        initial_concs=dict(A=1., B=0.))
+    ensemble = TauLeapingEnsemble(rs, volume=1000, n_realizations=2000, seed=1)
+    assert( np.allclose(ensemble.propensities()[0], [1000 * (1 - 1e-3), 0.]) )
+    moments = ensemble.simulate([0.5])
+    res = rs.evolute(2., method='BDF', rtol=1e-8, atol=1e-12)
+    assert( np.abs(moments['mean'][0, 0] / 1000 - res(0.5)['A']) < 0.01 )
+    # the simulation continues from the current counts
+    moments = ensemble.simulate([1., 2.])
+    assert( np.abs(moments['mean'][1, 0] / 1000 - res(2.)['A']) < 0.01 )
+    assert( np.all(ensemble.counts[:, 0] + 2 * ensemble.counts[:, 1] == 1000) )
+    variances = []
+    for seed in range(200):
+        times, records = NextReactionMethod(rs, volume=1000, seed=seed).simulate(2., t_eval=[2.])
+        variances.append(records[0, 0])
+    assert( np.abs(moments['var'][1, 0] / np.var(variances) - 1) < 0.3 )
+
+def test_tau_leaping_critical_rejections():
+    # a single A -> B is always critical, while the coarse leaps of C -> D overshoot C often,
+    # the rejections should not bias the firing time of A, exponential with rate 1
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(C=1), dict(D=1), 10.)], 
+        initial_concs=dict(A=1., B=0., C=40., D=0.))
+    R = 20000
+    ensemble = TauLeapingEnsemble(rs, n_realizations=R, seed=0, epsilon=0.99)
+    t = np.array([0.25, 0.5, 1.])
+    moments = ensemble.simulate(t)
+    assert( ensemble.stats['n_reject'] > 0.05 * ensemble.stats['n_leap'] )
+    p = np.exp(-t)
+    assert( np.all(np.abs(moments['mean'][:, 0] - p) < 4 * np.sqrt(p * (1 - p) / R)) )
+    assert( np.all(ensemble.counts >= 0) )
+
+def test_tau_leaping_invalid():
+    rs = ReactionSystem([make(dict(A=1), dict(B=1), 1.)], initial_concs=dict(A=1., B=0.))
+    for kwargs in [dict(volume=-1), dict(n_realizations=0), dict(epsilon=1.5), dict(counts=dict(A=-1, B=0))]:
+        try:
+            TauLeapingEnsemble(rs, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
+    ensemble = TauLeapingEnsemble(rs, volume=10, n_realizations=10)
+    ensemble.simulate([1.])
+    for t_eval in [[], [0.5], [2., 1.5]]:
+        try:
+            ensemble.simulate(t_eval)
+        except Exception as err:
+            assert( type(err) == ValueError )
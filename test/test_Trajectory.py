@@ -0,0 +1,103 @@
+from chemkin_CS207_G9.reaction.Reaction import Reaction
+from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+from chemkin_CS207_G9.reaction.Trajectory import Trajectory, TrajectoryStore
+import numpy as np
+import os
+
+
+make = lambda r, p, k: Reaction(reactants=r, products=p, coeffLaw='Constant', coeffParams=dict(k=k))
+
+def test_trajectory():
+    traj = Trajectory(np.arange(3.), np.arange(6.).reshape(3, 2), ['A', 'B'])
+    assert( len(traj) == 3 and np.all(traj['B'] == [1, 3, 5]) )
+    assert( np.all(traj.as_dict()['A'] == [0, 2, 4]) )
+    for args in [(np.arange(2.), np.zeros((3, 2)), ['A', 'B'])]:
+        try:
+            Trajectory(*args)
+        except Exception as err:
+            assert( type(err) == ValueError )
+    try:
+        traj['C']
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_trajectory_store(tmpdir):
+    t = np.linspace(0, 2, 101)
+    for compress in [False, True]:
+        path = str(tmpdir.join('store_{}'.format(compress)))
+        store = TrajectoryStore(path, chunk_size=8, compress=compress, rates=True)
+        with store.writer('run', ['A', 'B'], attrs=dict(T=300.)) as writer:
+            for t_n in t:
+                writer.append(t_n, [np.exp(-t_n), 1 - np.exp(-t_n)], [-np.exp(-t_n), np.exp(-t_n)])
+        # reopened from the manifest
+        store = TrajectoryStore(path)
+        assert( store.compress == compress and store.rates and store.chunk_size == 8 )
+        attrs = store.attrs('run')
+        assert( attrs['T'] == 300. and attrs['n_steps'] == 101 and attrs['complete'] )
+        assert( len(os.listdir(os.path.join(path, 'run_00000'))) == (14 if compress else 40) )
+
+        window = store.read('run', 0.51, 0.93, species=['B'])
+        assert( window.t[0] == t[25] and window.t[-1] == t[47] and window.concs.shape == (23, 1) )
+        chunks = list(store.iter_chunks('run', 0.51, 0.93))
+        assert( len(chunks) == 3 and sum(len(c) for c in chunks) == 21 )
+        concs = store.sample('run', [0.333, 1.777])
+        assert( np.allclose(concs['A'], np.exp(-np.array([0.333, 1.777])), rtol=1e-6) )
+
+        for call in [lambda: store.writer('run', ['A']), lambda: store.sample('run', 3.), 
+                     lambda: store.read('missing')]:
+            try:
+                call()
+            except Exception as err:
+                assert( type(err) == ValueError )
+        # the chunks of an open run are indexed as they are flushed, the manifest is not rewritten
+        writer = store.writer('open', ['A'])
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = f.read()
+        for t_n in t[:20]:
+            writer.append(t_n, [np.exp(-t_n)], [-np.exp(-t_n)])
+        with open(os.path.join(path, 'manifest.json')) as f:
+            assert( f.read() == manifest )
+        attrs = TrajectoryStore(path).attrs('open')
+        assert( attrs['n_steps'] == 16 and not attrs['complete'] )
+        writer.close()
+        assert( TrajectoryStore(path).attrs('open')['n_steps'] == 20 )
+        store.delete('open')
+
+        # two stores on the same directory keep each other's runs
+        other = TrajectoryStore(path)
+        with other.writer('other', ['A']) as writer_other, store.writer('mine', ['A']) as writer_mine:
+            for t_n in t[:10]:
+                writer_other.append(t_n, [np.exp(-t_n)], [-np.exp(-t_n)])
+                writer_mine.append(t_n, [np.exp(-t_n)], [-np.exp(-t_n)])
+        assert( sorted(TrajectoryStore(path).runs()) == ['mine', 'other', 'run'] )
+        assert( store.attrs('other')['complete'] and other.attrs('mine')['n_steps'] == 10 )
+        other.delete('other')
+        store.delete('mine')
+
+        store.writer('run', ['A'], overwrite=True).close()
+        assert( store.attrs('run')['n_steps'] == 0 )
+        store.delete('run')
+        assert( store.runs() == [] )
+
+def test_evolute_writer(tmpdir):
+    rs = ReactionSystem(
+        [make(dict(A=1), dict(B=1), 1.), make(dict(B=2), dict(C=1), 1.)], 
+        initial_concs=dict(A=1., B=0., C=0.))
+    ref = rs.evolute(5., method='ROS4', rtol=1e-10, atol=1e-14)
+    t = np.linspace(0, 5, 11)
+    store = TrajectoryStore(str(tmpdir), chunk_size=16, rates=True)
+    for method in ['ROS4', 'BDF']:
+        rs.set_concs(dict(A=1., B=0., C=0.))
+        res = rs.evolute(5., method=method, rtol=1e-8, atol=1e-12, writer=store.writer(method, rs.get_species()))
+        assert( store.attrs(method)['complete'] and res.t_final == 5. )
+        for sp in rs.get_species():
+            assert( np.allclose(res(t)[sp], ref(t)[sp], rtol=1e-5, atol=1e-8) )
+
+    rs.set_concs(dict(A=1., B=0., C=0.))
+    results, _ = rs.sweep([500, 300], 5., store=store)
+    assert( sorted(store.runs()) == ['0', '1', 'BDF', 'ROS4'] and store.attrs('1')['T'] == 300 )
+    assert( np.isclose(results[0](5.)['A'], np.exp(-5), rtol=1e-2) )
+    try:
+        rs.evolute(5., writer=store.writer('qss', rs.get_species()), qss=['B'])
+    except Exception as err:
+        assert( type(err) == ValueError )
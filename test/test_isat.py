@@ -0,0 +1,42 @@
+from chemkin_CS207_G9.math.isat import ISATable
+import numpy as np
+
+
+# R(x) = x + 0.1*x^2 componentwise, with its gradient
+fun = lambda x: x + 0.1 * x**2
+fun_grad = lambda x: (fun(x), np.diag(1 + 0.2 * x))
+
+def test_retrieve_grow_add():
+    table = ISATable(fun, fun_grad, eps_tol=1e-4)
+    x0 = np.array([1., 2.])
+    assert( np.allclose(table.query(x0), fun(x0)) )
+    assert( table.stats['n_add'] == 1 and len(table) == 1 )
+    # a linear retrieval within the initial EOA
+    y = table.query(x0 + 1e-5)
+    assert( table.stats['n_hit'] == 1 )
+    assert( np.linalg.norm(y - fun(x0 + 1e-5)) < 1e-4 )
+    # outside the initial EOA, but still accurate: the EOA grows, then covers the point
+    table.query(x0 + np.array([0.02, 0.]))
+    assert( table.stats['n_grow'] == 1 )
+    table.query(x0 + np.array([0.019, 0.]))
+    assert( table.stats['n_hit'] == 2 )
+    # far away: a new record
+    assert( np.allclose(table.query(x0 + 1.), fun(x0 + 1.)) )
+    assert( table.stats['n_add'] == 2 and len(table) == 2 )
+    assert( table.stats['n_query'] == 5 )
+
+def test_accuracy_and_eviction():
+    table = ISATable(fun, fun_grad, eps_tol=1e-3, max_records=5)
+    rng = np.random.RandomState(0)
+    for x in rng.uniform(-3, 3, size=(500, 2)):
+        assert( np.linalg.norm(table.query(x) - fun(x)) < 2e-3 )
+    assert( len(table) == 5 )
+    assert( table.stats['n_evict'] == table.stats['n_add'] - 5 )
+    assert( table.stats['n_hit'] + table.stats['n_grow'] + table.stats['n_add'] == 500 )
+
+def test_bad_params():
+    for kwargs in [dict(eps_tol=0), dict(max_records=0)]:
+        try:
+            ISATable(fun, fun_grad, **kwargs)
+        except Exception as err:
+            assert( type(err) == ValueError )
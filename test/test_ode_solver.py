@@ -1,5 +1,11 @@
-from chemkin_CS207_G9.math.ode_solver import solve_ivp
+from chemkin_CS207_G9.math.ode_solver import solve_ivp, make_linsolver, SparseLinearSolver
+from chemkin_CS207_G9.math.ode_solver import KrylovLinearSolver, JacobianOperator, Rosenbrock
+from chemkin_CS207_G9.math.ode_solver import steady_state_event, RosenbrockSensitivity, solve_adjoint
+from chemkin_CS207_G9.math.ode_solver import Rodas3, Multirate, HermiteOutput, TrajectorySampler, solve_ivp_scipy
 import numpy as np
+import scipy.linalg
+import scipy.sparse
+import time
 
 tol = 1e-2
     
@@ -13,4 +19,275 @@ def test_solve_ivp():
     estim = res_int.sol(3)
     truth = np.array([1,3])*np.exp(3)
     diff = estim - truth
-    assert( np.sqrt(np.sum(diff**2)) < tol*np.sqrt(np.sum(truth**2)))
\ No newline at end of file
+    assert( np.sqrt(np.sum(diff**2)) < tol*np.sqrt(np.sum(truth**2)))
+def test_solve_ivp_sparse():
+    res_int = solve_ivp(
+        fun=lambda t,y:y,
+        jac=lambda t,y:scipy.sparse.identity(2, format='csc'),
+        t_span=(0,1),
+        y0=np.array([1,3]),
+        method='SIE',
+        linsolver='sparse')
+    estim = res_int.sol(1)
+    truth = np.array([1,3])*np.exp(1)
+    diff = estim - truth
+    assert( np.sqrt(np.sum(diff**2)) < tol*np.sqrt(np.sum(truth**2)))
+
+def test_sparse_linsolver_reuses_ordering():
+    jac = scipy.sparse.random(50, 50, density=0.05, format='csc', random_state=0)
+    b = np.arange(50.)
+    linsolver = SparseLinearSolver()
+    for gamma in [0.1, 0.2, 0.3]:
+        x = linsolver.factorize(jac, gamma).solve(b)
+        mat = np.eye(50) - gamma * jac.toarray()
+        assert( np.allclose(mat.dot(x), b) )
+    assert( linsolver.n_order == 1 )
+
+def test_linsolver_invalid():
+    try:
+        make_linsolver('cholesky')
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_krylov_linsolver():
+    jac = scipy.sparse.random(50, 50, density=0.05, format='csc', random_state=1)
+    op = JacobianOperator(jac.shape, jvp=jac.dot, assemble=lambda: jac)
+    b = np.arange(50.)
+    linsolver = KrylovLinearSolver()
+    for gamma in [0.1, 0.11, 0.12]:
+        x = linsolver.factorize(op, gamma).solve(b)
+        mat = np.eye(50) - gamma * jac.toarray()
+        assert( np.allclose(mat.dot(x), b) )
+    # preconditioner is cached while gmres converges quickly
+    assert( linsolver.n_precond == 1 )
+
+def test_solve_ivp_krylov():
+    res_int = solve_ivp(
+        fun=lambda t,y:y,
+        jac=lambda t,y:JacobianOperator((2,2), jvp=lambda v:v),
+        t_span=(0,1),
+        y0=np.array([1,3]),
+        method='SIE',
+        linsolver='krylov')
+    estim = res_int.sol(1)
+    truth = np.array([1,3])*np.exp(1)
+    diff = estim - truth
+    assert( np.sqrt(np.sum(diff**2)) < tol*np.sqrt(np.sum(truth**2)))
+
+def test_solve_ivp_rosenbrock():
+    res_int = solve_ivp(
+        fun=lambda t,y:y,
+        jac=lambda t,y:np.array([[1,0],[0,1]]),
+        t_span=(0,3),
+        y0=np.array([1,3]),
+        method='ROS4',
+        rtol=1e-6, atol=1e-8)
+    truth = np.array([1,3])*np.exp(3)
+    assert( np.allclose(res_int.sol(3), truth, rtol=1e-5) )
+    # hermite dense output in between the steps
+    assert( np.allclose(res_int.sol(1.5), np.array([1,3])*np.exp(1.5), rtol=1e-4) )
+
+def test_rosenbrock_stiff():
+    '''Robertson's problem'''
+    def fun(t, y):
+        return np.array([
+            -0.04*y[0] + 1e4*y[1]*y[2],
+            0.04*y[0] - 1e4*y[1]*y[2] - 3e7*y[1]**2,
+            3e7*y[1]**2])
+    def jac(t, y):
+        return np.array([
+            [-0.04, 1e4*y[2], 1e4*y[1]],
+            [0.04, -1e4*y[2] - 6e7*y[1], -1e4*y[1]],
+            [0, 6e7*y[1], 0]])
+    solver = Rosenbrock(fun, jac)
+    t_sol, y_sol = solver.solve(np.array([1.,0,0]), 0, 40, rtol=1e-6, atol=1e-10, autonomous=True)
+    truth = np.array([0.7158271, 9.185535e-06, 0.2841637])
+    assert( np.allclose(y_sol[:,-1], truth, rtol=1e-4) )
+    assert( t_sol[-1] == 40 )
+    # one jacobian and one factorization per attempted step
+    n_attempt = solver.stats['n_accepted'] + solver.stats['n_rejected']
+    assert( solver.stats['njev'] == n_attempt and solver.stats['nlu'] == n_attempt )
+
+def test_solve_ivp_invalid_method():
+    try:
+        solve_ivp(fun=lambda t,y:y, jac=lambda t,y:np.eye(1), t_span=(0,1), y0=np.ones(1), method='RK45')
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+def test_events():
+    event_term = lambda t,y: y[0] - 2
+    event_term.terminal = True
+    event_count = lambda t,y: y[1] - 4
+    for method in ['SIE', 'ROS4']:
+        res_int = solve_ivp(
+            fun=lambda t,y:y,
+            jac=lambda t,y:np.array([[1,0],[0,1]]),
+            t_span=(0,3),
+            y0=np.array([1,1]),
+            method=method,
+            events=[event_term, event_count])
+        # terminal event stops the integration at t = ln2
+        assert( np.abs(res_int.t[-1] - np.log(2)) < tol )
+        assert( np.abs(res_int.t_events[0][0] - np.log(2)) < tol )
+        # the other event would occur at ln4, after the termination
+        assert( len(res_int.t_events[1]) == 0 )
+
+def test_steady_state_event():
+    fun = lambda t,y:-y
+    res_int = solve_ivp(
+        fun=fun,
+        jac=lambda t,y:-np.eye(1),
+        t_span=(0,100),
+        y0=np.array([1.]),
+        method='ROS4',
+        rtol=1e-6, atol=1e-9,
+        events=steady_state_event(fun, 1e-2))
+    assert( np.abs(res_int.t[-1] - np.log(100)) < 1e-4 )
+
+def test_rosenbrock_sensitivity():
+    # y' = -p0*y^2 + p1, checked at p1=0 against y = 1/(1+p0*t)
+    p0 = 3.
+    solver = RosenbrockSensitivity(
+        fun=lambda t,y:-p0*y**2, 
+        jac=lambda t,y:np.array([[-2*p0*y[0]]]), 
+        dfdp=lambda t,y:np.array([[-y[0]**2, 1.]]),
+        sens_err=True)
+    t_sol, y_sol = solver.solve(np.array([1.]), 0, 2, rtol=1e-8, atol=1e-10)
+    assert( np.abs(y_sol[0,-1] - 1/(1+2*p0)) < 1e-8 )
+    assert( np.abs(solver.s_sol[0,0] + 2/(1+2*p0)**2) < 1e-8 )
+    # dy/dp1 = int_0^t (1+p0*s)^2 ds / (1+p0*t)^2
+    truth = ((1+2*p0)**3 - 1) / (3*p0) / (1+2*p0)**2
+    assert( np.abs(solver.s_sol[0,1] - truth) < 1e-7 )
+
+def test_rosenbrock_sensitivity_order():
+    # fixed steps, one solve per step: S keeps the 4th order of ROS4
+    p0 = 3.
+    truth = np.array([-2/(1+2*p0)**2, ((1+2*p0)**3 - 1) / (3*p0) / (1+2*p0)**2])
+    errs = []
+    for n in [80, 160]:
+        solver = RosenbrockSensitivity(
+            fun=lambda t,y:-p0*y**2, 
+            jac=lambda t,y:np.array([[-2*p0*y[0]]]), 
+            dfdp=lambda t,y:np.array([[-y[0]**2, 1.]]))
+        y, s = np.array([1.]), np.zeros((1, 2))
+        for k in range(n):
+            _, y_sol = solver.solve(y, 2*k/n, 2*(k+1)/n, first_step=2/n, autonomous=True, s0=s)
+            y, s = y_sol[:, -1], solver.s_sol
+        errs.append(np.max(np.abs(s[0] - truth)))
+    assert( np.log2(errs[0] / errs[1]) > 3.8 )
+
+def test_solve_adjoint():
+    # y' = -p0*y^2 + p1 at p1=0, G = y(t_end) = 1/(1+p0*t_end)
+    p0, t_end = 3., 2.
+    for n_checkpoints in [1, 4]:
+        res = solve_adjoint(
+            fun=lambda t,y:-p0*y**2, 
+            jac=lambda t,y:np.array([[-2*p0*y[0]]]),
+            quad=lambda t,y,lam:lam[0]*np.array([-y[0]**2, 1.]),
+            t_span=(0, t_end), y0=np.array([1.]),
+            weights=lambda t,y:np.array([1.]),
+            rtol=1e-8, atol=1e-10, n_checkpoints=n_checkpoints)
+        assert( np.abs(res['grad'][0] + t_end/(1+p0*t_end)**2) < 1e-8 )
+        assert( np.abs(res['grad'][1] - ((1+p0*t_end)**3-1)/(3*p0)/(1+p0*t_end)**2) < 1e-7 )
+        # lam(t_start) = dG/dy0
+        assert( np.abs(res['lam'][0] - 1/(1+p0*t_end)**2) < 1e-8 )
+
+def test_rodas3_forced_stiff():
+    # Prothero-Robinson problem y' = lam*(y - sin(t)) + cos(t), y = sin(t)
+    lam = -1e4
+    fun = lambda t,y: lam*(y - np.sin(t)) + np.cos(t)
+    jac = lambda t,y: np.array([[lam]])
+    rodas, ros4 = Rodas3(fun, jac), Rosenbrock(fun, jac)
+    t_sol, y_sol = rodas.solve(np.array([0.]), 0, 5, rtol=1e-6, atol=1e-10)
+    assert( np.abs(y_sol[0,-1] - np.sin(5)) < 1e-5 )
+    ros4.solve(np.array([0.]), 0, 5, rtol=1e-6, atol=1e-10)
+    assert( rodas.stats['n_accepted'] < ros4.stats['n_accepted'] / 4 )
+
+def test_multirate():
+    # slow y0 = exp(-t) drives the fast y1, y1 = a*(exp(-t) - exp(-k*t)), a = k/(k-1)
+    k = 1e4
+    fun = lambda t,y: np.array([-y[0], -k*(y[1] - y[0])])
+    jac = lambda t,y: np.array([[-1., 0.], [k, -k]])
+    truth = lambda t: np.array([np.exp(-t), k/(k-1)*(np.exp(-t) - np.exp(-k*t))])
+    solver = Multirate(fun, jac)
+    t_sol, y_sol = solver.solve(np.array([1., 0.]), 0, 3, rtol=1e-6, atol=1e-10, idx_fast=[1])
+    assert( t_sol[-1] == 3 and np.allclose(y_sol[:,-1], truth(3.), rtol=1e-5, atol=1e-9) )
+    assert( solver.stats['n_micro'] > solver.stats['n_accepted'] )
+    # the dense output resolves the initial transient of the fast component
+    sol = solve_ivp(fun, jac, (0, 3), np.array([1., 0.]), method='MR', rtol=1e-6, atol=1e-10, idx_fast=[1])
+    t = np.array([1e-4, 1e-3, 0.5, 2.])
+    assert( np.allclose(sol.sol(t), truth(t), rtol=1e-4, atol=1e-6) )
+    # with no fast components, it is plain ROS4
+    solver = Multirate(fun, jac)
+    solver.solve(np.array([1., 0.]), 0, 3, rtol=1e-6, atol=1e-10)
+    assert( solver.stats['n_micro'] == 0 )
+
+def test_multirate_benchmark():
+    # a large non-stiff, densely coupled slow block driving two stiff fast components:
+    # ROS4 factorizes the whole system at every step, MR only the fast block, so MR is
+    # faster even at a 10 times tighter tolerance, where it is also more accurate
+    n, k = 600, 1e4
+    rng = np.random.RandomState(0)
+    mat = np.zeros((n + 2, n + 2))
+    mat[:n, :n] = rng.randn(n, n) / np.sqrt(n) - 2 * np.eye(n)
+    mat[:n, n] = 0.1
+    mat[n, [0, n]] = k, -k
+    mat[n+1, [n, n+1]] = k, -k
+    fun = lambda t,y: mat.dot(y)
+    jac = lambda t,y: mat
+    y0 = np.concatenate([np.ones(n), np.zeros(2)])
+    truth = scipy.linalg.expm(5 * mat).dot(y0)
+    times, errs = {}, {}
+    for solver, kwargs in [
+            (Rosenbrock(fun, jac), dict(rtol=1e-4, atol=1e-8)), 
+            (Multirate(fun, jac), dict(rtol=1e-5, atol=1e-9, idx_fast=[n, n+1], 
+                                       fun_fast=lambda t,y: mat[n:].dot(y), 
+                                       jac_fast=lambda t,y: mat[n:, n:]))]:
+        start = time.perf_counter()
+        t_sol, y_sol = solver.solve(y0, 0, 5, autonomous=True, **kwargs)
+        times[type(solver).__name__] = time.perf_counter() - start
+        errs[type(solver).__name__] = np.max(np.abs(y_sol[:,-1] - truth))
+    assert( solver.stats['njev'] == 0 and solver.stats['nlu'] == 0 )
+    assert( errs['Multirate'] < errs['Rosenbrock'] < 1e-6 )
+    assert( times['Multirate'] < times['Rosenbrock'] )
+
+def test_hermite_output():
+    # cubic polynomials are reproduced exactly by the Hermite segments
+    fun = lambda t, y: np.array([3 * t**2, 1.])
+    out = HermiteOutput(idx=[0], dtype=np.float32, window=0.5, capacity=4)
+    for t in np.linspace(0, 2, 201):
+        out.append(t, np.array([t**3, t]), fun(t, None))
+    assert( len(out) <= 52 and len(out._t) <= 104 )
+    assert( out.y.shape == (1, len(out)) and out.y.dtype == np.float32 )
+    assert( out.t[0] <= 1.5 < out.t[1] and out.t[-1] == 2 )
+    t = np.linspace(1.5, 2, 7)
+    assert( np.allclose(out.sol(t)[0], t**3, rtol=1e-6) )
+    assert( np.allclose(out.y_last, [8., 2.]) )
+    try:
+        out.sol(1.)
+    except Exception as err:
+        assert( type(err) == ValueError )
+
+    for method in ['ROS4', 'SIE']:
+        out = solve_ivp(
+            fun=lambda t, y: -y, jac=lambda t, y: -np.eye(2), t_span=(0, 3), y0=np.array([1., 3.]), 
+            method=method, output=HermiteOutput(idx=[1]))
+        assert( np.allclose(out.sol([1., 3.]), [3 * np.exp(-1), 3 * np.exp(-3)], rtol=tol) )
+
+    event = lambda t, y: y[0] - 0.5
+    event.terminal = True
+    out = solve_ivp_scipy(lambda t, y: -y, (0, 3), [1.], 'BDF', HermiteOutput(), events=event, rtol=1e-8)
+    assert( out.status == 1 and np.isclose(out.t[-1], np.log(2), rtol=1e-5) )
+    assert( np.isclose(out.sol(0.3)[0], np.exp(-0.3), rtol=1e-5) )
+
+def test_trajectory_sampler():
+    t_eval = np.linspace(0, 3, 7)
+    out = solve_ivp(
+        fun=lambda t, y: -y, jac=lambda t, y: -np.eye(2), t_span=(0, 3), y0=np.array([1., 3.]), 
+        method='ROS4', rtol=1e-6, atol=1e-9, output=TrajectorySampler(t_eval))
+    assert( out.samples.shape == (7, 2) and np.all(out.t == t_eval) and out.t_last == 3 )
+    assert( np.allclose(out.samples, np.exp(-t_eval)[:, None] * [1, 3], rtol=1e-4) )
+    try:
+        TrajectorySampler([1., 0.])
+    except Exception as err:
+        assert( type(err) == ValueError )
@@ -0,0 +1,21 @@
+from chemkin_CS207_G9.auxiliary.useful_structure import IndexedPriorityQueue
+import numpy as np
+
+
+def test_indexed_priority_queue():
+    rng = np.random.default_rng(0)
+    values = list(rng.random(50))
+    queue = IndexedPriorityQueue(values)
+    assert( len(queue) == 50 )
+    for _ in range(500):
+        index = int(rng.integers(50))
+        values[index] = float(rng.choice([rng.random(), np.inf]))
+        queue.update(index, values[index])
+        assert( queue[index] == values[index] )
+        assert( queue.top() == (int(np.argmin(values)), min(values)) )
+
+def test_indexed_priority_queue_empty():
+    try:
+        IndexedPriorityQueue([]).top()
+    except Exception as err:
+        assert( type(err) == IndexError )
@@ -33,4 +33,49 @@ def test_class6():
 def test_class7():
     r = xml2dict()
     r.parse(os.path.join(BASE_DIR, 'rxns2.xml'))
-    assert(r.get_info()[1][2]['reversible'] == 'no') 
\ No newline at end of file
+    assert(r.get_info()[1][2]['reversible'] == 'no') 
+
+def test_iterparse():
+    r = xml2dict()
+    streamed = list(r.iterparse(os.path.join(BASE_DIR, 'rxns_reversible.xml')))
+    species, dicts = xml2dict().parse(os.path.join(BASE_DIR, 'rxns_reversible.xml')).get_info()
+    assert(streamed == dicts)
+    assert(r.Species == species)
+    assert(streamed[0]['coeffParams'] == {'A': 3.547e+15, 'b': -0.406, 'E': 1.6599e+04})
+    assert(streamed[0]['coeffLaw'] == 'modifiedArrhenius')
+
+def test_parse_arrays():
+    import numpy as np
+    from chemkin_CS207_G9.reaction.Reaction import Reaction
+    from chemkin_CS207_G9.reaction.ReactionSystem import ReactionSystem
+    path = os.path.join(BASE_DIR, 'rxns2.xml')
+    species, dicts = xml2dict().parse(path).get_info()
+    rs = ReactionSystem([Reaction(**d) for d in dicts], species)
+    mechanism = xml2dict().parse_arrays(path)
+    assert(mechanism['species'] == species)
+    assert(np.array_equal(mechanism['nu_1'], rs.get_nu_1()))
+    assert(np.array_equal(mechanism['nu_2'], rs.get_nu_2()))
+    assert(mechanism['ID'] == [d['ID'] for d in dicts])
+    assert(mechanism['coeffLaw'] == [d['coeffLaw'] for d in dicts])
+    assert(list(mechanism['reversible']) == [d['reversible'] == 'yes' for d in dicts])
+    for m, d in enumerate(dicts):
+        for tag, values in mechanism['coeffParams'].items():
+            assert(values[m] == d['coeffParams'][tag] if tag in d['coeffParams'] else np.isnan(values[m]))
+    sparse = xml2dict().parse_arrays(path, sparse=True)
+    assert(np.array_equal(sparse['nu_1'].toarray(), rs.get_nu_1()))
+
+def test_parse_arrays_invalid():
+    import io
+    xml = '''<ctml><phase><speciesArray> H O </speciesArray></phase><reactionData>
+        <reaction reversible="no" type="Elementary" id="reaction01">
+            <rateCoeff><Constant><k>1.0</k></Constant></rateCoeff>
+            <reactants>H:1 O2:1</reactants><products>O:1</products>
+        </reaction></reactionData></ctml>'''
+    try:
+        xml2dict().parse_arrays(io.StringIO(xml))
+    except Exception as err:
+        assert(type(err) == ValueError)
+    else:
+        assert(False)
+    streamed = list(xml2dict().iterparse(io.StringIO(xml)))
+    assert(streamed[0]['reactants'] == {'H': 1, 'O2': 1})